@@ -0,0 +1,237 @@
+"""
+Control de admisión para el servidor gRPC.
+
+El pool de hilos de gRPC se dimensiona por encima de la concurrencia del modelo y la espera
+real ocurre aquí, en una cola propia: así se puede rechazar pronto (RESOURCE_EXHAUSTED con
+'retry-after-ms') según profundidad de cola y latencia observada, descartar trabajo cuyo
+deadline ya venció y limitar la concurrencia por cliente.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+import grpc
+
+import tracing
+
+
+class Overloaded(Exception):
+    """
+    Rechazo por sobrecarga. 'retry_after' es el tiempo sugerido (segundos) antes de reintentar.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineMiss(Exception):
+    """
+    El deadline del cliente vence (o vencerá) antes de que el trabajo pueda completarse.
+    """
+
+
+class AdmissionController:
+    """
+    Limita los trabajos concurrentes sobre el modelo ('slots') y la cola de espera.
+    Mantiene una media móvil exponencial (EWMA) del tiempo de servicio para estimar la espera.
+    """
+
+    def __init__(
+        self,
+        slots: int = 4,
+        max_queue: int = 32,
+        latency_budget: float = 2.0,
+        per_client: int = 8,
+        alpha: float = 0.2,
+        name: str = "",
+    ):
+        self.prefix = f"admission_{name}_" if name else "admission_"
+        self.slots = slots
+        self.max_queue = max_queue
+        self.latency_budget = latency_budget
+        self.per_client = per_client
+        self.alpha = alpha
+        self.ewma = 0.0
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._clients = Counter()
+        self.stats = Counter()
+
+    def estimated_wait(self) -> float:
+        """
+        Espera estimada (s) para un trabajo que llega ahora, incluido su propio servicio.
+        """
+        rondas = self._waiting // self.slots + (1 if self._running >= self.slots else 0)
+        return (rondas + 1) * self.ewma
+
+    def _reject(self, reason: str):
+        self.stats[self.prefix + "rejected_" + reason] += 1
+        raise Overloaded(reason, max(self.estimated_wait(), 0.05))
+
+    @contextmanager
+    def slot(self, client: str, time_remaining=None):
+        """
+        Reserva un slot del modelo para 'client' o lanza Overloaded / DeadlineMiss.
+        'time_remaining' es el tiempo (s) que le queda al deadline del cliente, o None.
+        """
+        limite = None if time_remaining is None else time.monotonic() + time_remaining
+        with self._cond:
+            if self._clients[client] >= self.per_client:
+                self._reject("client_quota")
+            if self._running >= self.slots:
+                if self._waiting >= self.max_queue:
+                    self._reject("queue_full")
+                if self.estimated_wait() > self.latency_budget:
+                    self._reject("latency")
+            if time_remaining is not None and self.estimated_wait() > time_remaining:
+                self.stats[self.prefix + "deadline_skipped"] += 1
+                raise DeadlineMiss("el deadline vence antes de la espera estimada")
+
+            self._clients[client] += 1
+            self._waiting += 1
+            try:
+                while self._running >= self.slots:
+                    timeout = None if limite is None else limite - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        self.stats[self.prefix + "deadline_skipped"] += 1
+                        raise DeadlineMiss("el deadline venció en cola")
+                    self._cond.wait(timeout)
+            except DeadlineMiss:
+                self._release_client(client)
+                raise
+            finally:
+                self._waiting -= 1
+            self._running += 1
+            self.stats[self.prefix + "accepted"] += 1
+
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._cond:
+                self.ewma = elapsed if not self.ewma else self.alpha * elapsed + (1 - self.alpha) * self.ewma
+                self._running -= 1
+                self._release_client(client)
+                self._cond.notify()
+
+    def _release_client(self, client: str):
+        self._clients[client] -= 1
+        if self._clients[client] <= 0:
+            del self._clients[client]
+
+    def count(self, key: str):
+        """
+        Incrementa un contador propio (sin prefijo) de forma segura entre hilos.
+        """
+        with self._cond:
+            self.stats[self.prefix + key] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Contadores y estado actual para el RPC Stats.
+        """
+        with self._cond:
+            out = {k: float(v) for k, v in self.stats.items()}
+            out[self.prefix + "running"] = float(self._running)
+            out[self.prefix + "waiting"] = float(self._waiting)
+            out[self.prefix + "ewma_ms"] = self.ewma * 1000
+        return out
+
+
+def _client_id(context):
+    """
+    Identifica al cliente por metadata 'x-client-id' o, en su defecto, por la IP del peer.
+    Por el socket Unix todos los peers se ven igual ('unix:'): ahí la cabecera es obligatoria y
+    sin ella devuelve None.
+    """
+    for key, value in context.invocation_metadata() or ():
+        if key == tracing.CLIENT_ID and value:
+            return value
+    peer = context.peer() or "desconocido"
+    if peer.startswith("unix:"):
+        return None
+    return peer.rsplit(":", 1)[0]
+
+
+def _time_remaining(context):
+    """
+    Tiempo (s) hasta el deadline del cliente, o None si la llamada no tiene deadline.
+    gRPC reporta un valor gigantesco (o infinito) cuando no hay deadline.
+    """
+    remaining = context.time_remaining()
+    if remaining is None or remaining > 86400:
+        return None
+    return remaining
+
+
+class AdmissionInterceptor(grpc.ServerInterceptor):
+    """
+    Aplica el AdmissionController a los RPC unarios y de stream de cliente o de servidor
+    (SummarizeCorpus, SubmitJob, FetchResults), salvo los de salud/administración. 'lanes' asigna
+    controladores propios a métodos concretos (p.ej. Predict interactivo), para que su cola no
+    espere detrás de los lotes. En los de stream de servidor el slot se ocupa hasta el último mensaje.
+    """
+
+    def __init__(self, controller: AdmissionController, exempt=("Ping", "Stats"), lanes=None):
+        self.controller = controller
+        self.exempt = set(exempt)
+        self.lanes = dict(lanes or {})
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+        if handler is None or method in self.exempt:
+            return handler
+        streaming = False
+        if handler.unary_unary is not None:
+            behavior, factory = handler.unary_unary, grpc.unary_unary_rpc_method_handler
+        elif handler.stream_unary is not None:
+            behavior, factory = handler.stream_unary, grpc.stream_unary_rpc_method_handler
+        elif handler.unary_stream is not None:
+            behavior, factory, streaming = handler.unary_stream, grpc.unary_stream_rpc_method_handler, True
+        else:
+            return handler
+
+        controller = self.lanes.get(method, self.controller)
+
+        def admit(stack, context):
+            client = _client_id(context)
+            if client is None:
+                controller.count("missing_client_id")
+                context.abort(
+                    grpc.StatusCode.INVALID_ARGUMENT, "falta la metadata x-client-id (obligatoria por el socket Unix)"
+                )
+            remaining = _time_remaining(context)
+            if remaining is not None and remaining <= 0:
+                controller.count("deadline_skipped")
+                context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "deadline vencido antes de procesar")
+            try:
+                with tracing.span("cola_admision", lane=controller.prefix.rstrip("_")):
+                    stack.enter_context(controller.slot(client, remaining))
+            except Overloaded as e:
+                context.set_trailing_metadata((("retry-after-ms", str(int(e.retry_after * 1000))),))
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"servidor saturado ({e.reason})")
+            except DeadlineMiss as e:
+                context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+
+        def admitted(request, context):
+            with ExitStack() as stack:
+                admit(stack, context)
+                return behavior(request, context)
+
+        def admitted_stream(request, context):
+            with ExitStack() as stack:
+                admit(stack, context)
+                yield from behavior(request, context)
+
+        return factory(
+            admitted_stream if streaming else admitted,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
@@ -0,0 +1,129 @@
+"""
+Análisis por aspectos con la clasificación normal del modelo.
+
+Cada frase distinta de las reseñas se clasifica una sola vez, todas en un único lote: el coste
+en tokens es el de la reseña más los [CLS]/[SEP] de cada frase, no el de volver a codificarla.
+Con esos resultados por frase se combinan, ponderando por longitud, el sentimiento global
+(todas las frases) y el de cada aspecto mencionado (comida, servicio, precio, ambiente; sus
+frases). Una frase que menciona dos aspectos cuenta para ambos sin codificarse dos veces.
+"""
+import re
+from collections import defaultdict
+
+
+DEFAULT_ASPECTS = {
+    "comida": (
+        r"comida", r"plat[oa]s?", r"sabor\w*", r"cocina", r"men[uú]", r"postres?", r"tacos?", r"carnes?",
+        r"salsas?", r"arroz", r"guacamole", r"pizzas?", r"pasta", r"porci[oó]n\w*", r"bebidas?", r"caf[eé]",
+        r"fr[ií][oa]s?", r"delicios\w*", r"rico|rica|ricos|ricas", r"insípid\w*",
+    ),
+    "servicio": (
+        r"servicio", r"meser[oa]s?", r"camarer[oa]s?", r"atenci[oó]n", r"atend\w*", r"personal",
+        r"ignor\w*", r"tardaron", r"demor\w*", r"espera\w*", r"amables?", r"groser\w*", r"orden",
+    ),
+    "precio": (
+        r"precios?", r"car[oa]s?", r"barat[oa]s?", r"cuenta", r"cargos?", r"cobr\w*", r"cost\w*",
+        r"econ[oó]mic[oa]s?", r"pesos", r"d[oó]lares", r"vale la pena",
+    ),
+    "ambiente": (
+        r"ambiente", r"m[uú]sica", r"ruid\w*", r"decoraci[oó]n", r"sal[oó]n", r"local", r"lugar",
+        r"terraza", r"limpi\w*", r"suci\w*", r"mesas?", r"ba[ñn]os?", r"acogedor\w*",
+    ),
+}
+
+_FRASES = re.compile(r"[^.!?¡¿;\n]+")
+
+
+def compile_lexicon(aspects: dict) -> dict:
+    """
+    Regex por aspecto (palabras completas, sin distinguir mayúsculas).
+    """
+    return {
+        name: re.compile(r"\b(?:" + "|".join(patterns) + r")\b", re.IGNORECASE | re.UNICODE)
+        for name, patterns in aspects.items()
+    }
+
+
+def aspect_spans(text: str, lexicon: dict) -> dict:
+    """
+    Frases (inicio, fin en caracteres) que mencionan cada aspecto: {aspecto: [(ini, fin), ...]}.
+    """
+    out = {}
+    for m in _FRASES.finditer(text):
+        frase = m.group()
+        if not frase.strip():
+            continue
+        for name, pattern in lexicon.items():
+            if pattern.search(frase):
+                out.setdefault(name, []).append((m.start(), m.end()))
+    return out
+
+
+def sentences(text: str) -> list:
+    """
+    Frases no vacías (sin espacios de los extremos) en orden; el texto entero si no hay ninguna.
+    """
+    out = [m.group().strip() for m in _FRASES.finditer(text)]
+    return [f for f in out if f] or [text]
+
+
+def combine(outputs, weights):
+    """
+    Voto ponderado de resultados por frase: gana la etiqueta con más peso x score, y su score es
+    la media ponderada de las frases con esa etiqueta.
+    """
+    votes, agree = defaultdict(float), defaultdict(lambda: [0.0, 0.0])
+    for out, weight in zip(outputs, weights):
+        score = float(out["score"])
+        votes[out["label"]] += weight * score
+        agree[out["label"]][0] += weight * score
+        agree[out["label"]][1] += weight
+    label = max(votes, key=votes.get)
+    total, weight = agree[label]
+    return label, total / weight if weight else 0.0
+
+
+class AspectAnalyzer:
+    """
+    Sentimiento global + por aspecto a partir de un clasificador de frases en lote.
+    'classify(texts)' devuelve [{'label', 'score'}] como el pipeline (en el servidor, _infer en el
+    carril interactivo).
+    """
+
+    def __init__(self, classify, aspects: dict = None):
+        self.classify = classify
+        self.lexicon = compile_lexicon(aspects or DEFAULT_ASPECTS)
+
+    def analyze(self, texts) -> list:
+        """
+        Lista de {'label', 'score', 'aspects': [{'aspect', 'label', 'score', 'mentions', 'evidence'}]}.
+        """
+        if not texts:
+            return []
+        rows, plan = {}, []  # frase -> fila del lote (una sola vez aunque se repita)
+        for text in texts:
+            frases = sentences(text)
+            ids = [rows.setdefault(f, len(rows)) for f in frases]
+            aspects = {}
+            for frase, i in zip(frases, ids):
+                for name, pattern in self.lexicon.items():
+                    if pattern.search(frase):
+                        aspects.setdefault(name, []).append((i, frase))
+            plan.append((list(zip(ids, frases)), aspects))
+
+        outputs = list(self.classify(list(rows)))
+        results = []
+        for frases, aspects in plan:
+            label, score = combine([outputs[i] for i, _ in frases], [len(f) for _, f in frases])
+            result = {"label": label, "score": score, "aspects": []}
+            for name, mentioned in aspects.items():
+                label, score = combine([outputs[i] for i, _ in mentioned], [len(f) for _, f in mentioned])
+                result["aspects"].append({
+                    "aspect": name,
+                    "label": label,
+                    "score": score,
+                    "mentions": len(mentioned),
+                    "evidence": mentioned[0][1],
+                })
+            results.append(result)
+        return results
@@ -0,0 +1,213 @@
+"""
+Autoajuste de tamaño de lote, hilos de torch e hilos del modelo para el host actual.
+
+Barre combinaciones contra una muestra representativa (p.ej. reseñas.csv o un corpus propio),
+mide textos/segundo y latencia p95, y guarda la mejor configuración en un archivo de perfil
+indexado por tipo de hardware. El servidor carga ese perfil al arrancar (ML_PROFILE_PATH).
+
+Uso:
+  python ML/autotune.py --corpus reseñas.csv --out perfil_host.json
+"""
+import argparse
+import json
+import os
+import platform
+import threading
+import time
+from datetime import datetime, timezone
+
+
+DEFAULT_PROFILE_PATH = "perfil_host.json"
+
+
+# --------- Perfil por host ----------
+def cpu_count() -> int:
+    """
+    CPUs disponibles para este proceso (respeta cgroups/afinidad cuando el SO lo permite).
+    """
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+
+
+def host_key() -> str:
+    """
+    Identifica el tipo de hardware: arquitectura, modelo de CPU y número de CPUs visibles.
+    """
+    cpu = platform.processor() or "cpu"
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{platform.machine()}|{cpu}|{cpu_count()}cpu"
+
+
+def load_profile(path: str, key: str = None):
+    """
+    Devuelve la configuración guardada para este host (o 'key'), o None si no existe.
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        profiles = json.load(f)
+    return profiles.get(key or host_key())
+
+
+def save_profile(path: str, config: dict, key: str = None):
+    """
+    Guarda 'config' para este host conservando los perfiles de otros tipos de hardware.
+    """
+    profiles = {}
+    if os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            profiles = json.load(f)
+    profiles[key or host_key()] = config
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def apply_torch_threads(config: dict):
+    """
+    Aplica los hilos intra/inter-op del perfil. Debe llamarse antes de la primera inferencia.
+    """
+    import torch
+
+    if config.get("torch_threads"):
+        torch.set_num_threads(int(config["torch_threads"]))
+    if config.get("interop_threads"):
+        try:
+            torch.set_num_interop_threads(int(config["interop_threads"]))
+        except RuntimeError:
+            pass  # ya hubo trabajo inter-op en este proceso; se conserva el valor actual
+
+
+# --------- Medición ----------
+def measure(classify, texts, batch_size: int, workers: int, seconds: float) -> dict:
+    """
+    Ejecuta 'workers' hilos que clasifican lotes de 'batch_size' durante 'seconds'.
+    Devuelve throughput (textos/s) y latencia p95 por lote (ms).
+    """
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)] or [texts]
+    latencies = []
+    done = [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def loop(offset):
+        i = offset
+        while time.perf_counter() < stop:
+            batch = batches[i % len(batches)]
+            t0 = time.perf_counter()
+            classify(batch)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+                done[0] += len(batch)
+            i += 1
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=loop, args=(w,)) for w in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+    return {"throughput": done[0] / elapsed, "p95_ms": p95 * 1000}
+
+
+def sweep(
+    classify, texts, batch_sizes, thread_counts, worker_counts,
+    seconds=2.0, set_threads=None, ncpu=None, log=print,
+):
+    """
+    Mide todas las combinaciones que no sobresuscriben CPUs (hilos_torch * workers <= ncpu).
+    Devuelve la lista de resultados ordenada de mejor a peor (throughput, luego p95).
+    """
+    ncpu = ncpu or cpu_count()
+    results = []
+    for threads in thread_counts:
+        if set_threads:
+            set_threads(threads)
+        for workers in worker_counts:
+            if threads * workers > ncpu:
+                continue
+            for batch_size in batch_sizes:
+                classify(texts[:batch_size])  # calentamiento
+                r = measure(classify, texts, batch_size, workers, seconds)
+                r.update(batch_size=batch_size, torch_threads=threads, workers=workers)
+                log(f"batch={batch_size:<4} torch={threads:<3} workers={workers:<3} "
+                    f"-> {r['throughput']:.1f} textos/s, p95 {r['p95_ms']:.0f} ms")
+                results.append(r)
+    results.sort(key=lambda r: (-r["throughput"], r["p95_ms"]))
+    return results
+
+
+def _powers_of_two(limit: int):
+    out, n = [], 1
+    while n <= limit:
+        out.append(n)
+        n *= 2
+    return out
+
+
+def main():
+    """
+    CLI: barre configuraciones con el modelo del servidor y guarda el perfil del host.
+    """
+    from jobs import iter_text_batches
+    from transformers import pipeline
+    import torch
+
+    parser = argparse.ArgumentParser(description="Autoajuste del servidor de sentimientos")
+    parser.add_argument("--corpus", default="reseñas.csv", help="CSV/Parquet con columna 'texto' o 'text'")
+    parser.add_argument("--column", default="")
+    parser.add_argument("--sample", type=int, default=512, help="textos de la muestra")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duración de cada medición")
+    parser.add_argument("--out", default=os.getenv("ML_PROFILE_PATH", DEFAULT_PROFILE_PATH))
+    parser.add_argument("--model", default="finiteautomata/beto-sentiment-analysis")
+    args = parser.parse_args()
+
+    texts = []
+    for batch in iter_text_batches(args.corpus, args.column):
+        texts.extend(batch)
+        if len(texts) >= args.sample:
+            break
+    texts = texts[: args.sample]
+    print(f"Muestra: {len(texts)} textos de {args.corpus} | host: {host_key()}")
+
+    torch.set_num_interop_threads(1)
+    clf = pipeline("sentiment-analysis", model=args.model)
+    ncpu = cpu_count()
+    results = sweep(
+        lambda batch: clf(batch, truncation=True),
+        texts,
+        batch_sizes=[1, 4, 8, 16, 32, 64],
+        thread_counts=_powers_of_two(ncpu),
+        worker_counts=_powers_of_two(min(ncpu, 8)),
+        seconds=args.seconds,
+        set_threads=torch.set_num_threads,
+        ncpu=ncpu,
+    )
+    best = results[0]
+    config = {
+        "batch_size": best["batch_size"],
+        "torch_threads": best["torch_threads"],
+        "interop_threads": 1,
+        "workers": best["workers"],
+        "throughput": round(best["throughput"], 2),
+        "p95_ms": round(best["p95_ms"], 1),
+        "model": args.model,
+        "measured_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    save_profile(args.out, config)
+    print(f"Mejor configuración guardada en {args.out}: {config}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Puntuación offline de archivos grandes sin pasar por gRPC ni por la interfaz.
+
+Usa la misma inferencia que el servidor (SentimentService.classify_batch: deduplicación, cascada,
+motor en dos etapas y tramos de memoria), pero la reparte entre varios procesos trabajadores:
+- el proceso principal lee el CSV/Parquet en bloques (jobs.iter_text_batches) sin cargarlo entero
+  y mantiene acotados los bloques en vuelo;
+- cada trabajador ordena su bloque por longitud y lo clasifica en lotes de longitud homogénea
+  (menos padding), devolviendo etiquetas y scores en el orden original;
+- cada bloque se escribe como part-NNNNNN.parquet (columnas row, [texto], label, score) con
+  renombrado atómico. _manifest.json fija el archivo de entrada y el tamaño de bloque, así que una
+  ejecución interrumpida se retoma saltando las partes ya escritas.
+
+El directorio de salida se lee como un único dataset: pyarrow.parquet.read_table(salida).
+
+Uso:
+  python ML/batch_score.py resenas.csv salida/ --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from jobs import iter_text_batches
+
+
+MANIFEST = "_manifest.json"
+
+_service = None
+
+
+# --------- Trabajadores ----------
+def default_service():
+    """
+    SentimentService para puntuar offline: sin planificador de carriles (no hay tráfico
+    interactivo al que dar prioridad) y con el motor en dos etapas salvo que se indique otra cosa.
+    """
+    os.environ.setdefault("ML_SCHEDULER", "0")
+    os.environ.setdefault("ML_PIPELINED", "1")
+    from server import SentimentService
+
+    return SentimentService()
+
+
+def _init_worker(service_factory, threads: int):
+    """
+    Inicializa un trabajador: reparte los núcleos entre procesos y carga el modelo una vez.
+    """
+    global _service
+    if threads:
+        os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    _service = (service_factory or default_service)()
+    if threads and "torch" in sys.modules:
+        from autotune import apply_torch_threads
+
+        apply_torch_threads({"torch_threads": threads, "interop_threads": 1})
+
+
+def score_texts(service, texts, batch_size: int = 64) -> tuple:
+    """
+    Clasifica 'texts' en lotes de longitud homogénea. Devuelve (labels, scores) en el orden original.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    labels = [None] * len(texts)
+    scores = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        idx = order[start : start + batch_size]
+        part_labels, part_scores, _ = service.classify_batch([texts[i] for i in idx])
+        for i, label, score in zip(idx, part_labels, part_scores):
+            labels[i] = label
+            scores[i] = score
+    return labels, scores
+
+
+def _score_chunk(index: int, texts, batch_size: int) -> tuple:
+    labels, scores = score_texts(_service, texts, batch_size)
+    return index, labels, scores
+
+
+# --------- Salida y checkpoints ----------
+def part_path(output_dir: str, index: int) -> str:
+    return os.path.join(output_dir, f"part-{index:06d}.parquet")
+
+
+def done_parts(output_dir: str) -> set:
+    """
+    Índices de las partes ya escritas por completo (las temporales están ocultas con '.').
+    """
+    return {
+        int(name[5:11])
+        for name in os.listdir(output_dir)
+        if name.startswith("part-") and name.endswith(".parquet")
+    }
+
+
+def write_part(output_dir: str, index: int, offset: int, labels, scores, texts=None):
+    columns = {"row": pa.array(range(offset, offset + len(labels)), type=pa.int64())}
+    if texts is not None:
+        columns["texto"] = pa.array(texts, type=pa.string())
+    columns["label"] = pa.array(labels, type=pa.string())
+    columns["score"] = pa.array(scores, type=pa.float64())
+    final = part_path(output_dir, index)
+    tmp = os.path.join(output_dir, f".part-{index:06d}.parquet.tmp")
+    pq.write_table(pa.table(columns), tmp)
+    os.replace(tmp, final)
+
+
+def _source(input_path: str, column: str, chunk_size: int, with_text: bool) -> dict:
+    st = os.stat(input_path)
+    return {
+        "input": os.path.abspath(input_path),
+        "size": st.st_size,
+        "mtime": int(st.st_mtime),
+        "column": column,
+        "chunk_size": chunk_size,
+        "with_text": with_text,
+    }
+
+
+def open_output(output_dir: str, source: dict) -> dict:
+    """
+    Crea el directorio de salida o valida que el checkpoint existente es del mismo origen.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, MANIFEST)
+    if os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if any(manifest.get(k) != v for k, v in source.items()):
+            raise ValueError(
+                f"{output_dir} tiene un checkpoint de otro origen o con otros parámetros; "
+                "usa otro directorio de salida o bórralo"
+            )
+        return manifest
+    manifest = {**source, "done": False, "texts": 0}
+    save_manifest(output_dir, manifest)
+    return manifest
+
+
+def save_manifest(output_dir: str, manifest: dict):
+    path = os.path.join(output_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+# --------- Ejecución ----------
+def score_file(
+    input_path: str,
+    output_dir: str,
+    column: str = "",
+    processes: int = 0,
+    chunk_size: int = 4096,
+    batch_size: int = 64,
+    with_text: bool = False,
+    service_factory=None,
+    start_method: str = "spawn",
+    log=print,
+) -> dict:
+    """
+    Puntúa 'input_path' (CSV o Parquet) en 'output_dir' retomando desde el último checkpoint.
+    processes=0 usa tantos procesos como núcleos; processes=1 puntúa en este mismo proceso.
+    'service_factory' (importable por los trabajadores) construye el servicio; por defecto
+    default_service. Devuelve métricas de la ejecución.
+    """
+    processes = processes or os.cpu_count() or 1
+    manifest = open_output(output_dir, _source(input_path, column, chunk_size, with_text))
+    done = done_parts(output_dir)
+    threads = max(1, (os.cpu_count() or 1) // processes)
+    stats = {"chunks": 0, "chunks_skipped": 0, "texts": 0, "texts_scored": 0}
+    t0 = time.perf_counter()
+
+    pending = {}  # future -> (offset, texts)
+
+    def collect(finished):
+        for future in finished:
+            offset, texts = pending.pop(future)
+            index, labels, scores = future.result()
+            write_part(output_dir, index, offset, labels, scores, texts if with_text else None)
+            stats["texts_scored"] += len(labels)
+            stats["chunks"] += 1
+
+    pool = None
+    if processes > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(service_factory, threads),
+        )
+    else:
+        _init_worker(service_factory, 0)
+    try:
+        offset = 0
+        for index, texts in enumerate(iter_text_batches(input_path, column, chunk_size)):
+            stats["texts"] += len(texts)
+            if index in done:
+                stats["chunks_skipped"] += 1
+            elif pool is None:
+                _, labels, scores = _score_chunk(index, texts, batch_size)
+                write_part(output_dir, index, offset, labels, scores, texts if with_text else None)
+                stats["texts_scored"] += len(texts)
+                stats["chunks"] += 1
+            else:
+                # Como mucho dos bloques en vuelo por trabajador: memoria acotada con archivos enormes
+                while len(pending) >= 2 * processes:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending[pool.submit(_score_chunk, index, texts, batch_size)] = (offset, texts)
+            offset += len(texts)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - t0
+    save_manifest(output_dir, {**manifest, "done": True, "texts": stats["texts"]})
+    stats["seconds"] = round(elapsed, 3)
+    stats["texts_per_s"] = round(stats["texts_scored"] / elapsed, 1) if elapsed else 0.0
+    stats["processes"] = processes
+    log(
+        f"[batch_score] {stats['texts_scored']} textos puntuados en {stats['chunks']} bloques "
+        f"({stats['chunks_skipped']} retomados del checkpoint) en {elapsed:.1f}s "
+        f"-> {stats['texts_per_s']} textos/s con {processes} proceso(s)"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntúa un CSV/Parquet de reseñas sin servidor gRPC")
+    parser.add_argument("input", help="CSV o Parquet con columna 'texto' o 'text'")
+    parser.add_argument("output", help="directorio de salida (partes Parquet + checkpoint)")
+    parser.add_argument("--column", default="", help="columna de texto (por defecto texto/text)")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="procesos trabajadores (0 = núcleos disponibles)")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="textos por bloque/parte")
+    parser.add_argument("--batch-size", type=int, default=64, help="textos por lote de longitud homogénea")
+    parser.add_argument("--with-text", action="store_true", help="incluye el texto en la salida")
+    args = parser.parse_args()
+
+    stats = score_file(
+        args.input,
+        args.output,
+        column=args.column,
+        processes=args.processes,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        with_text=args.with_text,
+    )
+    json.dump(stats, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
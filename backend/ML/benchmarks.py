@@ -0,0 +1,351 @@
+"""
+Micro-benchmarks en proceso de los caminos calientes, sin servidor ni red.
+
+- Handlers Predict/PredictBatch de SentimentService con el pipeline simulado de los tests
+  (--pipeline fake) o con un BERT aleatorio minúsculo guardado en un directorio temporal
+  (--pipeline tiny, requiere torch + transformers).
+- Codificación/decodificación protobuf de PredictBatch con 1 a 100k textos.
+- Frontend: to_std sobre 100k etiquetas, read_table sobre un CSV grande y el troceado de
+  predict_batch contra un stub en memoria (si streamlit/pandas están instalados).
+- Cliente: predict_batch balanceado entre dos réplicas en memoria.
+
+Cada caso se mide con timeit (autorange + varias rondas) y se guardan la mediana y el mínimo
+por llamada; las comparaciones usan el mínimo, el menos sensible al ruido. Los tiempos se
+normalizan por un bucle de calibración de Python puro, de modo que una línea base guardada en
+otra máquina sigue siendo comparable. Con --baseline se marca como regresión todo caso cuyo
+tiempo normalizado empeore más de --threshold (por defecto 30%) y el proceso termina con código 1.
+Los casos cuyo mínimo base no llega a --noise-floor-us (por defecto 20 µs, p.ej. protobuf con un
+texto) se listan pero no cuentan: a esa escala la variación entre ejecuciones supera el umbral.
+Un caso marcado se vuelve a medir (--confirm veces) y sólo es regresión si el mejor de todos los
+intentos sigue por encima: las ráfagas de ruido de una máquina compartida no se repiten igual.
+Los casos sin par en la línea base (o no medidos ahora) se listan aparte, sin compararse.
+
+Hay una línea base por pipeline: bench_baseline.json (fake) y bench_baseline_tiny.json (tiny,
+sólo handlers). Los casos app_* sólo entran si la línea base se guardó con streamlit instalado.
+
+Uso:
+  python ML/benchmarks.py --save ML/bench_baseline.json
+  python ML/benchmarks.py --baseline ML/bench_baseline.json --threshold 0.3
+  python ML/benchmarks.py --pipeline tiny --filter handler --baseline ML/bench_baseline_tiny.json
+"""
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import importlib.util
+import io
+import json
+import os
+import pathlib
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from unittest.mock import patch
+
+
+ROOT = pathlib.Path(__file__).resolve().parent
+APP_DIR = ROOT.parents[1] / "frontend" / "App"
+
+
+# --------- Entorno de medida ----------
+def fake_pipeline(inputs):
+    """
+    Mismo pipeline simulado que codigos_test.py: siempre POSITIVE con score 0.95.
+    """
+    if isinstance(inputs, list):
+        return [{"label": "POSITIVE", "score": 0.95} for _ in inputs]
+    return [{"label": "POSITIVE", "score": 0.95}]
+
+
+def synthetic_texts(n: int) -> list:
+    from replay import synthetic_text
+
+    return [synthetic_text(str(i), 40 + (i * 37) % 200) for i in range(n)]
+
+
+def save_tiny_model(path: str):
+    """
+    Guarda en 'path' un tokenizer rápido y un BERT aleatorio minúsculo (sin descargar nada).
+    """
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    from replay import _PALABRAS
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(_PALABRAS))
+    vocab_file = os.path.join(path, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(vocab), hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=32, num_labels=3, id2label={0: "NEG", 1: "NEU", 2: "POS"},
+        label2id={"NEG": 0, "NEU": 1, "POS": 2},
+    )
+    BertTokenizerFast(vocab_file=vocab_file).save_pretrained(path)
+    BertForSequenceClassification(config).save_pretrained(path)
+
+
+@contextlib.contextmanager
+def service_for(kind: str):
+    """
+    SentimentService con el pipeline indicado ('fake' o 'tiny').
+    """
+    from server import SentimentService
+
+    if kind == "fake":
+        with patch("server.pipeline", return_value=fake_pipeline):
+            yield SentimentService()
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        save_tiny_model(tmp)
+        with patch.dict(os.environ, {"ML_MODEL_ID": tmp}):
+            yield SentimentService()
+
+
+def load_frontend():
+    """
+    Importa frontend/App/main.py como módulo, o None si faltan streamlit o pandas.
+    """
+    try:
+        import pandas  # noqa: F401
+        import streamlit  # noqa: F401
+    except ImportError:
+        return None
+    sys.path.insert(0, str(APP_DIR))
+    spec = importlib.util.spec_from_file_location("app_main", APP_DIR / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class MemoryStub:
+    """
+    Stub en memoria que responde PredictBatch sin red (mide sólo el trabajo del cliente).
+    """
+
+    def __init__(self):
+        import sentiment_pb2
+
+        self._pb = sentiment_pb2
+
+    def PredictBatch(self, request, **_):
+        n = len(request.texts)
+        return self._pb.PredictBatchResponse(labels=["POS"] * n, scores=[0.9] * n, unique_texts=n)
+
+
+# --------- Casos ----------
+def build_cases(service, app, quick: bool = False) -> dict:
+    """
+    {nombre: (función sin argumentos, elementos por llamada)} para el entorno dado.
+    """
+    import balancer
+    import client
+    import sentiment_pb2 as pb
+
+    cases = {}
+    batch = 100 if quick else 1000
+    texts = synthetic_texts(max(batch, 1000 if quick else 100_000))
+
+    request = pb.PredictRequest(text=texts[0])
+    cases["handler_predict"] = (lambda: service.Predict(request, None), 1)
+    batch_request = pb.PredictBatchRequest(texts=texts[:batch])
+    cases[f"handler_predict_batch_{batch}"] = (lambda: service.PredictBatch(batch_request, None), batch)
+
+    for n in (1, 100, 1000) if quick else (1, 100, 10_000, 100_000):
+        req = pb.PredictBatchRequest(texts=texts[:n])
+        data = req.SerializeToString()
+        resp = pb.PredictBatchResponse(labels=["POS"] * n, scores=[0.9] * n, unique_texts=n)
+        resp_data = resp.SerializeToString()
+        cases[f"proto_request_encode_{n}"] = (req.SerializeToString, n)
+        cases[f"proto_request_decode_{n}"] = (lambda data=data: pb.PredictBatchRequest.FromString(data), n)
+        cases[f"proto_response_roundtrip_{n}"] = (
+            lambda resp=resp, resp_data=resp_data: (resp.SerializeToString(), pb.PredictBatchResponse.FromString(resp_data)),
+            n,
+        )
+
+    many = texts[: 1000 if quick else 100_000]
+    lb = balancer.Balancer(["a", "b"], check_interval=0, stub_factory=lambda addr: MemoryStub())
+    cases[f"client_predict_batch_balanced_{len(many)}"] = (lambda: client.predict_batch(lb.stub, many, chunk=128), len(many))
+
+    if app is not None:
+        labels = ["POS", "NEG", "NEU", "positive", "Negativa", ""] * (len(many) // 6)
+        cases[f"app_to_std_{len(labels)}"] = (lambda: [app.to_std(x) for x in labels], len(labels))
+
+        rows = 2000 if quick else 100_000
+        csv = ("texto\n" + "\n".join('"' + t.replace('"', "") + '"' for t in texts[:rows])).encode("utf-8")
+
+        def read_csv():
+            up = io.BytesIO(csv)
+            up.name = "resenas.csv"
+            return app.read_table(up)
+
+        cases[f"app_read_table_csv_{rows}"] = (read_csv, rows)
+        stub = MemoryStub()
+        cases[f"app_predict_batch_chunks_{len(many)}"] = (lambda: app.predict_batch(stub, many, chunk=128), len(many))
+    return cases
+
+
+# --------- Medida ----------
+def pin_allocator():
+    """
+    Fija los umbrales de mmap/trim de glibc: si no, dependen de la historia del proceso y un
+    mismo caso con buffers grandes (p.ej. 100k textos) alterna entre reutilizar el heap y pagar
+    fallos de página, con tiempos que varían varias veces entre ejecuciones.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        libc.mallopt(-3, 512 * 1024 * 1024)  # M_MMAP_THRESHOLD
+        libc.mallopt(-1, 1024 * 1024 * 1024)  # M_TRIM_THRESHOLD
+    except (OSError, AttributeError):
+        pass
+
+
+def calibrate(rounds: int = 5) -> float:
+    """
+    Segundos (mínimo de varias rondas) de un bucle de referencia en Python puro.
+    """
+    return min(timeit.repeat("sum(i * i for i in range(200_000))", number=1, repeat=rounds))
+
+
+def measure(fn, rounds: int = 5, min_time: float = 0.05) -> dict:
+    """
+    Mediana y mínimo por llamada (segundos) con un número de repeticiones por ronda que dure >= min_time.
+    """
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 2 if elapsed > min_time / 10 else 10
+    per_call = [t / number for t in timer.repeat(repeat=rounds, number=number)]
+    return {"median_s": statistics.median(per_call), "min_s": min(per_call), "number": number, "rounds": rounds}
+
+
+def run_suite(pipeline: str = "fake", quick: bool = False, rounds: int = 5, only: str = "", log=print,
+              names=None) -> dict:
+    """
+    Ejecuta los casos (filtrados por subcadena 'only' y, si se da, por la lista 'names') y devuelve el reporte.
+    """
+    pin_allocator()
+    app = load_frontend()
+    if app is None:
+        log("Frontend no medido: faltan streamlit y/o pandas")
+    report = {
+        "meta": {
+            "pipeline": pipeline,
+            "quick": quick,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "calibration_s": calibrate(),
+            "frontend": app is not None,
+        },
+        "results": {},
+    }
+    with service_for(pipeline) as service:
+        for name, (fn, items) in build_cases(service, app, quick).items():
+            if (only and only not in name) or (names is not None and name not in names):
+                continue
+            fn()  # calentamiento (cachés, imports perezosos)
+            result = measure(fn, rounds=rounds, min_time=0.01 if quick else 0.05)
+            result["calibration_s"] = calibrate(3)  # junto a cada caso: sigue la deriva de la máquina
+            result["items"] = items
+            result["per_item_us"] = result["median_s"] / items * 1e6
+            report["results"][name] = result
+            log(f"{name:<42} {result['median_s'] * 1e3:>10.3f} ms  {result['per_item_us']:>9.3f} us/elem")
+    return report
+
+
+def compare(report: dict, baseline: dict, threshold: float = 0.3, normalize: bool = True,
+            min_baseline_s: float = 20e-6) -> list:
+    """
+    Casos comunes con su cociente nuevo/base del mínimo por llamada (normalizado por la calibración).
+    Devuelve [(nombre, base_s, nuevo_s, cociente, regresión)]; regresión es None (no evaluada) si el
+    mínimo base queda por debajo de 'min_baseline_s'.
+    """
+    rows = []
+    for name, new in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        scale = 1.0
+        if normalize:
+            scale = old.get("calibration_s", baseline["meta"]["calibration_s"]) / new.get(
+                "calibration_s", report["meta"]["calibration_s"]
+            )
+        ratio = new["min_s"] * scale / old["min_s"]
+        regression = ratio > 1 + threshold if old["min_s"] >= min_baseline_s else None
+        rows.append((name, old["min_s"], new["min_s"], ratio, regression))
+    return rows
+
+
+def keep_best(report: dict, again: dict):
+    """
+    Se queda, por caso, con la medida de menor tiempo normalizado entre 'report' y 'again'.
+    """
+    for name, new in again["results"].items():
+        old = report["results"].get(name)
+        if old is None or new["min_s"] / new["calibration_s"] < old["min_s"] / old["calibration_s"]:
+            report["results"][name] = new
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de los caminos calientes")
+    parser.add_argument("--pipeline", choices=("fake", "tiny"), default="fake")
+    parser.add_argument("--quick", action="store_true", help="tamaños reducidos (para CI)")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--filter", default="", help="sólo casos cuyo nombre contenga este texto")
+    parser.add_argument("--save", default="", help="guarda el reporte como línea base")
+    parser.add_argument("--baseline", default="", help="compara con una línea base guardada")
+    parser.add_argument("--threshold", type=float, default=0.3, help="empeoramiento tolerado (0.3 = 30%%)")
+    parser.add_argument("--no-normalize", action="store_true", help="no normalizar por la calibración")
+    parser.add_argument(
+        "--noise-floor-us", type=float, default=20.0, help="no evalúa casos con mínimo base por debajo (µs)"
+    )
+    parser.add_argument("--confirm", type=int, default=2, help="nuevas medidas de los casos marcados")
+    args = parser.parse_args()
+
+    report = run_suite(args.pipeline, args.quick, args.rounds, args.filter)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Línea base guardada en {args.save}")
+    if not args.baseline:
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if (baseline["meta"]["pipeline"], baseline["meta"]["quick"]) != (args.pipeline, args.quick):
+        print("Aviso: la línea base se midió con otra configuración (pipeline/quick)")
+    rows = compare(report, baseline, args.threshold, not args.no_normalize, args.noise_floor_us * 1e-6)
+    for _ in range(args.confirm):
+        flagged = [r[0] for r in rows if r[4]]
+        if not flagged:
+            break
+        print(f"\nRe-midiendo {len(flagged)} caso(s) marcado(s): {', '.join(flagged)}")
+        keep_best(report, run_suite(args.pipeline, args.quick, args.rounds, log=lambda *_: None, names=flagged))
+        rows = compare(report, baseline, args.threshold, not args.no_normalize, args.noise_floor_us * 1e-6)
+    print(f"\n{'caso':<42} {'base ms':>10} {'nuevo ms':>10} {'cociente':>9}")
+    for name, old, new, ratio, regression in rows:
+        flag = "  REGRESIÓN" if regression else "  (ruido, no evaluado)" if regression is None else ""
+        print(f"{name:<42} {old * 1e3:>10.3f} {new * 1e3:>10.3f} {ratio:>9.2f}{flag}")
+    missing = sorted(set(report["results"]) - set(baseline["results"]))
+    if missing:
+        print(f"\nSin línea base (no comparados): {', '.join(missing)}")
+    unmeasured = sorted(set(baseline["results"]) - set(report["results"]))
+    if unmeasured and not args.filter:
+        print(f"No medidos ahora (en la línea base): {', '.join(unmeasured)}")
+    regressions = [r for r in rows if r[4]]
+    if regressions:
+        print(f"\n{len(regressions)} regresión(es) por encima del {args.threshold:.0%}")
+        sys.exit(1)
+    print("\nSin regresiones")
+
+
+if __name__ == "__main__":
+    main()
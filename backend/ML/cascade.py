@@ -0,0 +1,192 @@
+"""
+Cascada de clasificadores: un modelo lineal muy barato sobre n-gramas con hashing resuelve los
+textos en los que tiene alta confianza y sólo los demás escalan a BETO.
+
+El modelo de primera etapa se entrena con las etiquetas que BETO asigna a un corpus propio
+(destilación a un modelo lineal), de modo que imita al modelo grande en los casos obvios.
+
+Uso:
+  python ML/cascade.py --corpus reseñas.csv --out cascada.npz
+"""
+import argparse
+import re
+import zlib
+
+import numpy as np
+
+
+_PALABRAS = re.compile(r"\w+", re.UNICODE)
+
+
+class HashedNgramClassifier:
+    """
+    Regresión logística multinomial sobre unigramas, bigramas y trigramas de caracteres
+    proyectados con hashing (crc32) a 'dim' posiciones.
+    """
+
+    def __init__(self, labels, dim: int = 2 ** 18):
+        self.labels = list(labels)
+        self.dim = dim
+        self.W = np.zeros((dim, len(self.labels)), dtype=np.float32)
+        self.b = np.zeros(len(self.labels), dtype=np.float32)
+
+    # --------- Features ----------
+    def features(self, text: str) -> np.ndarray:
+        """
+        Índices (con repetición) de los n-gramas del texto en el espacio de hashing.
+        """
+        words = _PALABRAS.findall(text.casefold())
+        grams = [f"w:{w}" for w in words]
+        grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"<{w}>"
+            grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        if not grams:
+            grams = ["<vacio>"]
+        hashes = (zlib.crc32(g.encode("utf-8")) % self.dim for g in grams)
+        return np.fromiter(hashes, dtype=np.int64, count=len(grams))
+
+    def _logits(self, idx: np.ndarray) -> np.ndarray:
+        return self.W[idx].sum(axis=0) / np.sqrt(len(idx)) + self.b
+
+    # --------- Inferencia ----------
+    def predict_proba(self, texts) -> np.ndarray:
+        """
+        Matriz (n_textos, n_etiquetas) de probabilidades.
+        """
+        if not texts:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        logits = np.stack([self._logits(self.features(t)) for t in texts])
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    # --------- Entrenamiento ----------
+    def fit(self, texts, labels, epochs: int = 8, lr: float = 0.5, l2: float = 1e-6, seed: int = 42):
+        """
+        SGD sobre entropía cruzada. 'labels' son etiquetas de texto (las de BETO).
+        """
+        rng = np.random.default_rng(seed)
+        y = np.array([self.labels.index(l) for l in labels])
+        feats = [self.features(t) for t in texts]
+        for epoch in range(epochs):
+            step = lr / (1 + epoch)
+            for i in rng.permutation(len(feats)):
+                idx = feats[i]
+                logits = self._logits(idx)
+                logits -= logits.max()
+                p = np.exp(logits)
+                p /= p.sum()
+                p[y[i]] -= 1.0  # gradiente de la entropía cruzada respecto a los logits
+                grad = (step * p / np.sqrt(len(idx))).astype(np.float32)
+                np.add.at(self.W, idx, -grad)
+                self.W[idx] *= 1 - step * l2
+                self.b -= step * p.astype(np.float32)
+        return self
+
+    # --------- Persistencia ----------
+    def save(self, path: str):
+        np.savez_compressed(path, W=self.W, b=self.b, labels=np.array(self.labels), dim=self.dim)
+
+    @classmethod
+    def load(cls, path: str):
+        data = np.load(path)
+        model = cls([str(l) for l in data["labels"]], dim=int(data["dim"]))
+        model.W = data["W"].astype(np.float32)
+        model.b = data["b"].astype(np.float32)
+        return model
+
+
+class Cascade:
+    """
+    Decide qué textos resuelve la primera etapa y cuáles escalan al modelo grande.
+    Una fracción 'audit_rate' de los textos resueltos también se envía al modelo grande
+    para medir el acuerdo entre ambas etapas sin coste apreciable.
+    """
+
+    def __init__(self, model: HashedNgramClassifier, threshold: float = 0.9, audit_rate: float = 0.02, seed: int = 0):
+        self.model = model
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self._rng = np.random.default_rng(seed)
+
+    def run(self, texts, escalate):
+        """
+        Clasifica 'texts' llamando a escalate(subconjunto) sólo para los de baja confianza.
+        Devuelve (resultados, métricas) con resultados en el formato del pipeline de HF.
+        """
+        probs = self.model.predict_proba(texts)
+        best = probs.argmax(axis=1)
+        conf = probs.max(axis=1)
+        confident = conf >= self.threshold
+        audit = confident & (self._rng.random(len(texts)) < self.audit_rate)
+
+        send = np.flatnonzero(~confident | audit)
+        big = escalate([texts[i] for i in send]) if len(send) else []
+        big_by_pos = dict(zip(send.tolist(), big))
+
+        results = []
+        agree = 0
+        for i in range(len(texts)):
+            if confident[i]:
+                results.append({"label": self.model.labels[best[i]], "score": float(conf[i])})
+                if audit[i]:
+                    agree += big_by_pos[i]["label"] == self.model.labels[best[i]]
+            else:
+                results.append(big_by_pos[i])
+        metrics = {
+            "cascade_texts": len(texts),
+            "cascade_confident": int(confident.sum()),
+            "cascade_escalated": int((~confident).sum()),
+            "cascade_audited": int(audit.sum()),
+            "cascade_audit_agree": int(agree),
+        }
+        return results, metrics
+
+
+def main():
+    """
+    CLI: etiqueta un corpus con BETO por lotes, entrena la primera etapa y reporta cobertura/acuerdo.
+    """
+    from jobs import iter_text_batches
+    from transformers import pipeline
+
+    parser = argparse.ArgumentParser(description="Entrena la primera etapa de la cascada")
+    parser.add_argument("--corpus", default="reseñas.csv", help="CSV/Parquet con columna 'texto' o 'text'")
+    parser.add_argument("--column", default="")
+    parser.add_argument("--out", default="cascada.npz")
+    parser.add_argument("--model", default="finiteautomata/beto-sentiment-analysis")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args()
+
+    teacher = pipeline("sentiment-analysis", model=args.model)
+    texts, labels = [], []
+    for batch in iter_text_batches(args.corpus, args.column, batch_size=args.batch):
+        texts.extend(batch)
+        labels.extend(r["label"] for r in teacher(batch, truncation=True))
+    print(f"Corpus etiquetado por {args.model}: {len(texts)} textos")
+
+    # 80/20 reproducible para estimar cobertura y acuerdo con BETO
+    order = np.random.default_rng(42).permutation(len(texts))
+    cut = int(0.8 * len(texts))
+    train, test = order[:cut], order[cut:]
+    label_set = sorted(set(labels))
+    model = HashedNgramClassifier(label_set).fit([texts[i] for i in train], [labels[i] for i in train])
+
+    if len(test):
+        probs = model.predict_proba([texts[i] for i in test])
+        confident = probs.max(axis=1) >= args.threshold
+        pred = [label_set[j] for j in probs.argmax(axis=1)]
+        hits = np.array([p == labels[i] for p, i in zip(pred, test)])
+        coverage = confident.mean()
+        agreement = hits[confident].mean() if confident.any() else float("nan")
+        print(f"Holdout: cobertura {coverage:.1%} con umbral {args.threshold}, acuerdo con BETO {agreement:.1%}")
+
+    model = HashedNgramClassifier(label_set).fit(texts, labels)
+    model.save(args.out)
+    print(f"Modelo de primera etapa guardado en {args.out}")
+
+
+if __name__ == "__main__":
+    main()
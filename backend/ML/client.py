@@ -1,18 +1,123 @@
+import collections
+import importlib
 import os
+import socket
 import sys
-import grpc
 
-# Añade la carpeta actual al sys.path para importar los stubs generados
-sys.path.append(os.path.dirname(__file__))
 
-import sentiment_pb2 as pb
-import sentiment_pb2_grpc as pb_grpc
+class _LazyModule:
+    """
+    Importa el módulo al primer acceso a un atributo, para que importar este archivo
+    (tests, herramientas de línea de comandos) no pague grpc/protobuf hasta usarlos.
+    """
 
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
 
-def make_stub(host: str = "localhost:50051"):
-    """Crea el canal gRPC y el stub del servicio."""
-    channel = grpc.insecure_channel(host)
-    return pb_grpc.SentimentServiceStub(channel)
+    def __getattr__(self, attr):
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError:
+                # Stubs generados junto a este archivo cuando se importa desde otra carpeta
+                sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+                self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+grpc = _LazyModule("grpc")
+pb = _LazyModule("sentiment_pb2")
+pb_grpc = _LazyModule("sentiment_pb2_grpc")
+balancer = _LazyModule("balancer")
+hedging = _LazyModule("hedging")
+tracing = _LazyModule("tracing")
+
+
+def make_policy(deadline: float = 0.0, retries: int = 2, hedge: bool = True, hedge_quantile: float = 0.95,
+                hedge_ratio: float = 0.1):
+    """
+    Política de plazo total (s, 0 = sin plazo), reintentos con retry-after y hedging al cuantil observado.
+    """
+    return hedging.CallPolicy(
+        deadline=deadline, retries=retries, hedge=hedge, hedge_quantile=hedge_quantile, hedge_ratio=hedge_ratio
+    )
+
+
+def default_client_id() -> str:
+    """
+    Identidad estable de este proceso ('host/pid') para la cuota por cliente del servidor.
+    """
+    return f"{socket.gethostname()}/{os.getpid()}"
+
+
+_interceptor_class = None
+
+
+def _client_id_interceptor(client_id: str):
+    """
+    Interceptor que añade 'x-client-id' a la metadata de cada llamada que no lo lleve ya
+    (clase creada al primer uso para no importar grpc al importar este archivo).
+    """
+    global _interceptor_class
+    if _interceptor_class is None:
+        class Details(
+            collections.namedtuple(
+                "Details", ("method", "timeout", "metadata", "credentials", "wait_for_ready", "compression")
+            ),
+            grpc.ClientCallDetails,
+        ):
+            pass
+
+        class ClientIdInterceptor(
+            grpc.UnaryUnaryClientInterceptor,
+            grpc.UnaryStreamClientInterceptor,
+            grpc.StreamUnaryClientInterceptor,
+            grpc.StreamStreamClientInterceptor,
+        ):
+            def __init__(self, client_id):
+                self.client_id = client_id
+
+            def _details(self, details):
+                metadata = list(details.metadata or ())
+                if all(key != tracing.CLIENT_ID for key, _ in metadata):
+                    metadata.append((tracing.CLIENT_ID, self.client_id))
+                return Details(
+                    details.method, details.timeout, metadata, details.credentials,
+                    getattr(details, "wait_for_ready", None), getattr(details, "compression", None),
+                )
+
+            def intercept_unary_unary(self, continuation, details, request):
+                return continuation(self._details(details), request)
+
+            intercept_unary_stream = intercept_unary_unary
+
+            def intercept_stream_unary(self, continuation, details, request_iterator):
+                return continuation(self._details(details), request_iterator)
+
+            intercept_stream_stream = intercept_stream_unary
+
+        _interceptor_class = ClientIdInterceptor
+    return _interceptor_class(client_id)
+
+
+def make_stub(host: str = "localhost:50051", mode: str = "hash", policy=None, client_id: str = ""):
+    """
+    Crea el canal gRPC y el stub del servicio. Con varias direcciones separadas por comas
+    ('a:50051,b:50051') devuelve un stub balanceado entre réplicas (modo 'hash' o 'round_robin').
+    Con 'policy' (make_policy) las llamadas llevan plazo, reintentos y hedging entre réplicas;
+    con una sola réplica sólo aplican plazo y reintentos.
+    Cada llamada lleva 'x-client-id' (por defecto default_client_id()); por el socket Unix el
+    servidor lo exige.
+    """
+    interceptor = _client_id_interceptor(client_id or default_client_id())
+
+    def stub_for(addr):
+        return pb_grpc.SentimentServiceStub(grpc.intercept_channel(grpc.insecure_channel(addr), interceptor))
+
+    if "," in host or policy is not None:
+        return balancer.Balancer(host, mode=mode, policy=policy, stub_factory=stub_for).stub
+    return stub_for(host)
 
 
 def ping(stub) -> str:
@@ -21,24 +126,110 @@ def ping(stub) -> str:
     return resp.status
 
 
-def predict(stub, text: str):
-    """Predicción individual. Retorna (label, score)."""
-    resp = stub.Predict(pb.PredictRequest(text=text))
+def predict(stub, text: str, timeout: float = None):
+    """Predicción individual con plazo opcional (s). Retorna (label, score)."""
+    resp = stub.Predict(pb.PredictRequest(text=text), timeout=timeout)
     return resp.label, resp.score
 
 
-def predict_batch(stub, texts):
-    """Predicción en lote. Retorna lista de (label, score)."""
-    req = pb.PredictBatchRequest(texts=list(texts))
-    resp = stub.PredictBatch(req)
-    return list(zip(resp.labels, resp.scores))
+def predict_batch(stub, texts, chunk: int = 128, timeout: float = None):
+    """Predicción en lote con plazo opcional (s) por bloque. Retorna lista de (label, score); con un stub balanceado, en paralelo entre réplicas."""
+    def send(s, part):
+        resp = s.PredictBatch(pb.PredictBatchRequest(texts=list(part)), timeout=timeout)
+        return list(zip(resp.labels, resp.scores))
+
+    if hasattr(stub, "map_batch"):
+        return stub.map_batch(texts, send, chunk=chunk)
+    texts = list(texts)
+    return [pair for i in range(0, len(texts), chunk) for pair in send(stub, texts[i : i + chunk])]
+
+
+def make_shm_predictor(uds_path: str = "/tmp/sentiment.sock", size: int = 64 * 1024 * 1024):
+    """
+    Cliente de lotes por memoria compartida (RPC PredictShm) sobre el socket Unix del servidor.
+    Uso: predictor.predict_batch(textos) -> [(label, score)]; predictor.close() al terminar.
+    """
+    import shm
+
+    return shm.ShmPredictor(make_stub(f"unix:{uds_path}"), size=size)
+
+
+def analyze(stub, text: str):
+    """Sentimiento global y por aspecto. Retorna (label, score, {aspecto: (label, score)})."""
+    resp = stub.Analyze(pb.AnalyzeRequest(text=text))
+    return resp.label, resp.score, {a.aspect: (a.label, a.score) for a in resp.aspects}
+
+
+def index_texts(stub, texts):
+    """Clasifica y añade textos al índice de similitud. Retorna lista de (label, score, id)."""
+    resp = stub.PredictBatch(pb.PredictBatchRequest(texts=list(texts), add_to_index=True))
+    return list(zip(resp.labels, resp.scores, resp.index_ids))
+
+
+def find_similar(stub, text: str, k: int = 5, min_score: float = 0.0):
+    """Reseñas indexadas más parecidas. Retorna lista de (id, score, texto)."""
+    resp = stub.FindSimilar(pb.FindSimilarRequest(text=text, k=k, min_score=min_score))
+    return [(m.id, m.score, m.text) for m in resp.matches]
+
+
+def summarize(stub, text: str, sentences: int = 2):
+    """Resumen extractivo de una reseña. Retorna la lista de frases."""
+    return list(stub.Summarize(pb.SummarizeRequest(text=text, sentences=sentences)).sentences)
+
+
+def summarize_corpus(stub, texts, labels=None, label: str = "", sentences: int = 5, chunk: int = 1000):
+    """
+    Resumen de un conjunto de reseñas, opcionalmente sólo las de 'label' (p.ej. "NEG").
+    Envía el hash del corpus en el primer mensaje: si el servidor ya lo resumió, responde sin leer el resto.
+    Retorna (frases, cacheado).
+    """
+    from summarize import corpus_digest, label_key
+
+    texts = list(texts)
+    labels = list(labels) if labels is not None else []
+    digest = corpus_digest(texts, (label_key(label), sentences), labels if len(labels) == len(texts) else None)
+
+    def reqs():
+        yield pb.SummarizeCorpusRequest(label=label, sentences=sentences, corpus_hash=digest)
+        for i in range(0, len(texts), chunk):
+            yield pb.SummarizeCorpusRequest(texts=texts[i : i + chunk], labels=labels[i : i + chunk])
+
+    resp = stub.SummarizeCorpus(reqs())
+    return list(resp.sentences), resp.cached
+
+
+def submit_job(stub, texts, chunk: int = 1000) -> str:
+    """Crea un trabajo asíncrono enviando los textos por stream. Retorna el job_id."""
+    texts = list(texts)
+    reqs = (pb.SubmitJobRequest(texts=texts[i : i + chunk]) for i in range(0, len(texts), chunk))
+    return stub.SubmitJob(reqs).job_id
+
+
+def submit_file_job(stub, path: str, column: str = "") -> str:
+    """Crea un trabajo sobre un CSV/Parquet local al servidor. Retorna el job_id."""
+    return stub.SubmitJob(iter([pb.SubmitJobRequest(file_path=path, column=column)])).job_id
+
+
+def job_status(stub, job_id: str):
+    """Estado del trabajo. Retorna (state, done, total)."""
+    resp = stub.GetJobStatus(pb.JobStatusRequest(job_id=job_id))
+    return resp.state, resp.done, resp.total
+
+
+def fetch_results(stub, job_id: str, offset: int = 0):
+    """Itera pares (label, score) persistidos del trabajo a partir de 'offset'."""
+    for chunk in stub.FetchResults(pb.FetchResultsRequest(job_id=job_id, offset=offset)):
+        yield from zip(chunk.labels, chunk.scores)
 
 
 def main():
     """Smoke test: ping + ejemplos de predicción."""
     stub = make_stub()
     print("ping:", ping(stub))
-    print("one:", predict(stub, "Vengo por la comida y solo por la comida. Los tacos al pastor están en otro nivel: tortilla caliente, carne bien dorada y jugosa, piña fresca en el punto, y una salsa de habanero que pica sin matar el sabor. El guacamole es cremoso y con buen limeado, y el arroz sale suelto, no pastoso. Hasta el café, simple, sale correcto. Pero el servicio arruina la experiencia. Nos ignoraron al llegar, tardaron más de 20 minutos en tomar la orden, trajeron los platos desparejos y tuve que pedir tres veces las bebidas. La mesera fue cortés pero ausente, y la cuenta vino con cargos que no pedimos. No es un mal día aislado, ya me pasó algo similar antes. La cocina merece aplauso, el salón necesita gestión básica: tiempos, atención y seguimiento. Si pudiera pedir en ventanilla y comer de pie, lo haría feliz. Volvería por los sabores, pero solo si mejoran el servicio o si voy con paciencia de sobra."))
+    resena = "Vengo por la comida y solo por la comida. Los tacos al pastor están en otro nivel: tortilla caliente, carne bien dorada y jugosa, piña fresca en el punto, y una salsa de habanero que pica sin matar el sabor. El guacamole es cremoso y con buen limeado, y el arroz sale suelto, no pastoso. Hasta el café, simple, sale correcto. Pero el servicio arruina la experiencia. Nos ignoraron al llegar, tardaron más de 20 minutos en tomar la orden, trajeron los platos desparejos y tuve que pedir tres veces las bebidas. La mesera fue cortés pero ausente, y la cuenta vino con cargos que no pedimos. No es un mal día aislado, ya me pasó algo similar antes. La cocina merece aplauso, el salón necesita gestión básica: tiempos, atención y seguimiento. Si pudiera pedir en ventanilla y comer de pie, lo haría feliz. Volvería por los sabores, pero solo si mejoran el servicio o si voy con paciencia de sobra."
+    print("one:", predict(stub, resena))
+    print("aspects:", analyze(stub, resena))
+    print("summary:", summarize(stub, resena))
     print("batch:", predict_batch(stub, ["Me encanta este lugar", "amo"]))
 
 
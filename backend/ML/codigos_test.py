@@ -1,8 +1,17 @@
 # tests/test_server.py
 import pytest
-from unittest.mock import patch
-from server import SentimentService
+import json
+import os
+import threading
+import time
+from concurrent import futures
+from unittest.mock import MagicMock, patch
+
+import grpc
+from server import SentimentService, dedup_texts
 import sentiment_pb2
+import sentiment_pb2_grpc
+from admission import AdmissionController, AdmissionInterceptor, DeadlineMiss, Overloaded
 
 # -----------------------------
 # Fixtures
@@ -58,3 +67,1380 @@ def test_inicializacion_servicio(pipeline_simulado):
 
         assert servicio.model_id == "finiteautomata/beto-sentiment-analysis"
         assert servicio.clf is not None
+
+
+def test_predict_batch_deduplica_textos(pipeline_simulado):
+    fake = MagicMock(side_effect=pipeline_simulado)
+    with patch("server.pipeline", return_value=fake):
+        servicio = SentimentService()
+        solicitud = sentiment_pb2.PredictBatchRequest(texts=["texto"] * 1000)
+        respuesta = servicio.PredictBatch(solicitud, None)
+
+        fake.assert_called_once_with(["texto"])
+        assert respuesta.unique_texts == 1
+        assert len(respuesta.scores) == 1000
+
+        stats = servicio.Stats(sentiment_pb2.StatsRequest(), None).counters
+        assert stats["batch_duplicates_skipped"] == 999
+        assert stats["batch_dedup_ratio"] == pytest.approx(0.999)
+
+
+def test_dedup_normalizado():
+    textos = ["Muy  bueno", "muy bueno ", "Malo", "MUY BUENO"]
+
+    unicos, indices = dedup_texts(textos)
+    assert unicos == textos
+    assert indices == [0, 1, 2, 3]
+
+    unicos, indices = dedup_texts(textos, normalize=True)
+    assert unicos == ["Muy  bueno", "Malo"]
+    assert indices == [0, 0, 1, 0]
+
+
+@pytest.fixture
+def modelo_diminuto(tmp_path):
+    """
+    Tokenizer rápido y BERT aleatorio minúsculo construidos en local (sin descargar nada).
+    """
+    torch = pytest.importorskip("torch")
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "me", "encanta", "este", "lugar", "amo", "malo"]
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    tokenizer = BertTokenizerFast(vocab_file=str(tmp_path / "vocab.txt"))
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(vocab), hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=32, num_labels=3, id2label={0: "NEG", 1: "NEU", 2: "POS"},
+    )
+    return tokenizer, BertForSequenceClassification(config)
+
+
+def test_inferencia_en_etapas(modelo_diminuto):
+    from inference import StagedInference
+
+    tokenizer, model = modelo_diminuto
+    engine = StagedInference(tokenizer, model, micro_batch=2)
+    textos = ["me encanta este lugar", "amo", "malo", "me encanta este lugar", "amo"]
+
+    resultados = engine.classify(textos)
+    assert len(resultados) == len(textos)
+    assert all(r["label"] in ("NEG", "NEU", "POS") and 0 <= r["score"] <= 1 for r in resultados)
+    assert resultados[0] == resultados[3]
+    assert engine.lengths.get("amo") == 3  # [CLS] amo [SEP]
+
+    ids = [tokenizer("amo")["input_ids"], tokenizer("malo")["input_ids"]]
+    pre = engine.submit_encoded(ids).result()
+    assert [r["label"] for r in pre] == [resultados[1]["label"], resultados[2]["label"]]
+
+
+def test_admision_cuota_cola_y_deadline():
+    control = AdmissionController(slots=1, max_queue=0, per_client=1)
+
+    with control.slot("a"):
+        with pytest.raises(Overloaded) as rechazo:
+            with control.slot("a"):
+                pass
+        assert rechazo.value.reason == "client_quota"
+        with pytest.raises(Overloaded) as rechazo:
+            with control.slot("b"):
+                pass
+        assert rechazo.value.reason == "queue_full"
+        assert rechazo.value.retry_after > 0
+
+    with pytest.raises(DeadlineMiss):
+        control.max_queue = 1
+        with control.slot("a"):
+            with control.slot("b", time_remaining=0.01):
+                pass
+    assert control.snapshot()["admission_deadline_skipped"] == 1
+    assert AdmissionController(name="bulk").snapshot()["admission_bulk_running"] == 0
+
+
+def test_admision_rechaza_con_retry_after(pipeline_simulado):
+    liberar = threading.Event()
+    en_curso = threading.Event()
+
+    def lento(inputs):
+        en_curso.set()
+        liberar.wait(5)
+        return pipeline_simulado(inputs)
+
+    with patch("server.pipeline", return_value=lento):
+        control = AdmissionController(slots=1, max_queue=0)
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=4), interceptors=[AdmissionInterceptor(control)]
+        )
+        sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(SentimentService(), server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        try:
+            stub = sentiment_pb2_grpc.SentimentServiceStub(grpc.insecure_channel(f"127.0.0.1:{port}"))
+            primera = stub.Predict.future(sentiment_pb2.PredictRequest(text="hola"))
+            assert en_curso.wait(5)  # la primera ya tiene el único hueco
+            assert control.snapshot()["admission_running"] == 1
+
+            with pytest.raises(grpc.RpcError) as error:
+                stub.Predict(sentiment_pb2.PredictRequest(text="hola"), metadata=(("x-client-id", "otro"),))
+            assert error.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+            assert "retry-after-ms" in dict(error.value.trailing_metadata())
+            assert stub.Ping(sentiment_pb2.PingRequest()).status == "ok"
+
+            liberar.set()
+            assert primera.result().label == "POSITIVE"
+        finally:
+            liberar.set()
+            server.stop(None)
+
+
+def test_identidad_de_cliente_para_la_cuota(pipeline_simulado, tmp_path):
+    import contextvars
+
+    import client
+    import tracing
+
+    # La metadata de trazas lleva el 'x-client-id' del contexto, sin duplicarlo
+    def en_sesion():
+        tracing.set_client_id("app/sesion-1")
+        return tracing.inject(), tracing.inject([(tracing.CLIENT_ID, "explicito")])
+
+    propia, explicita = contextvars.copy_context().run(en_sesion)
+    assert (tracing.CLIENT_ID, "app/sesion-1") in propia
+    assert [v for k, v in explicita if k == tracing.CLIENT_ID] == ["explicito"]
+    assert all(k != tracing.CLIENT_ID for k, _ in tracing.inject())
+
+    liberar = threading.Event()
+
+    def lento(inputs):
+        liberar.wait(5)
+        return pipeline_simulado(inputs)
+
+    with patch("server.pipeline", return_value=lento):
+        control = AdmissionController(slots=2, max_queue=0, per_client=1)
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=8), interceptors=[AdmissionInterceptor(control)])
+        sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(SentimentService(), server)
+        ruta = str(tmp_path / "s.sock")
+        server.add_insecure_port(f"unix:{ruta}")
+        server.start()
+        try:
+            # Por el socket Unix todos los peers son 'unix:': sin cabecera no hay a quién aplicar la cuota
+            crudo = sentiment_pb2_grpc.SentimentServiceStub(grpc.insecure_channel(f"unix:{ruta}"))
+            with pytest.raises(grpc.RpcError) as error:
+                crudo.Predict(sentiment_pb2.PredictRequest(text="hola"))
+            assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+            assert crudo.Ping(sentiment_pb2.PingRequest()).status == "ok"  # exento
+
+            # client.make_stub envía su identidad: la cuota es por cliente, no por socket
+            a = client.make_stub(f"unix:{ruta}", client_id="etl-a")
+            primera = a.Predict.future(sentiment_pb2.PredictRequest(text="hola"))
+            limite = time.monotonic() + 5
+            while control.snapshot()["admission_running"] < 1:
+                assert time.monotonic() < limite
+                time.sleep(0.01)
+            with pytest.raises(grpc.RpcError) as error:
+                client.make_stub(f"unix:{ruta}", client_id="etl-a").Predict(sentiment_pb2.PredictRequest(text="x"))
+            assert error.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+            segunda = client.make_stub(f"unix:{ruta}", client_id="etl-b").Predict.future(
+                sentiment_pb2.PredictRequest(text="y")
+            )
+            liberar.set()
+            assert primera.result().label == segunda.result().label == "POSITIVE"
+            assert client.default_client_id().endswith(f"/{os.getpid()}")
+            assert control.snapshot()["admission_missing_client_id"] == 1
+        finally:
+            liberar.set()
+            server.stop(None)
+
+
+def test_subidas_de_trabajos_con_tope_propio(pipeline_simulado, tmp_path, monkeypatch):
+    import client
+    from server import build_server
+
+    monkeypatch.setenv("ML_MAX_JOB_STREAMS", "2")
+    monkeypatch.setenv("ML_JOBS_DIR", str(tmp_path / "jobs"))
+    with patch("server.pipeline", return_value=pipeline_simulado):
+        server, servicio = build_server("127.0.0.1:0", resume_jobs=False)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    stub = client.make_stub(f"127.0.0.1:{port}")
+    liberar = threading.Event()
+
+    def subida_lenta():
+        yield sentiment_pb2.SubmitJobRequest(texts=["hola"])
+        liberar.wait(10)
+
+    try:
+        # Las subidas en curso ocupan su carril, no los hilos reservados a Ping/Stats
+        subidas = [stub.SubmitJob.future(subida_lenta()) for _ in range(2)]
+        limite = time.monotonic() + 5
+        while servicio.Stats(sentiment_pb2.StatsRequest(), None).counters["admission_jobs_running"] < 2:
+            assert time.monotonic() < limite
+            time.sleep(0.01)
+        with pytest.raises(grpc.RpcError) as error:
+            stub.SubmitJob(iter([sentiment_pb2.SubmitJobRequest(texts=["otra"])]))
+        assert error.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        assert "retry-after-ms" in dict(error.value.trailing_metadata())
+        assert client.ping(stub) == "ok"
+        assert stub.Stats(sentiment_pb2.StatsRequest()).counters["admission_jobs_rejected_queue_full"] == 1
+
+        liberar.set()
+        job_id = subidas[0].result(timeout=10).job_id
+        limite = time.monotonic() + 10
+        while client.job_status(stub, job_id)[0] != "done":
+            assert time.monotonic() < limite
+            time.sleep(0.05)
+        assert list(client.fetch_results(stub, job_id)) == [("POSITIVE", pytest.approx(0.95))]
+        assert servicio.Stats(sentiment_pb2.StatsRequest(), None).counters["admission_jobs_accepted"] == 3
+    finally:
+        liberar.set()
+        server.stop(None)
+
+
+def test_carril_interactivo_se_adelanta_a_bulk():
+    from scheduler import LaneScheduler
+
+    orden = []
+    arranque = threading.Event()
+    liberar = threading.Event()
+
+    def modelo(textos):
+        arranque.set()
+        liberar.wait(5)
+        orden.append(tuple(textos))
+        return [{"label": "POS", "score": 1.0} for _ in textos]
+
+    planificador = LaneScheduler(modelo, sub_batch=2, workers=1)
+    bulk = futures.ThreadPoolExecutor(1).submit(planificador.run, ["b1", "b2", "b3", "b4", "b5", "b6"], "bulk")
+    arranque.wait(5)  # el primer sub-lote ya ocupa el modelo
+    interactivo = futures.ThreadPoolExecutor(1).submit(planificador.run, ["i1"], "interactive")
+    limite = time.monotonic() + 5
+    while planificador.snapshot().get("sched_interactive_queued", 0) < 1:
+        assert time.monotonic() < limite, "el trabajo interactivo no llegó a la cola"
+        time.sleep(0.001)
+    liberar.set()
+
+    assert len(bulk.result(5)) == 6
+    assert interactivo.result(5)[0]["label"] == "POS"
+    assert orden == [("b1", "b2"), ("i1",), ("b3", "b4"), ("b5", "b6")]
+    assert planificador.snapshot()["sched_bulk_items"] == 3
+
+
+def test_trabajo_asincrono_persistido(pipeline_simulado, tmp_path, monkeypatch):
+    import time
+
+    monkeypatch.setenv("ML_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("ML_JOB_BATCH", "3")
+    with patch("server.pipeline", return_value=pipeline_simulado):
+        servicio = SentimentService()
+        envio = servicio.SubmitJob(
+            iter([
+                sentiment_pb2.SubmitJobRequest(texts=["a", "b", "a"]),
+                sentiment_pb2.SubmitJobRequest(texts=["c"] * 4),
+            ]),
+            None,
+        )
+        assert envio.total == 7
+
+        solicitud = sentiment_pb2.JobStatusRequest(job_id=envio.job_id)
+        for _ in range(200):
+            estado = servicio.GetJobStatus(solicitud, None)
+            if estado.state in ("done", "failed"):
+                break
+            time.sleep(0.02)
+        assert (estado.state, estado.done, estado.total) == ("done", 7, 7)
+
+        bloques = list(servicio.FetchResults(
+            sentiment_pb2.FetchResultsRequest(job_id=envio.job_id, offset=2, chunk_size=2), None
+        ))
+        assert [b.offset for b in bloques] == [2, 3, 5, 6]
+        assert sum(len(b.labels) for b in bloques) == 5
+        assert len(servicio.jobs.store.parts(envio.job_id)) == 3  # bloques de ML_JOB_BATCH
+
+
+def test_trabajo_se_retoma_desde_la_ultima_parte(tmp_path):
+    import time
+    from jobs import JobStore, JobWorker
+
+    csv = tmp_path / "resenas.csv"
+    csv.write_text("texto\nuno\ndos\ntres\ncuatro\ncinco\n", encoding="utf-8")
+    store = JobStore(str(tmp_path / "jobs"))
+    job_id = store.create({"file_path": str(csv), "column": ""})
+    store.write_part(job_id, 0, ["POS", "POS"], [0.9, 0.9])
+    store.update(job_id, state="running", done=2)  # simula un reinicio a mitad de trabajo
+    cortado = store.create({})  # reinicio con un stream de textos a medio recibir
+    store.release(job_id)  # el proceso anterior murió: el sistema suelta sus candados
+    store.release(cortado)
+
+    vistos = []
+
+    def clasificar(textos):
+        vistos.extend(textos)
+        return ["NEG"] * len(textos), [0.5] * len(textos)
+
+    JobWorker(store, clasificar, batch_size=2)
+    for _ in range(200):
+        if store.load(job_id)["state"] == "done":
+            break
+        time.sleep(0.02)
+    assert vistos == ["tres", "cuatro", "cinco"]
+    etiquetas = [l for _, labels, _ in store.iter_results(job_id) for l in labels]
+    assert etiquetas == ["POS", "POS", "NEG", "NEG", "NEG"]
+    assert store.load(cortado)["state"] == "failed" and "recepción" in store.load(cortado)["error"]
+
+
+def _proceso_con_estado_compartido(raiz, registro, indice, inicio, desde):
+    """
+    Trabajador de prueba: retoma trabajos de 'raiz' anotando en 'registro' cada lote que
+    clasifica y añade al índice compartido los textos t<desde>..t<desde+19>.
+    """
+    import numpy as np
+    from jobs import JobStore, JobWorker
+    from similarity import SimilarityIndex
+
+    def clasificar(textos):
+        with open(registro, "a", encoding="utf-8") as f:
+            f.write(f"{os.getpid()} {len(textos)}\n")
+        time.sleep(0.02)
+        return ["POS"] * len(textos), [0.9] * len(textos)
+
+    inicio.wait(30)
+    store = JobStore(raiz)
+    JobWorker(store, clasificar, batch_size=2, rescan_interval=0.05)
+    compartido = SimilarityIndex(indice, dim=64, initial_capacity=4)
+    for i in range(desde, desde + 20):
+        compartido.add(np.eye(64, dtype=np.float32)[i], [f"t{i}"])
+    limite = time.monotonic() + 30
+    while any(store.load(j)["state"] != "done" for j in store.list_ids()) and time.monotonic() < limite:
+        time.sleep(0.02)
+
+
+def test_estado_en_disco_compartido_entre_procesos(tmp_path):
+    import multiprocessing
+
+    import numpy as np
+    from jobs import JobStore
+    from similarity import SimilarityIndex
+
+    store = JobStore(str(tmp_path / "jobs"))
+    job_id = store.create({})
+    store.update(job_id, total=store.write_input(job_id, [[f"r{i}" for i in range(20)]]))
+    store.update(job_id, state="queued")
+    store.release(job_id)  # el proceso que lo recibió murió antes de procesarlo
+
+    mp = multiprocessing.get_context("spawn")
+    inicio = mp.Event()
+    registro = str(tmp_path / "lotes.txt")
+    procesos = [
+        mp.Process(target=_proceso_con_estado_compartido,
+                   args=(store.root, registro, str(tmp_path / "indice"), inicio, desde))
+        for desde in (0, 10)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    inicio.set()
+    for proceso in procesos:
+        proceso.join(60)
+    assert [p.exitcode for p in procesos] == [0, 0]
+
+    # Un único proceso tomó el trabajo y cada texto se clasificó exactamente una vez
+    with open(registro, encoding="utf-8") as f:
+        lotes = [linea.split() for linea in f]
+    assert len({pid for pid, _ in lotes}) == 1
+    assert sum(int(n) for _, n in lotes) == 20
+    assert store.load(job_id)["state"] == "done" and store.load(job_id)["done"] == 20
+
+    # Altas concurrentes al índice: 30 textos distintos, cada uno con su propio vector
+    indice = SimilarityIndex(str(tmp_path / "indice"), dim=64)
+    assert len(indice) == 30 and sorted(indice.texts) == sorted(f"t{i}" for i in range(30))
+    for fila, texto in enumerate(indice.texts):
+        assert np.argmax(indice.vectors[fila]) == int(texto[1:])
+
+
+def test_autotune_guarda_y_aplica_perfil(pipeline_simulado, tmp_path, monkeypatch):
+    from autotune import host_key, load_profile, save_profile, sweep
+
+    def clasificar(textos):
+        # Simula un modelo con coste fijo por llamada: lotes grandes rinden más
+        time.sleep(0.002)
+        return [{"label": "POS", "score": 1.0} for _ in textos]
+
+    resultados = sweep(
+        clasificar, ["texto"] * 64, batch_sizes=[1, 16], thread_counts=[1], worker_counts=[1],
+        seconds=0.05, log=lambda *_: None,
+    )
+    assert resultados[0]["batch_size"] == 16
+
+    perfil = tmp_path / "perfil.json"
+    save_profile(str(perfil), {"batch_size": 16, "workers": 3}, key="otro-host")
+    save_profile(str(perfil), {"batch_size": 32, "workers": 1})
+    assert load_profile(str(perfil), key="otro-host")["workers"] == 3
+    assert load_profile(str(perfil))["batch_size"] == 32
+    assert host_key() in json.loads(perfil.read_text(encoding="utf-8"))
+
+    monkeypatch.setenv("ML_PROFILE_PATH", str(perfil))
+    monkeypatch.setenv("ML_MODEL_THREADS", "2")
+    monkeypatch.setattr("server.apply_torch_threads", lambda config: None)
+    with patch("server.pipeline", return_value=pipeline_simulado):
+        servicio = SentimentService()
+        assert servicio.scheduler.sub_batch == 32  # del perfil
+        assert servicio.setting("ML_MODEL_THREADS", "workers", 4) == 2  # el entorno manda
+
+
+def test_cascada_escala_solo_textos_dudosos(pipeline_simulado, tmp_path, monkeypatch):
+    from cascade import HashedNgramClassifier
+
+    positivos = ["me encanta la comida", "excelente comida y servicio", "amo este lugar", "muy rico todo"]
+    negativos = ["pésimo servicio", "la comida estaba fría y mala", "horrible lugar", "muy malo todo"]
+    modelo = HashedNgramClassifier(["NEG", "POS"], dim=2 ** 12).fit(
+        positivos * 5 + negativos * 5, ["POS"] * 20 + ["NEG"] * 20, epochs=20
+    )
+    ruta = tmp_path / "cascada.npz"
+    modelo.save(str(ruta))
+    assert HashedNgramClassifier.load(str(ruta)).predict_proba(["amo este lugar"]).argmax() == 1
+
+    monkeypatch.setenv("ML_CASCADE_PATH", str(ruta))
+    monkeypatch.setenv("ML_CASCADE_THRESHOLD", "0.8")
+    monkeypatch.setenv("ML_CASCADE_AUDIT", "0")
+    fake = MagicMock(side_effect=pipeline_simulado)
+    with patch("server.pipeline", return_value=fake):
+        servicio = SentimentService()
+        textos = ["amo este lugar", "horrible lugar", "qwerty"]
+        respuesta = servicio.PredictBatch(sentiment_pb2.PredictBatchRequest(texts=textos), None)
+
+        assert list(respuesta.labels) == ["POS", "NEG", "POSITIVE"]
+        fake.assert_called_once_with(["qwerty"])
+        stats = servicio.Stats(sentiment_pb2.StatsRequest(), None).counters
+        assert stats["cascade_escalation_rate"] == pytest.approx(1 / 3)
+
+
+def test_importar_servidor_y_cliente_no_carga_dependencias_pesadas():
+    from startup_profile import check, import_times
+
+    for modulo in ("server", "client"):
+        tiempos = import_times(modulo)
+        assert check(modulo, tiempos) == []
+        assert tiempos["__total__"] > 0
+
+
+def test_traza_de_extremo_a_extremo(pipeline_simulado, tmp_path):
+    import tracing
+    from server import TracingInterceptor
+
+    ruta = tmp_path / "trazas.jsonl"
+    tracing.configure("prueba", path=str(ruta), sample_rate=1.0)
+    with patch("server.pipeline", return_value=pipeline_simulado):
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=4),
+            interceptors=[TracingInterceptor(), AdmissionInterceptor(AdmissionController())],
+        )
+        sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(SentimentService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        stub = sentiment_pb2_grpc.SentimentServiceStub(grpc.insecure_channel(f"127.0.0.1:{port}"))
+        with tracing.span("ui", kind="CLIENT"):
+            raiz = tracing.current()
+            stub.Predict(sentiment_pb2.PredictRequest(text="hola"), metadata=tracing.inject())
+        # Una traza nueva no muestreada propaga la decisión y el servidor no registra nada
+        tracing.configure("prueba", path=str(ruta), sample_rate=0.0)
+        with tracing.span("ui"):
+            stub.Predict(sentiment_pb2.PredictRequest(text="hola"), metadata=tracing.inject())
+    finally:
+        server.stop(None)
+        tracing.configure("sin_configurar")
+
+    spans = {s["name"]: s for s in map(json.loads, ruta.read_text(encoding="utf-8").splitlines())}
+    assert set(spans) == {"ui", "rpc Predict", "cola_admision", "cola_planificador", "modelo"}
+    assert {s["traceId"] for s in spans.values()} == {raiz.trace_id}
+    assert spans["rpc Predict"]["parentId"] == raiz.span_id
+    assert spans["modelo"]["parentId"] == spans["rpc Predict"]["id"]  # cruza al hilo del planificador
+    assert spans["cola_planificador"]["tags"]["lane"] == "interactive"
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-" + "1" * 16 + "-01") is None
+
+
+def test_perfil_bajo_demanda(pipeline_simulado, monkeypatch):
+    import profiler
+
+    def bucle_de_inferencia_costoso(inputs):
+        fin = time.perf_counter() + 0.02  # > intervalo de cambio del GIL, para que el muestreo lo vea
+        while time.perf_counter() < fin:
+            pass
+        return pipeline_simulado(inputs)
+
+    contexto = MagicMock()
+    contexto.abort.side_effect = grpc.RpcError
+    with patch("server.pipeline", return_value=bucle_de_inferencia_costoso):
+        apagado = SentimentService()
+        monkeypatch.setenv("ML_PROFILING", "1")
+        servicio = SentimentService()
+    with pytest.raises(grpc.RpcError):
+        apagado.Profile(sentiment_pb2.ProfileRequest(seconds=0.1), contexto)
+    assert contexto.abort.call_args[0][0] == grpc.StatusCode.FAILED_PRECONDITION
+
+    parar = threading.Event()
+
+    def trafico():
+        while not parar.is_set():
+            servicio.Predict(sentiment_pb2.PredictRequest(text="hola"), None)
+
+    hilo = threading.Thread(target=trafico, name="trafico")
+    hilo.start()
+    try:
+        with futures.ThreadPoolExecutor(2) as pool:
+            primero = pool.submit(servicio.Profile, sentiment_pb2.ProfileRequest(seconds=0.5, interval_ms=2), contexto)
+            time.sleep(0.1)
+            with pytest.raises(grpc.RpcError):  # sólo un perfil a la vez
+                servicio.Profile(sentiment_pb2.ProfileRequest(seconds=0.1), contexto)
+            assert contexto.abort.call_args[0][0] == grpc.StatusCode.ABORTED
+            resp = primero.result(5)
+    finally:
+        parar.set()
+        hilo.join()
+
+    assert resp.samples > 10 and resp.seconds >= 0.5
+    pilas = resp.python_folded.splitlines()
+    assert any("bucle_de_inferencia_costoso" in p for p in pilas)
+    assert all(p.rsplit(" ", 1)[1].isdigit() for p in pilas)
+    assert not profiler.operators.active
+
+
+def test_perfil_de_operadores_con_forwards_concurrentes(modelo_diminuto, monkeypatch):
+    import profiler
+    from transformers import pipeline as hf_pipeline
+
+    tokenizer, model = modelo_diminuto
+    clf = hf_pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+    monkeypatch.setenv("ML_PROFILING", "1")
+    with patch("server.pipeline", return_value=clf):
+        servicio = SentimentService()
+
+    import torch
+
+    errores = []
+    parar = threading.Event()
+
+    def trafico(rpc, solicitud):
+        while not parar.wait(0.005):
+            try:
+                rpc(solicitud, MagicMock())
+            except Exception as e:  # un fallo del perfilador rompería RPC en vivo
+                errores.append(e)
+                return
+
+    # Forwards más largos por el mismo camino (capture()), para que se solapen de verdad entre hilos
+    pesado = torch.nn.Sequential(*[torch.nn.Linear(256, 256) for _ in range(8)])
+    entrada = torch.randn(64, 256)
+
+    def forward_pesado(_solicitud, _contexto):
+        with profiler.operators.capture(), torch.inference_mode():
+            pesado(entrada)
+
+    hilos = [
+        threading.Thread(target=trafico, args=(servicio.Predict, sentiment_pb2.PredictRequest(text="me encanta este lugar"))),
+        threading.Thread(target=trafico, args=(servicio.Predict, sentiment_pb2.PredictRequest(text="malo"))),
+        threading.Thread(target=trafico, args=(servicio.Analyze, sentiment_pb2.AnalyzeRequest(text="La comida malo. Amo este lugar"))),
+        threading.Thread(target=trafico, args=(servicio.Analyze, sentiment_pb2.AnalyzeRequest(text="El servicio malo"))),
+        threading.Thread(target=trafico, args=(forward_pesado, None)),
+    ]
+    for hilo in hilos:
+        hilo.start()
+    try:
+        resultados = [profiler.profile_process(0.3, 0.02) for _ in range(2)]
+    finally:
+        parar.set()
+        for hilo in hilos:
+            hilo.join()
+
+    assert errores == []
+    assert all("aten::" in r["torch_table"] for r in resultados)
+    assert not profiler.operators.active
+
+    # Una sola sesión para todo el proceso: se cuentan los forwards de todos los hilos
+    profiler.operators.start()
+    try:
+        hilos = [
+            threading.Thread(target=lambda: [forward_pesado(None, None) for _ in range(50)])
+            for _ in range(4)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    finally:
+        _, llamadas = profiler.operators.stop()
+    assert llamadas["aten::addmm"] == 4 * 50 * 8
+
+
+def test_analisis_por_aspectos_con_cada_frase_una_vez():
+    from aspects import DEFAULT_ASPECTS, AspectAnalyzer, aspect_spans, compile_lexicon
+
+    texto = "Me encanta la comida. El servicio malo, la mesera nos ignoró. Amo este lugar"
+    spans = aspect_spans(texto, compile_lexicon(DEFAULT_ASPECTS))
+    assert set(spans) == {"comida", "servicio", "ambiente"}
+    assert texto[slice(*spans["servicio"][0])].strip() == "El servicio malo, la mesera nos ignoró"
+
+    # Clasificador etiquetado por palabras clave: la etiqueta de cada aspecto sale de sus frases
+    lotes = []
+
+    def clasificador(textos):
+        lotes.append(list(textos))
+        return [
+            {"label": "NEG", "score": 0.9} if "malo" in t
+            else {"label": "POS", "score": 0.8} if ("encanta" in t or "Amo" in t)
+            else {"label": "NEU", "score": 0.6}
+            for t in textos
+        ]
+
+    with patch("server.pipeline", return_value=clasificador):
+        servicio = SentimentService()
+    resp = servicio.Analyze(sentiment_pb2.AnalyzeRequest(text=texto), MagicMock())
+
+    # Un único lote con cada frase una sola vez: ni la reseña completa ni frases repetidas
+    assert lotes == [["Me encanta la comida", "El servicio malo, la mesera nos ignoró", "Amo este lugar"]]
+    assert servicio.scheduler.snapshot()["sched_interactive_items"] == 1  # un envío al planificador
+    # Global: NEG pesa 38 x 0.9 frente a POS (20 + 14) x 0.8
+    assert (resp.label, resp.score) == ("NEG", pytest.approx(0.9))
+    assert [(a.aspect, a.label) for a in resp.aspects] == [("comida", "POS"), ("servicio", "NEG"), ("ambiente", "POS")]
+    assert resp.aspects[1].evidence == "El servicio malo, la mesera nos ignoró"
+    assert resp.aspects[1].mentions == 1
+
+    # Una frase con dos aspectos y frases repetidas entre reseñas se clasifican una sola vez
+    lotes.clear()
+    analizador = AspectAnalyzer(clasificador)
+    r1, r2 = analizador.analyze(["La comida es cara. Amo este lugar", "Amo este lugar. Servicio malo"])
+    assert lotes == [["La comida es cara", "Amo este lugar", "Servicio malo"]]
+    assert {a["aspect"]: a["label"] for a in r1["aspects"]} == {"comida": "NEU", "precio": "NEU", "ambiente": "POS"}
+    assert r1["label"] == "POS" and r2["label"] == "NEG"  # 14 x 0.8 > 17 x 0.6; 13 x 0.9 > 14 x 0.8
+    assert analizador.analyze([""])[0]["label"] == "NEU"  # sin frases: el texto entero
+
+
+def test_analisis_por_aspectos_igual_que_predict(modelo_diminuto):
+    from transformers import pipeline as hf_pipeline
+
+    tokenizer, model = modelo_diminuto
+    clf = hf_pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+    with patch("server.pipeline", return_value=clf):
+        servicio = SentimentService()
+    resp = servicio.Analyze(sentiment_pb2.AnalyzeRequest(text="me encanta este lugar. amo. malo"), MagicMock())
+
+    # Cada frase sale del mismo forward que Predict sobre ella; aspecto y global las combinan
+    esperado = {
+        f: servicio.Predict(sentiment_pb2.PredictRequest(text=f), MagicMock())
+        for f in ("me encanta este lugar", "amo", "malo")
+    }
+    assert [a.aspect for a in resp.aspects] == ["ambiente"]
+    assert resp.aspects[0].label == esperado["me encanta este lugar"].label
+    assert resp.aspects[0].score == pytest.approx(esperado["me encanta este lugar"].score, abs=1e-3)  # padding del lote
+    votos = {}
+    for f, r in esperado.items():
+        votos[r.label] = votos.get(r.label, 0) + len(f) * r.score
+    assert resp.label == max(votos, key=votos.get)
+
+
+def test_resumen_de_corpus_en_stream_con_cache(pipeline_simulado, tmp_path):
+    import client
+
+    quejas = [
+        "La comida llegó fría y tardaron una hora. El mesero fue muy amable.",
+        "Tardaron muchísimo en atender la mesa y la comida llegó fría.",
+        "Precios carísimos para porciones pequeñas. El lugar es bonito.",
+        "Excelente atención del personal, volveremos pronto con la familia.",
+    ] * 50
+    etiquetas = ["NEG", "NEG", "NEG", "POS"] * 50
+
+    with patch("server.pipeline", return_value=pipeline_simulado):
+        servicio = SentimentService()
+    servicio.summary_sample = 100  # memoria acotada: se resume una muestra del corpus
+    control = AdmissionController(name="bulk")
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), interceptors=[AdmissionInterceptor(control)])
+    sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(servicio, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        stub = sentiment_pb2_grpc.SentimentServiceStub(grpc.insecure_channel(f"127.0.0.1:{port}"))
+        frases, cacheado = client.summarize_corpus(stub, quejas, etiquetas, label="negative", sentences=2, chunk=30)
+        assert not cacheado and len(frases) == 2
+        assert not any("Excelente" in f for f in frases)  # filtrado por etiqueta
+        assert len(set(frases)) == 2
+
+        # Mismo corpus: responde desde la caché con el hash del primer mensaje
+        assert client.summarize_corpus(stub, quejas, etiquetas, label="NEG", sentences=2) == (frases, True)
+        # Las etiquetas enviadas forman parte del corpus: con otras, otro resumen
+        _, cacheado = client.summarize_corpus(stub, quejas, ["POS"] * len(quejas), label="NEG", sentences=2)
+        assert not cacheado
+        # El stream de cliente pasa por el carril bulk del control de admisión
+        assert control.snapshot()["admission_bulk_accepted"] == 3
+
+        ruta = tmp_path / "resenas.csv"
+        ruta.write_text("texto\n" + "\n".join(f'"{q}"' for q in quejas), encoding="utf-8")
+        req = sentiment_pb2.SummarizeCorpusRequest(file_path=str(ruta), sentences=1)
+        resp = stub.SummarizeCorpus(iter([req]))
+        assert resp.texts == 200 and resp.matched == 200 and resp.sampled == 100 and not resp.cached
+        assert stub.SummarizeCorpus(iter([req])).cached
+
+        resumen = client.summarize(stub, quejas[0] + " " + quejas[2], sentences=1)
+        assert len(resumen) == 1 and resumen[0] in quejas[0] + " " + quejas[2]
+        assert stub.Stats(sentiment_pb2.StatsRequest()).counters["summary_cache_hits"] == 2
+
+        # Un hash desconocido sin textos no se resume a vacío
+        with pytest.raises(grpc.RpcError) as error:
+            stub.SummarizeCorpus(iter([sentiment_pb2.SummarizeCorpusRequest(corpus_hash="desconocido")]))
+        assert error.value.code() == grpc.StatusCode.NOT_FOUND
+    finally:
+        server.stop(None)
+
+
+def test_embeddings_e_indice_de_similitud_persistido(modelo_diminuto, tmp_path, monkeypatch):
+    import numpy as np
+    from similarity import SimilarityIndex
+
+    tokenizer, model = modelo_diminuto
+    monkeypatch.setenv("ML_INDEX_PATH", str(tmp_path / "indice" / "resenas"))
+    textos = ["me encanta este lugar", "malo", "amo este lugar", "me encanta este lugar"]
+    with patch("server.pipeline", return_value=MagicMock(tokenizer=tokenizer, model=model)):
+        servicio = SentimentService()
+    req = sentiment_pb2.PredictBatchRequest(texts=textos, return_embeddings=True, add_to_index=True)
+    resp = servicio.PredictBatch(req, MagicMock())
+
+    assert resp.unique_texts == 3 and list(resp.index_ids) == [0, 1, 2, 0]
+    # Reindexar los mismos textos no duplica filas: devuelve los ids existentes
+    otra = servicio.PredictBatch(sentiment_pb2.PredictBatchRequest(texts=["malo", "amo"], add_to_index=True), MagicMock())
+    assert list(otra.index_ids) == [1, 3] and len(servicio.index) == 4
+    vectores = np.array([e.values for e in resp.embeddings])
+    assert vectores.shape == (4, model.config.hidden_size)
+    assert np.allclose(np.linalg.norm(vectores, axis=1), 1.0, atol=1e-5)
+    assert np.allclose(vectores[0], vectores[3])
+    assert list(resp.labels) == [r["label"] for r in servicio.embedder.classify(textos)]
+
+    # Tras reiniciar, el índice se reabre del disco sin recalcular embeddings
+    with patch("server.pipeline", return_value=MagicMock(tokenizer=tokenizer, model=model)):
+        reiniciado = SentimentService()
+    llamadas = []
+    model.register_forward_hook(lambda *args: llamadas.append(1))
+    similares = reiniciado.FindSimilar(sentiment_pb2.FindSimilarRequest(text="me encanta este lugar", k=2), MagicMock())
+    assert len(llamadas) == 1  # sólo el embedding de la consulta
+    assert similares.index_size == 4
+    assert similares.matches[0].text == "me encanta este lugar"
+    assert similares.matches[0].score == pytest.approx(1.0, abs=1e-5)
+    assert len(similares.matches) == 2
+    # min_score sin fijar no filtra vecinos con similitud negativa
+    todos = reiniciado.FindSimilar(sentiment_pb2.FindSimilarRequest(text="malo", k=4), MagicMock())
+    assert len(todos.matches) == 4
+
+    # Crecimiento del archivo mapeado y descarte de un alta no confirmada
+    indice = SimilarityIndex(str(tmp_path / "otro"), dim=2, initial_capacity=2)
+    assert indice.add([[1, 0], [0, 1], [0.6, 0.8]], ["a", "b", "c"]) == [0, 1, 2]
+    with open(str(tmp_path / "otro.jsonl"), "a", encoding="utf-8") as f:
+        f.write('"sin confirmar"\n')
+    reabierto = SimilarityIndex(str(tmp_path / "otro"), dim=2)
+    assert len(reabierto) == 3 and reabierto.capacity >= 4
+    assert reabierto.search([1, 0], k=2, exclude=[0]) == [(2, pytest.approx(0.6), "c"), (1, 0.0, "b")]
+    assert reabierto.add([[1, 0]], ["d"]) == [3] and reabierto.texts[3] == "d"
+    assert reabierto.add([[0, 1], [1, 0], [0, 1]], ["b", "e", "e"]) == [1, 4, 4] and len(reabierto) == 5
+    assert reabierto.search([-1, 0], k=5) == reabierto.search([-1, 0], k=5, min_score=-1.0)
+
+
+def test_grabacion_y_replay_de_trafico(pipeline_simulado, tmp_path, monkeypatch):
+    import replay
+    from recorder import RecorderInterceptor, TrafficRecorder, text_hash
+
+    monkeypatch.setenv("ML_JOBS_DIR", str(tmp_path / "jobs"))
+    grabadora = TrafficRecorder(str(tmp_path / "trafico.jsonl"))
+    with patch("server.pipeline", return_value=pipeline_simulado):
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=4),
+            interceptors=[RecorderInterceptor(grabadora), AdmissionInterceptor(AdmissionController())],
+        )
+        sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(SentimentService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        stub = sentiment_pb2_grpc.SentimentServiceStub(grpc.insecure_channel(f"127.0.0.1:{port}"))
+        stub.Predict(sentiment_pb2.PredictRequest(text="hola"))
+        stub.PredictBatch(sentiment_pb2.PredictBatchRequest(texts=["bueno", "malo", "bueno"]))
+        stub.Ping(sentiment_pb2.PingRequest())  # administración: no se graba
+        with pytest.raises(grpc.RpcError):
+            stub.GetJobStatus(sentiment_pb2.JobStatusRequest(job_id="no-existe"))
+        stub.Summarize(sentiment_pb2.SummarizeRequest(text="Muy rico todo. El mesero tardó.", sentences=1))
+        with pytest.raises(grpc.RpcError):  # pre-tokenizado sin ML_PIPELINED
+            stub.PredictBatch(sentiment_pb2.PredictBatchRequest(token_ids=[sentiment_pb2.TokenIds(ids=[2, 5, 3])]))
+
+        entradas = replay.load_capture(grabadora.path)
+        assert [e["rpc"] for e in entradas] == ["Predict", "PredictBatch", "GetJobStatus", "Summarize", "PredictBatch"]
+        assert entradas[1]["len"] == [5, 4, 5] and entradas[1]["h"][0] == text_hash("bueno") == entradas[1]["h"][2]
+        assert "texts" not in entradas[0] and entradas[2]["code"] == "NOT_FOUND"
+        assert grabadora.snapshot() == {"recorder_rpcs": 5.0}
+
+        # Campos que no son texto: se graban y reconstruyen; lo no reproducible queda marcado
+        assert "req" not in entradas[0] and entradas[3]["req"] == {"sentences": 1}
+        assert entradas[2]["replay"] is False and entradas[2]["req"] == {"job_id": "no-existe"}
+        assert entradas[4]["replay"] is False and "token_ids" not in entradas[4].get("req", {})
+        resumen = replay.build_request(sentiment_pb2, "Summarize", ["texto"], entradas[3]["req"])
+        assert resumen == sentiment_pb2.SummarizeRequest(text="texto", sentences=1)
+        indexar = replay.build_request(sentiment_pb2, "PredictBatch", ["a", "b"], {"add_to_index": True})
+        assert list(indexar.texts) == ["a", "b"] and indexar.add_to_index
+        assert replay.build_request(sentiment_pb2, "SubmitJob", ["a"]) is None  # stream
+
+        # Textos sintéticos deterministas con la longitud original
+        sinteticos = replay.entry_texts(entradas[1])
+        assert [len(t) for t in sinteticos] == [5, 4, 5] and sinteticos[0] == sinteticos[2]
+
+        crudo = replay.replay(entradas, stub, sentiment_pb2, speed=0, log=lambda *_: None)
+        reporte = replay.summarize(crudo, label="local", speed=0)
+    finally:
+        server.stop(None)
+
+    assert set(reporte["rpcs"]) == {"Predict", "PredictBatch", "Summarize"}  # GetJobStatus no es reproducible
+    assert reporte["rpcs"]["PredictBatch"]["ok"] == 1 and reporte["rpcs"]["PredictBatch"]["texts_per_s"] > 0
+    assert "PredictBatch" in replay.compare(reporte, reporte)
+    assert replay.max_concurrency([{"t": 0, "ms": 100}, {"t": 0.05, "ms": 10}, {"t": 0.2, "ms": 1}]) == 2
+
+
+def test_balanceo_entre_replicas_con_afinidad_y_failover():
+    import balancer
+    import client
+
+    def replica(nombre):
+        def fake(inputs):
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            return [{"label": f"{nombre}:{t}", "score": 0.5} for t in inputs]
+
+        with patch("server.pipeline", return_value=fake):
+            server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+            sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(SentimentService(), server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        return server, f"127.0.0.1:{port}"
+
+    (s1, a1), (s2, a2) = replica("a"), replica("b")
+    lb = balancer.Balancer(f"{a1}, {a2}", check_interval=0)
+    try:
+        assert lb.check_health() == {a1: True, a2: True}
+        # Hash consistente: el mismo texto siempre a la misma réplica
+        duenos = {lb.stub.Predict(sentiment_pb2.PredictRequest(text="hola")).label for _ in range(5)}
+        assert len(duenos) == 1
+
+        # Lote repartido entre ambas réplicas, en orden y cada texto en su réplica dueña
+        textos = [f"reseña {i}" for i in range(200)]
+        pares = client.predict_batch(lb.stub, textos, chunk=16)
+        assert [label.split(":", 1)[1] for label, _ in pares] == textos
+        assert {label.split(":")[0] for label, _ in pares} == {"a", "b"}
+        dueno = {a1: "a", a2: "b"}
+        assert all(label.startswith(dueno[lb.candidates(t)[0].addr]) for t, (label, _) in zip(textos, pares))
+
+        # Round robin alterna réplicas
+        rr = balancer.Balancer([a1, a2], mode="round_robin", check_interval=0)
+        assert len({rr.stub.Predict(sentiment_pb2.PredictRequest(text="hola")).label for _ in range(4)}) == 2
+        rr.close()
+
+        # Failover: la réplica caída se marca y sus textos pasan a la otra
+        s2.stop(None)
+        assert [label[0] for label, _ in client.predict_batch(lb.stub, textos, chunk=16)] == ["a"] * len(textos)
+        assert lb.snapshot()[a2]["healthy"] is False and lb.snapshot()[a2]["failures"] >= 1
+        assert lb.check_health() == {a1: True, a2: False}
+    finally:
+        lb.close()
+        s1.stop(None)
+        s2.stop(None)
+
+    # Al quitar un nodo del anillo sólo se mueven las claves que eran suyas
+    tres, dos = balancer.HashRing(["x", "y", "z"]), balancer.HashRing(["x", "y"])
+    claves = [str(i) for i in range(1000)]
+    movidas = [k for k in claves if tres.owners(k)[0] != dos.owners(k)[0]]
+    assert movidas and all(tres.owners(k)[0] == "z" for k in movidas)
+    with pytest.raises(ValueError):
+        balancer.Balancer("", check_interval=0)
+
+
+def test_balanceo_de_rpc_con_estado(modelo_diminuto, tmp_path):
+    import time
+
+    import balancer
+    import client
+    from transformers import pipeline as hf_pipeline
+
+    tokenizer, model = modelo_diminuto
+    clf = hf_pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+    servicios, servidores, direcciones = [], [], []
+    for nombre in ("a", "b"):
+        with patch("server.pipeline", return_value=clf):
+            servicio = SentimentService()
+        servicio.jobs_dir = str(tmp_path / nombre / "jobs")  # cada réplica con su propio disco
+        servicio.index_path = str(tmp_path / nombre / "indice" / "resenas")
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(servicio, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        servicios.append(servicio)
+        servidores.append(server)
+        direcciones.append(f"127.0.0.1:{port}")
+
+    # Round robin es el peor caso: sin fijar réplica, la mitad de las consultas irían a la otra
+    lb = balancer.Balancer(direcciones, mode="round_robin", check_interval=0)
+    try:
+        job_id = client.submit_job(lb.stub, ["me encanta este lugar", "malo", "amo"])
+        for _ in range(200):
+            estado, hechos, total = client.job_status(lb.stub, job_id)
+            if estado in ("done", "failed"):
+                break
+            time.sleep(0.02)
+        assert (estado, hechos, total) == ("done", 3, 3)
+        assert len(list(client.fetch_results(lb.stub, job_id))) == 3
+
+        # Altas y búsquedas del índice van a la misma réplica, la dueña de INDEX_KEY
+        for texto in ("me encanta este lugar", "malo", "amo este lugar"):
+            client.index_texts(lb.stub, [texto])
+        dueno = direcciones.index(lb.ring.owners(balancer.INDEX_KEY)[0])
+        for _ in range(2):
+            similares = client.find_similar(lb.stub, "malo", k=5)
+            assert len(similares) == 3 and similares[0][2] == "malo"
+        assert len(servicios[dueno].index) == 3 and servicios[1 - dueno]._index is None
+    finally:
+        lb.close()
+        for server in servidores:
+            server.stop(None)
+
+
+def _trabajador_simulado(worker_id, events, drain):
+    events.put(("ready", worker_id, os.getpid(), ""))
+    drain.wait()
+
+
+def test_watchdog_de_memoria_y_lotes_por_tramos(pipeline_simulado, monkeypatch):
+    from memory import MemoryWatchdog, WatchdogInterceptor, batch_slices, rss_bytes
+
+    assert rss_bytes() > 0
+    assert list(batch_slices(["aaaa", "bb", "cccccc", "d"], 6)) == [(0, 2), (2, 3), (3, 4)]
+
+    avisos = []
+    vigilante = MemoryWatchdog(max_rss_mb=1, batch_max_chars=1000, on_limit=avisos.append)
+    assert vigilante.check().startswith("rss") and vigilante.check()
+    assert len(avisos) == 1 and vigilante.trims == 1
+    assert vigilante.batch_budget() == 100  # sin margen: 10% del máximo
+    assert vigilante.snapshot()["worker_recycling"] == 1.0
+
+    por_rpc = MemoryWatchdog(max_requests=2, on_limit=avisos.append)
+    interceptor = WatchdogInterceptor(por_rpc)
+    for metodo in ("Predict", "Ping", "PredictBatch"):
+        interceptor.intercept_service(lambda d: None, MagicMock(method=f"/sentiment.SentimentService/{metodo}"))
+    assert por_rpc.requests == 2 and por_rpc.check() == "2 RPC >= 2"
+
+    # Un PredictBatch grande se procesa por tramos acotados, con el mismo resultado
+    monkeypatch.setenv("ML_BATCH_MAX_CHARS", "20")
+    llamadas = []
+
+    def pipeline_contado(inputs):
+        llamadas.append(len(inputs))
+        return pipeline_simulado(inputs)
+
+    with patch("server.pipeline", return_value=pipeline_contado):
+        servicio = SentimentService()
+    textos = [f"reseña número {i}" for i in range(10)]
+    resp = servicio.PredictBatch(sentiment_pb2.PredictBatchRequest(texts=textos), None)
+    assert list(resp.labels) == ["POSITIVE"] * 10 and sum(llamadas) == 10
+    stats = servicio.Stats(sentiment_pb2.StatsRequest(), None).counters
+    assert stats["batch_slices"] == 10 and stats["worker_rss_mb"] > 0
+
+
+def test_supervisor_recicla_sin_cortes_y_relanza_caidos():
+    from supervisor import Supervisor
+
+    supervisor = Supervisor(processes=1, target=_trabajador_simulado, log=lambda *_: None)
+    hilo = threading.Thread(target=supervisor.run)
+    hilo.start()
+
+    def esperar(condicion, timeout=60):
+        fin = time.time() + timeout
+        while time.time() < fin:
+            estado = supervisor.snapshot()
+            if condicion(estado):
+                return estado
+            time.sleep(0.05)
+        raise AssertionError(f"timeout: {supervisor.snapshot()}")
+
+    try:
+        inicial = esperar(lambda e: [w["state"] for w in e.values()] == ["serving"])
+        (viejo,) = inicial
+        supervisor.events.put(("limit", 0, viejo, "rss 9999 MB > 1 MB"))
+        # El viejo sigue sirviendo hasta que el reemplazo está listo; luego drena y sale
+        nuevo = esperar(lambda e: viejo not in e and [w["state"] for w in e.values()] == ["serving"])
+        assert supervisor.recycled == 1
+        (pid,) = nuevo
+        supervisor.workers[pid]["process"].terminate()
+        esperar(lambda e: pid not in e and [w["state"] for w in e.values()] == ["serving"])
+        assert supervisor.restarts == 1
+    finally:
+        supervisor.stop()
+        hilo.join(timeout=60)
+    assert not hilo.is_alive() and supervisor.workers == {}
+
+
+def _trabajador_uds(worker_id, events, drain):
+    """
+    Trabajador real de supervisor.py con un pipeline simulado (sin descargar el modelo).
+    """
+    from supervisor import run_worker
+
+    def fake(inputs):
+        return [{"label": f"pid{os.getpid()}", "score": 0.95} for _ in (inputs if isinstance(inputs, list) else [inputs])]
+
+    with patch("server.pipeline", return_value=fake):
+        run_worker(worker_id, events, drain, address="127.0.0.1:0")
+
+
+def test_supervisor_recicla_y_el_socket_unix_sigue_respondiendo(tmp_path, monkeypatch):
+    from supervisor import Supervisor
+
+    uds = str(tmp_path / "ml.sock")
+    monkeypatch.setenv("ML_UDS_PATH", uds)
+    monkeypatch.setenv("ML_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("ML_SCHEDULER", "0")
+    supervisor = Supervisor(processes=1, target=_trabajador_uds, log=lambda *_: None)
+    hilo = threading.Thread(target=supervisor.run)
+    hilo.start()
+
+    def esperar(condicion, timeout=60):
+        fin = time.time() + timeout
+        while time.time() < fin:
+            estado = supervisor.snapshot()
+            if condicion(estado):
+                return estado
+            time.sleep(0.05)
+        raise AssertionError(f"timeout: {supervisor.snapshot()}")
+
+    def predecir(ruta):
+        with grpc.insecure_channel(f"unix:{ruta}") as canal:
+            stub = sentiment_pb2_grpc.SentimentServiceStub(canal)
+            return stub.Predict(
+                sentiment_pb2.PredictRequest(text="hola"), timeout=10, metadata=(("x-client-id", "test"),)
+            ).label
+
+    try:
+        (viejo,) = esperar(lambda e: [w["state"] for w in e.values()] == ["serving"])
+        assert predecir(uds) == predecir(f"{uds}.0") == f"pid{viejo}"
+
+        supervisor.events.put(("limit", 0, viejo, "reciclado de prueba"))
+        (nuevo,) = esperar(lambda e: viejo not in e and [w["state"] for w in e.values()] == ["serving"])
+        # El viejo borró su propio socket al drenar; la ruta común apunta al reemplazo
+        assert predecir(uds) == predecir(f"{uds}.0") == f"pid{nuevo}"
+        assert not os.path.exists(f"{uds}.0.{viejo}")
+    finally:
+        supervisor.stop()
+        hilo.join(timeout=60)
+    assert not hilo.is_alive()
+
+
+def test_microbenchmarks_y_deteccion_de_regresiones():
+    import copy
+
+    import benchmarks
+
+    reporte = benchmarks.run_suite("fake", quick=True, rounds=1, log=lambda *_: None)
+    casos = reporte["results"]
+    assert {"handler_predict", "handler_predict_batch_100", "proto_request_decode_1000",
+            "client_predict_batch_balanced_1000"} <= set(casos)
+    assert all(r["min_s"] > 0 and r["calibration_s"] > 0 for r in casos.values())
+
+    assert not any(fila[4] for fila in benchmarks.compare(reporte, reporte))
+    # Una línea base el doble de rápida hace saltar todos los casos
+    rapida = copy.deepcopy(reporte)
+    for r in rapida["results"].values():
+        r["min_s"] /= 2
+    filas = benchmarks.compare(reporte, rapida, threshold=0.3, min_baseline_s=0)
+    assert len(filas) == len(casos) and all(f[4] and f[3] == pytest.approx(2.0) for f in filas)
+    # Por debajo del suelo de ruido el caso se lista pero no se evalúa
+    filas = dict((f[0], f[4]) for f in benchmarks.compare(reporte, rapida, threshold=0.3, min_baseline_s=1e-3))
+    assert all(filas[n] is (None if rapida["results"][n]["min_s"] < 1e-3 else True) for n in casos)
+    assert filas["proto_request_encode_1"] is None
+
+    # Una nueva medida más rápida reemplaza a la marcada; una más lenta no
+    lenta = copy.deepcopy(reporte)
+    benchmarks.keep_best(lenta, rapida)
+    assert lenta["results"] == rapida["results"]
+    benchmarks.keep_best(lenta, reporte)
+    assert lenta["results"] == rapida["results"]
+
+
+def test_socket_unix_y_lotes_por_memoria_compartida(pipeline_simulado, monkeypatch):
+    import tempfile
+
+    import client
+    import shm
+    from server import build_server
+
+    # Anillo: reutiliza el espacio liberado, da la vuelta y bloquea si no hay sitio
+    anillo = shm.ShmRing(size=64)
+    try:
+        a, b = anillo.reserve(24), anillo.reserve(24)
+        assert (a, b) == (0, 24)
+        bloqueado = threading.Thread(target=lambda: anillo.reserve(24), daemon=True)
+        bloqueado.start()
+        bloqueado.join(0.1)
+        assert bloqueado.is_alive()  # sólo quedan 16 bytes libres al final
+        anillo.release(a)  # libera [0, 24): el hueco da la vuelta al inicio
+        bloqueado.join(5)
+        assert not bloqueado.is_alive() and anillo._head == 24
+        with pytest.raises(ValueError):
+            anillo.reserve(128)
+    finally:
+        anillo.close()
+
+    # Caché de segmentos: uno desalojado mientras se usa se cierra al soltarlo, no antes
+    segmentos = [shm.ShmRing(size=64) for _ in range(2)]
+    try:
+        cache = shm.SegmentCache(maxsize=1)
+        with cache.use(segmentos[0].name) as buf:
+            with cache.use(segmentos[1].name):
+                pass  # desaloja el primero, que sigue en uso
+            buf[0] = 7
+            assert segmentos[0].buf[0] == 7
+        assert list(cache._segments) == [segmentos[1].name]
+    finally:
+        for segmento in segmentos:
+            segmento.close()
+
+    carpeta = tempfile.mkdtemp(prefix="ml-")  # ruta corta: los sockets Unix admiten ~100 caracteres
+    socket = os.path.join(carpeta, "s.sock")
+    monkeypatch.setenv("ML_UDS_PATH", socket)
+    monkeypatch.setenv("ML_SHM", "1")
+    monkeypatch.setenv("ML_SHM_SEGMENTS", "1")
+    monkeypatch.setenv("ML_JOBS_DIR", os.path.join(carpeta, "jobs"))
+    with patch("server.pipeline", return_value=pipeline_simulado):
+        server, servicio = build_server("127.0.0.1:0", resume_jobs=False)
+    server.start()
+    predictor = client.make_shm_predictor(socket, size=1 << 20)
+    try:
+        textos = ["¡Qué rico! 🌮", "", "malo", "¡Qué rico! 🌮"] * 50
+        assert predictor.predict_batch(textos) == [("POSITIVE", pytest.approx(0.95))] * len(textos)
+        stats = servicio.Stats(sentiment_pb2.StatsRequest(), None).counters
+        assert stats["shm_texts"] == len(textos) and stats["batch_unique_texts"] == 3
+
+        # Más clientes que ML_SHM_SEGMENTS a la vez: los desalojos no rompen lotes en curso
+        otros = [client.make_shm_predictor(socket, size=1 << 20) for _ in range(3)]
+        try:
+            with futures.ThreadPoolExecutor(len(otros)) as pool:
+                resultados = list(pool.map(lambda p: [p.predict_batch(textos) for _ in range(20)], otros))
+            assert all(r == [("POSITIVE", pytest.approx(0.95))] * len(textos) for rs in resultados for r in rs)
+        finally:
+            for otro in otros:
+                otro.close()
+
+        # Por el socket Unix también funcionan los RPC normales
+        local = client.make_stub(f"unix:{socket}")
+        assert client.ping(local) == "ok"
+
+        # Descriptor fuera del segmento
+        with pytest.raises(grpc.RpcError) as err:
+            local.PredictShm(sentiment_pb2.ShmBatchRequest(segment=predictor.ring.name, offset=1 << 21, size=64, count=1))
+        assert err.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+    finally:
+        predictor.close()
+        server.stop(None)
+
+    # Por TCP se rechaza aunque ML_SHM=1
+    contexto = MagicMock()
+    contexto.peer.return_value = "ipv4:127.0.0.1:5000"
+    contexto.abort.side_effect = grpc.RpcError
+    with pytest.raises(grpc.RpcError):
+        servicio.PredictShm(sentiment_pb2.ShmBatchRequest(segment="x"), contexto)
+    assert contexto.abort.call_args[0][0] == grpc.StatusCode.PERMISSION_DENIED
+
+
+def _pipeline_por_longitud(inputs):
+    textos = inputs if isinstance(inputs, list) else [inputs]
+    return [{"label": "POS" if len(t) % 2 == 0 else "NEG", "score": len(t) / 100} for t in textos]
+
+
+def _servicio_offline():
+    with patch("server.pipeline", return_value=_pipeline_por_longitud):
+        return SentimentService()
+
+
+def test_puntuacion_offline_por_procesos_con_checkpoint(tmp_path, monkeypatch):
+    import pyarrow.parquet as pq
+
+    from batch_score import MANIFEST, done_parts, score_file
+
+    monkeypatch.setenv("ML_SCHEDULER", "0")
+    textos = ["x" * ((i * 7) % 23 + 1) for i in range(50)]
+    entrada = tmp_path / "resenas.csv"
+    entrada.write_text("texto\n" + "\n".join(textos) + "\n", encoding="utf-8")
+    salida = str(tmp_path / "salida")
+
+    def comprobar():
+        tabla = pq.read_table(salida).sort_by("row").to_pydict()
+        assert tabla["row"] == list(range(len(textos)))
+        assert tabla["texto"] == textos
+        assert tabla["label"] == ["POS" if len(t) % 2 == 0 else "NEG" for t in textos]
+        assert tabla["score"] == pytest.approx([len(t) / 100 for t in textos])
+
+    # Dos procesos, bloques de 8 y lotes por longitud de 3: el orden original se conserva
+    stats = score_file(str(entrada), salida, processes=2, chunk_size=8, batch_size=3,
+                       with_text=True, service_factory=_servicio_offline, log=lambda *_: None)
+    assert stats["texts_scored"] == 50 and stats["chunks"] == 7
+    comprobar()
+
+    # Interrupción simulada: faltan dos partes y se retoman sólo esas
+    for indice in (2, 5):
+        os.remove(os.path.join(salida, f"part-{indice:06d}.parquet"))
+    assert done_parts(salida) == {0, 1, 3, 4, 6}
+    stats = score_file(str(entrada), salida, processes=1, chunk_size=8, batch_size=3,
+                       with_text=True, service_factory=_servicio_offline, log=lambda *_: None)
+    assert (stats["chunks"], stats["chunks_skipped"], stats["texts_scored"]) == (2, 5, 16)
+    comprobar()
+    with open(os.path.join(salida, MANIFEST), encoding="utf-8") as f:
+        assert json.load(f)["done"] is True
+
+    # Un checkpoint con otros parámetros no se mezcla
+    with pytest.raises(ValueError):
+        score_file(str(entrada), salida, processes=1, chunk_size=16, service_factory=_servicio_offline)
+
+
+class _ReplicaControlada(sentiment_pb2_grpc.SentimentServiceServicer):
+    """
+    Réplica de prueba: 'espera' simula una pausa (GC, réplica lenta) atenta a la cancelación y
+    'saturada' responde RESOURCE_EXHAUSTED con retry-after-ms esas veces.
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.espera = 0.0
+        self.saturada = 0
+        self.retry_after_ms = 100
+        self.cancelada = threading.Event()
+
+    def Predict(self, request, context):
+        if self.saturada:
+            self.saturada -= 1
+            context.set_trailing_metadata((("retry-after-ms", str(self.retry_after_ms)),))
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "servidor saturado")
+        limite = time.monotonic() + self.espera
+        while time.monotonic() < limite:
+            if not context.is_active():
+                self.cancelada.set()
+                return sentiment_pb2.PredictResponse()
+            time.sleep(0.01)
+        return sentiment_pb2.PredictResponse(label=self.nombre, score=0.5)
+
+    def Ping(self, request, context):
+        return sentiment_pb2.PingResponse(status="ok")
+
+
+def test_hedging_reintentos_y_plazos_en_el_cliente():
+    import balancer
+    import hedging
+
+    replicas, servidores, direcciones = [], [], []
+    for nombre in ("a", "b"):
+        replica = _ReplicaControlada(nombre)
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(replica, server)
+        direcciones.append(f"127.0.0.1:{server.add_insecure_port('127.0.0.1:0')}")
+        server.start()
+        replicas.append(replica)
+        servidores.append(server)
+    lenta, rapida = replicas
+
+    politica = hedging.CallPolicy(min_samples=5, hedge_ratio=1.0, backoff=0.01)
+    lb = balancer.Balancer(direcciones, check_interval=0, policy=politica)
+    try:
+        texto = next(t for t in (f"t{i}" for i in range(100)) if lb.candidates(t)[0].addr == direcciones[0])
+        solicitud = sentiment_pb2.PredictRequest(text=texto)
+        for _ in range(10):
+            assert lb.stub.Predict(solicitud).label == "a"
+        assert lb.hedger.hedge_delay("Predict") is not None
+
+        # Pausa en la réplica dueña: el duplicado a la otra gana y el original se cancela
+        lenta.espera = 3.0
+        inicio = time.monotonic()
+        assert lb.stub.Predict(solicitud).label == "b"
+        assert time.monotonic() - inicio < 1.5
+        assert lenta.cancelada.wait(2)
+        assert lb.hedger.snapshot()["hedges"] == 1 and lb.hedger.snapshot()["hedge_wins"] == 1
+        lenta.espera = 0.0
+
+        # Saturación: se reintenta respetando retry-after-ms
+        lenta.saturada = 1
+        inicio = time.monotonic()
+        assert lb.stub.Predict(solicitud).label in ("a", "b")
+        assert time.monotonic() - inicio >= 0.1 and lb.hedger.snapshot()["retries"] == 1
+    finally:
+        lb.close()
+
+    # Plazo: si la espera sugerida no cabe, se devuelve el error sin dormir; una réplica lenta agota el plazo
+    solo = balancer.Balancer(direcciones[:1], check_interval=0, policy=hedging.CallPolicy(deadline=0.3))
+    try:
+        lenta.saturada, lenta.retry_after_ms = 1, 1000
+        inicio = time.monotonic()
+        with pytest.raises(grpc.RpcError) as err:
+            solo.stub.Predict(sentiment_pb2.PredictRequest(text="x"))
+        assert err.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED and time.monotonic() - inicio < 0.3
+        lenta.espera = 1.0
+        with pytest.raises(grpc.RpcError) as err:
+            solo.stub.Predict(sentiment_pb2.PredictRequest(text="x"))
+        assert err.value.code() == grpc.StatusCode.DEADLINE_EXCEEDED
+    finally:
+        solo.close()
+        for server in servidores:
+            server.stop(None)
+
+    # Sólo se repiten RPC sin efectos, y el presupuesto acota los duplicados
+    assert hedging.is_idempotent("PredictBatch", sentiment_pb2.PredictBatchRequest(texts=["a"]))
+    assert not hedging.is_idempotent("PredictBatch", sentiment_pb2.PredictBatchRequest(add_to_index=True))
+    assert not hedging.is_idempotent("SubmitJob", None)
+    presupuesto = hedging.HedgeBudget(ratio=0.5, burst=1)
+    assert presupuesto.spend() and not presupuesto.spend()
+    presupuesto.earn()
+    presupuesto.earn()
+    assert presupuesto.spend()
+
+
+def test_agregados_por_hora_y_dia_del_frontend():
+    import importlib.util
+    import pathlib
+    from datetime import datetime, timedelta
+
+    # frontend/App/main.py necesita streamlit; rollups.py es biblioteca estándar y se carga por ruta
+    ruta = pathlib.Path(__file__).resolve().parents[2] / "frontend" / "App" / "rollups.py"
+    spec = importlib.util.spec_from_file_location("app_rollups", ruta)
+    rollups = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(rollups)
+
+    ts = datetime(2026, 3, 14, 15, 42, 7, 123)
+    assert rollups.bucket_start(ts, "hour") == datetime(2026, 3, 14, 15)
+    assert rollups.bucket_start(ts, "day") == datetime(2026, 3, 14)
+    with pytest.raises(ValueError):
+        rollups.bucket_start(ts, "week")
+
+    # Alta incremental: cada reseña suma en su cubeta horaria, diaria y en los totales
+    agg = rollups.SentimentRollups()
+    t0 = datetime(2026, 3, 14, 10, 5)
+    agg.add(t0, "positive", 0.9, True, 10)
+    agg.add(t0 + timedelta(minutes=20), "negative", 0.7, False, 30)
+    agg.add(t0 + timedelta(hours=3), "positive", None, True, 20)
+    agg.add(t0 + timedelta(days=1), "otra", 0.5, False, 40)  # etiqueta desconocida -> neutral
+    total = agg.total()
+    assert total.count == 4 and total.by_label == {"positive": 2, "negative": 1, "neutral": 1}
+    assert total.mean_score == pytest.approx((0.9 + 0.7 + 0.5) / 3)
+    assert total.recommend_rate == 0.5 and total.mean_length == 25
+    assert (agg.first, agg.last) == (t0, t0 + timedelta(days=1))
+    assert len(agg.buckets["hour"]) == 3 and len(agg.buckets["day"]) == 2
+
+    # Serie con cubetas vacías en los huecos y filtros por etiqueta y recomendación
+    serie = agg.series("hour", t0, t0 + timedelta(hours=3, minutes=54))
+    assert [inicio.hour for inicio, _ in serie] == [10, 11, 12, 13]
+    assert [s.count for _, s in serie] == [2, 0, 0, 1]
+    assert serie[1][1].mean_score is None and serie[1][1].recommend_rate is None
+    positivas = agg.series("hour", t0, t0 + timedelta(hours=3), labels={"positive"})
+    assert [s.count for _, s in positivas] == [1, 0, 0, 1]
+    no_recomienda = agg.series("day", t0, t0 + timedelta(days=1), recommend=False)
+    assert [(s.count, s.by_label["negative"], s.by_label["neutral"]) for _, s in no_recomienda] == [(1, 1, 0), (1, 0, 1)]
+    assert agg.total(labels={"negative", "neutral"}, recommend=True).count == 0
+
+    # Búsqueda binaria sobre la base en orden de llegada: extremos inclusivos
+    db = [{"timestamp": t0 + timedelta(minutes=10 * i), "i": i} for i in range(100)]
+    rango = rollups.in_range(db, t0 + timedelta(minutes=100), t0 + timedelta(minutes=200))
+    assert [r["i"] for r in rango] == list(range(10, 21))
+    assert rollups.in_range(db, t0 + timedelta(minutes=101), t0 + timedelta(minutes=109)) == []
+    assert rollups.in_range(db, t0 - timedelta(days=1), t0 + timedelta(days=1)) == db
+    assert rollups.in_range([], t0, t0) == []
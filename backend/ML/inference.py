@@ -0,0 +1,196 @@
+"""
+Inferencia en dos etapas para el servidor gRPC.
+
+La etapa 1 tokeniza en lote con el tokenizer rápido (Rust) y la etapa 2 ejecuta el forward
+del modelo. Ambas corren en hilos propios conectados por una cola acotada, de modo que
+mientras el modelo procesa un micro-lote el tokenizer ya prepara el siguiente.
+"""
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import profiler
+
+
+class TokenLengthCache:
+    """
+    LRU de longitudes en tokens por texto. Permite agrupar textos repetidos por longitud
+    (menos padding) sin volver a tokenizarlos para medirlos.
+    """
+
+    def __init__(self, maxsize: int = 50_000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str):
+        with self._lock:
+            n = self._data.get(text)
+            if n is not None:
+                self._data.move_to_end(text)
+            return n
+
+    def put(self, text: str, n: int):
+        with self._lock:
+            self._data[text] = n
+            self._data.move_to_end(text)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Job:
+    """
+    Trabajo en curso: resultados parciales y contador de micro-lotes pendientes.
+    """
+
+    def __init__(self, n: int, embed: bool = False):
+        self.results = [None] * n
+        self.embed = embed
+        self.pending = 0
+        self.future = Future()
+        self.lock = threading.Lock()
+
+    def done_part(self):
+        with self.lock:
+            self.pending -= 1
+            finished = self.pending == 0
+        if finished and not self.future.done():
+            self.future.set_result(self.results)
+
+
+def mean_pool(hidden, attention_mask):
+    """
+    Media de los estados ocultos sobre los tokens reales, normalizada (L2). Devuelve un
+    ndarray float32 (n, hidden) listo para similitud coseno por producto escalar.
+    """
+    import torch
+
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+    return torch.nn.functional.normalize(pooled, dim=-1).float().numpy()
+
+
+class StagedInference:
+    """
+    Motor de inferencia tokenizer -> modelo con cola acotada entre etapas.
+    Devuelve la misma forma que el pipeline de HF: lista de {'label', 'score'}.
+    """
+
+    def __init__(self, tokenizer, model, micro_batch: int = 16, max_length: int = 512, queue_size: int = 4):
+        if not getattr(tokenizer, "is_fast", False):
+            raise ValueError("StagedInference requiere un tokenizer rápido (PreTrainedTokenizerFast).")
+        self.tokenizer = tokenizer
+        self.model = model.eval()
+        self.id2label = model.config.id2label
+        self.micro_batch = micro_batch
+        self.max_length = min(max_length, getattr(tokenizer, "model_max_length", max_length))
+        self.lengths = TokenLengthCache()
+
+        self._entrada = queue.Queue()
+        self._tokens = queue.Queue(maxsize=queue_size)
+        for target, name in ((self._tokenize_loop, "etapa-tokenizer"), (self._model_loop, "etapa-modelo")):
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+    @classmethod
+    def from_pipeline(cls, clf, **kwargs):
+        """
+        Construye el motor reutilizando tokenizer y modelo de un pipeline de HF ya cargado.
+        """
+        return cls(clf.tokenizer, clf.model, **kwargs)
+
+    # --------- API pública ----------
+    def submit(self, texts, embed: bool = False) -> Future:
+        """
+        Encola textos para tokenizar + inferir. Devuelve un Future con la lista de resultados.
+        Con embed=True cada resultado incluye 'embedding': media de la última capa oculta sobre
+        los tokens reales, normalizada (L2), obtenida del mismo forward.
+        """
+        job = _Job(len(texts), embed)
+        if not texts:
+            job.future.set_result([])
+        else:
+            self._entrada.put((job, list(texts)))
+        return job.future
+
+    def submit_encoded(self, input_ids) -> Future:
+        """
+        Camino rápido pre-tokenizado: recibe listas de ids y salta la etapa de tokenización.
+        """
+        job = _Job(len(input_ids))
+        if not input_ids:
+            job.future.set_result([])
+            return job.future
+        order = list(range(len(input_ids)))
+        batches = [order[i : i + self.micro_batch] for i in range(0, len(order), self.micro_batch)]
+        job.pending = len(batches)
+        for idx in batches:
+            feats = [{"input_ids": list(input_ids[i])[: self.max_length]} for i in idx]
+            encoding = self.tokenizer.pad(feats, return_tensors="pt")
+            self._tokens.put((job, idx, encoding))
+        return job.future
+
+    def classify(self, texts, embed: bool = False) -> list:
+        """
+        Versión bloqueante de submit().
+        """
+        return self.submit(texts, embed).result()
+
+    @property
+    def embedding_dim(self) -> int:
+        return self.model.config.hidden_size
+
+    # --------- Etapas ----------
+    def _order(self, texts):
+        """
+        Ordena índices por longitud conocida (o estimada) para formar micro-lotes homogéneos.
+        """
+        def key(i):
+            n = self.lengths.get(texts[i])
+            return n if n is not None else len(texts[i]) // 4
+        return sorted(range(len(texts)), key=key)
+
+    def _tokenize_loop(self):
+        while True:
+            job, texts = self._entrada.get()
+            try:
+                order = self._order(texts)
+                batches = [order[i : i + self.micro_batch] for i in range(0, len(order), self.micro_batch)]
+                job.pending = len(batches)
+                for idx in batches:
+                    part = [texts[i] for i in idx]
+                    encoding = self.tokenizer(
+                        part, truncation=True, max_length=self.max_length, padding=True, return_tensors="pt"
+                    )
+                    for text, n in zip(part, encoding["attention_mask"].sum(dim=1).tolist()):
+                        self.lengths.put(text, int(n))
+                    # Bloquea si el modelo va atrasado: la cola acotada limita la memoria en vuelo
+                    self._tokens.put((job, idx, encoding))
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+
+    def _model_loop(self):
+        import torch
+
+        while True:
+            job, idx, encoding = self._tokens.get()
+            if job.future.done():
+                continue
+            try:
+                with torch.inference_mode(), profiler.operators.capture():
+                    out = self.model(**encoding, output_hidden_states=job.embed)
+                    embeddings = mean_pool(out.hidden_states[-1], encoding["attention_mask"]) if job.embed else None
+                probs = torch.softmax(out.logits, dim=-1)
+                scores, preds = probs.max(dim=-1)
+                for j, (i, p, s) in enumerate(zip(idx, preds.tolist(), scores.tolist())):
+                    job.results[i] = {"label": self.id2label[p], "score": s}
+                    if embeddings is not None:
+                        job.results[i]["embedding"] = embeddings[j]
+                job.done_part()
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
@@ -0,0 +1,281 @@
+"""
+Trabajos de predicción en lote asíncronos y persistidos en disco.
+
+Cada trabajo vive en su propio directorio dentro de ML_JOBS_DIR:
+  job.json             estado (receiving | queued | running | done | failed), totales y origen
+  input.parquet        textos recibidos por stream (si no se usó una ruta local)
+  results/part-*.parquet  resultados por bloques (columnas: label, score)
+
+  lease                candado (flock) del proceso dueño del trabajo
+  job.lock             candado breve para leer-modificar-escribir job.json
+
+Los resultados se escriben por partes con renombrado atómico, así que un trabajo interrumpido
+(reinicio del servidor) se retoma desde la última parte completa. El trabajo no depende de la
+conexión del cliente: se procesa en un hilo de fondo y se consulta después por su id.
+
+Varios procesos (supervisor.py) comparten el directorio: el proceso que crea o retoma un trabajo
+toma su 'lease' y lo suelta al terminarlo. El sistema libera el candado si el proceso muere, así
+que un trabajo sólo lo procesa un proceso a la vez y el de un proceso caído lo retoma otro.
+"""
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+
+TEXT_COLUMNS = ("texto", "text")
+RESULT_SCHEMA = pa.schema([("label", pa.string()), ("score", pa.float64())])
+
+
+def iter_text_batches(path: str, column: str = "", batch_size: int = 1024):
+    """
+    Itera bloques de textos de un CSV o Parquet local sin cargar el archivo completo.
+    Si no se indica 'column', usa la primera de 'texto' / 'text' que exista.
+    """
+    if path.lower().endswith(".parquet"):
+        pf = pq.ParquetFile(path)
+        names = pf.schema_arrow.names
+        col = column or next((c for c in TEXT_COLUMNS if c in names), None)
+        if col not in names:
+            raise ValueError(f"{path} no tiene columna de texto ({', '.join(TEXT_COLUMNS)})")
+        for batch in pf.iter_batches(batch_size=batch_size, columns=[col]):
+            yield [str(t) for t in batch.column(0).to_pylist() if t is not None]
+    else:
+        reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=1 << 20))
+        names = reader.schema.names
+        col = column or next((c for c in TEXT_COLUMNS if c in names), None)
+        if col not in names:
+            raise ValueError(f"{path} no tiene columna de texto ({', '.join(TEXT_COLUMNS)})")
+        idx = names.index(col)
+        pending = []
+        for batch in reader:
+            pending.extend(str(t) for t in batch.column(idx).to_pylist() if t is not None)
+            while len(pending) >= batch_size:
+                yield pending[:batch_size]
+                pending = pending[batch_size:]
+        if pending:
+            yield pending
+
+
+def count_rows(path: str, column: str = "") -> int:
+    """
+    Cuenta textos no nulos de un archivo local recorriéndolo en bloques.
+    """
+    return sum(len(b) for b in iter_text_batches(path, column))
+
+
+class JobStore:
+    """
+    Acceso al directorio de trabajos: creación, estado, escritura y lectura de resultados.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.RLock()
+        self._leases = {}  # job_id -> archivo con el flock tomado por este proceso
+
+    def path(self, job_id: str, *parts) -> str:
+        return os.path.join(self.root, job_id, *parts)
+
+    def create(self, source: dict) -> str:
+        """
+        Crea un trabajo en estado 'receiving' ya tomado por este proceso.
+        """
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.path(job_id, "results"))
+        self.claim(job_id)  # antes de job.json: nadie lo ve sin dueño
+        self.save(job_id, {"job_id": job_id, "state": "receiving", "total": 0, "done": 0,
+                           "error": "", "created": time.time(), **source})
+        return job_id
+
+    # --------- Propiedad entre procesos ----------
+    def claim(self, job_id: str) -> bool:
+        """
+        Toma el trabajo para este proceso si nadie lo tiene (ni otro proceso ni este).
+        """
+        with self._lock:
+            if job_id in self._leases:
+                return False
+            f = open(self.path(job_id, "lease"), "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                return False
+            self._leases[job_id] = f
+            return True
+
+    def release(self, job_id: str):
+        with self._lock:
+            f = self._leases.pop(job_id, None)
+        if f is not None:
+            f.close()  # cerrar el archivo suelta el flock
+
+    def owned(self, job_id: str) -> bool:
+        return job_id in self._leases
+
+    @contextmanager
+    def _file_lock(self, job_id: str):
+        with open(self.path(job_id, "job.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def load(self, job_id: str) -> dict:
+        with open(self.path(job_id, "job.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, job_id: str, meta: dict):
+        tmp = self.path(job_id, "job.json.tmp")
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, self.path(job_id, "job.json"))
+
+    def update(self, job_id: str, **changes) -> dict:
+        with self._lock, self._file_lock(job_id):
+            meta = self.load(job_id)
+            meta.update(changes)
+            self.save(job_id, meta)
+            return meta
+
+    def exists(self, job_id: str) -> bool:
+        return bool(job_id) and os.path.isfile(self.path(job_id, "job.json"))
+
+    def list_ids(self):
+        return [d for d in os.listdir(self.root) if self.exists(d)]
+
+    def parts(self, job_id: str):
+        folder = self.path(job_id, "results")
+        return sorted(os.path.join(folder, n) for n in os.listdir(folder) if n.endswith(".parquet"))
+
+    def write_input(self, job_id: str, chunks) -> int:
+        """
+        Persiste los bloques de textos recibidos por stream (un row group por bloque).
+        Devuelve el total de textos escritos.
+        """
+        total = 0
+        schema = pa.schema([("texto", pa.string())])
+        with pq.ParquetWriter(self.path(job_id, "input.parquet"), schema) as writer:
+            for texts in chunks:
+                if texts:
+                    writer.write_table(pa.table({"texto": texts}, schema=schema))
+                    total += len(texts)
+        return total
+
+    def write_part(self, job_id: str, index: int, labels, scores):
+        final = self.path(job_id, "results", f"part-{index:06d}.parquet")
+        table = pa.table({"label": labels, "score": scores}, schema=RESULT_SCHEMA)
+        pq.write_table(table, final + ".tmp")
+        os.replace(final + ".tmp", final)
+
+    def iter_results(self, job_id: str, offset: int = 0, chunk_size: int = 1000):
+        """
+        Itera (offset, labels, scores) en bloques de hasta 'chunk_size' a partir de 'offset'.
+        """
+        pos = 0
+        for part in self.parts(job_id):
+            table = pq.read_table(part)
+            n = table.num_rows
+            if pos + n <= offset:
+                pos += n
+                continue
+            start = max(offset - pos, 0)
+            labels = table.column("label").to_pylist()
+            scores = table.column("score").to_pylist()
+            for i in range(start, n, chunk_size):
+                yield pos + i, labels[i : i + chunk_size], scores[i : i + chunk_size]
+            pos += n
+
+
+class JobWorker:
+    """
+    Procesa trabajos en segundo plano, en bloques de 'batch_size', con la función 'classify'
+    (textos -> (labels, scores)). Al arrancar, y cada 'rescan_interval' segundos sin trabajo,
+    retoma los trabajos sin dueño que quedaron a medias y marca fallidos los que se estaban
+    recibiendo: el stream del cliente se cortó con el reinicio o la caída de su proceso.
+    """
+
+    def __init__(self, store: JobStore, classify, batch_size: int = 512, rescan_interval: float = 30.0):
+        self.store = store
+        self.classify = classify
+        self.batch_size = batch_size
+        self.rescan_interval = rescan_interval
+        self._queue = queue.Queue()
+        self.rescan()
+        threading.Thread(target=self._loop, name="trabajos", daemon=True).start()
+
+    def rescan(self) -> int:
+        """
+        Toma los trabajos pendientes que no tiene ningún proceso. Devuelve cuántos encoló.
+        """
+        resumed = 0
+        for job_id in self.store.list_ids():
+            if self.store.owned(job_id) or self.store.load(job_id)["state"] not in ("queued", "running", "receiving"):
+                continue
+            if not self.store.claim(job_id):
+                continue  # lo tiene otro proceso vivo
+            state = self.store.load(job_id)["state"]  # releído con el trabajo ya tomado
+            if state in ("queued", "running"):
+                self._queue.put(job_id)
+                resumed += 1
+                continue
+            if state == "receiving":
+                self.store.update(job_id, state="failed", error="recepción interrumpida por un reinicio")
+            self.store.release(job_id)
+        return resumed
+
+    def enqueue(self, job_id: str):
+        """
+        Encola un trabajo creado (y por tanto tomado) por este proceso.
+        """
+        self.store.update(job_id, state="queued")
+        self._queue.put(job_id)
+
+    def _source_batches(self, meta: dict):
+        if meta.get("file_path"):
+            return iter_text_batches(meta["file_path"], meta.get("column", ""), self.batch_size)
+        pf = pq.ParquetFile(self.store.path(meta["job_id"], "input.parquet"))
+        return ([str(t) for t in b.column(0).to_pylist()] for b in pf.iter_batches(batch_size=self.batch_size))
+
+    def _loop(self):
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.rescan_interval)
+            except queue.Empty:
+                self.rescan()
+                continue
+            try:
+                self._process(job_id)
+            except Exception as e:
+                self.store.update(job_id, state="failed", error=str(e))
+            finally:
+                self.store.release(job_id)
+
+    def _process(self, job_id: str):
+        meta = self.store.update(job_id, state="running")
+        if meta.get("file_path") and not meta["total"]:
+            meta = self.store.update(job_id, total=count_rows(meta["file_path"], meta.get("column", "")))
+        # Retomar: las partes ya escritas cubren los primeros 'done' textos
+        done = sum(pq.ParquetFile(p).metadata.num_rows for p in self.store.parts(job_id))
+        index = len(self.store.parts(job_id))
+        pos = 0
+        for texts in self._source_batches(meta):
+            if pos + len(texts) <= done:
+                pos += len(texts)
+                continue
+            texts = texts[max(done - pos, 0):]
+            labels, scores = self.classify(texts)
+            self.store.write_part(job_id, index, labels, scores)
+            index += 1
+            pos = done = done + len(texts)
+            self.store.update(job_id, done=done)
+        self.store.update(job_id, state="done", done=done, total=done, finished=time.time())
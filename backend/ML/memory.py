@@ -0,0 +1,171 @@
+"""
+Contabilidad de memoria por proceso trabajador y reciclado controlado (ver supervisor.py).
+
+- MemoryWatchdog mide el RSS del proceso cada 'interval' segundos. Si supera el techo
+  (ML_MAX_RSS_MB) primero intenta devolver memoria al sistema (gc + malloc_trim de glibc, que
+  libera la fragmentación del allocator); si sigue por encima, o si el proceso ya atendió
+  ML_MAX_REQUESTS RPC, avisa una sola vez con on_limit(motivo) para que el supervisor levante
+  un reemplazo y drene este proceso.
+- WatchdogInterceptor cuenta los RPC atendidos por el proceso.
+- batch_budget() da el tamaño (en caracteres) de los tramos en que se procesa un PredictBatch:
+  ML_BATCH_MAX_CHARS, reducido cuando queda poco margen hasta el techo de RSS, para que un lote
+  enorme no dispare el uso de memoria.
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import resource
+import sys
+import threading
+
+import grpc
+
+
+MB = 1024 * 1024
+
+
+def rss_bytes() -> int:
+    """
+    RSS actual del proceso (Linux: /proc/self/statm; en otros sistemas, el pico).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux lo reporta en KiB
+
+
+def release_memory() -> bool:
+    """
+    Recolecta ciclos y devuelve al sistema las páginas libres del heap de glibc.
+    Devuelve False si malloc_trim no está disponible (musl, macOS, Windows).
+    """
+    gc.collect()
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        return bool(libc.malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
+
+
+def batch_slices(texts, max_chars: int):
+    """
+    Parte 'texts' en tramos contiguos de como mucho 'max_chars' caracteres (al menos un texto cada uno).
+    """
+    start, size = 0, 0
+    for i, text in enumerate(texts):
+        if i > start and size + len(text) > max_chars:
+            yield start, i
+            start, size = i, 0
+        size += len(text)
+    if start < len(texts):
+        yield start, len(texts)
+
+
+class MemoryWatchdog:
+    """
+    Vigila RSS y número de RPC del proceso. 'max_rss_mb' o 'max_requests' a 0 desactivan ese límite.
+    """
+
+    def __init__(
+        self,
+        max_rss_mb: float = 0,
+        max_requests: int = 0,
+        interval: float = 5.0,
+        batch_max_chars: int = 262_144,
+        on_limit=None,
+    ):
+        self.max_rss = int(max_rss_mb * MB)
+        self.max_requests = max_requests
+        self.interval = interval
+        self.batch_max_chars = batch_max_chars
+        self.on_limit = on_limit
+        self.requests = 0
+        self.trims = 0
+        self.rss = rss_bytes()
+        self.limit_reason = ""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="memory-watchdog", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def count(self, n: int = 1):
+        with self._lock:
+            self.requests += n
+
+    def check(self) -> str:
+        """
+        Mide y, la primera vez que se supera un límite, llama a on_limit. Devuelve el motivo o ''.
+        """
+        self.rss = rss_bytes()
+        if self.limit_reason:
+            return self.limit_reason
+        reason = ""
+        if self.max_rss and self.rss > self.max_rss:
+            release_memory()
+            self.trims += 1
+            self.rss = rss_bytes()
+            if self.rss > self.max_rss:
+                reason = f"rss {self.rss / MB:.0f} MB > {self.max_rss / MB:.0f} MB"
+        if not reason and self.max_requests and self.requests >= self.max_requests:
+            reason = f"{self.requests} RPC >= {self.max_requests}"
+        if reason:
+            self.limit_reason = reason
+            if self.on_limit is not None:
+                self.on_limit(reason)
+        return reason
+
+    def batch_budget(self) -> int:
+        """
+        Caracteres por tramo de PredictBatch: el máximo configurado, escalado por el margen de RSS
+        que queda (con la mitad del techo libre o más, el máximo; nunca menos de un 10%).
+        """
+        if not self.max_rss:
+            return self.batch_max_chars
+        headroom = max(0.0, (self.max_rss - self.rss) / self.max_rss)
+        return max(1, int(self.batch_max_chars * min(1.0, max(0.1, 2 * headroom))))
+
+    def snapshot(self) -> dict:
+        return {
+            "worker_pid": float(os.getpid()),
+            "worker_rss_mb": round(self.rss / MB, 1),
+            "worker_rss_peak_mb": round(peak_rss_bytes() / MB, 1),
+            "worker_rss_limit_mb": round(self.max_rss / MB, 1),
+            "worker_requests": float(self.requests),
+            "worker_memory_trims": float(self.trims),
+            "worker_recycling": float(bool(self.limit_reason)),
+            "worker_batch_budget_chars": float(self.batch_budget()),
+        }
+
+
+class WatchdogInterceptor(grpc.ServerInterceptor):
+    """
+    Cuenta cada RPC atendido por el proceso para el límite de peticiones del watchdog.
+    """
+
+    def __init__(self, watchdog: MemoryWatchdog, exempt=("Ping", "Stats", "Profile")):
+        self.watchdog = watchdog
+        self.exempt = set(exempt)
+
+    def intercept_service(self, continuation, handler_call_details):
+        if handler_call_details.method.rsplit("/", 1)[-1] not in self.exempt:
+            self.watchdog.count()
+        return continuation(handler_call_details)
@@ -0,0 +1,264 @@
+"""
+Perfilado bajo demanda del servidor en vivo (RPC Profile).
+
+- Pilas de Python: el hilo del RPC lee sys._current_frames() cada 'interval' y acumula las pilas
+  de todos los hilos en formato "folded" (hilo;marco;marco N), el que consumen flamegraph.pl,
+  speedscope o inferno. Los hilos ociosos (esperando en una cola o condición) se omiten.
+- Operadores de torch: la ventana abre una única sesión de torch.profiler para todo el proceso
+  (profile_all_threads) y acumula el tiempo propio de CPU por operador (aten::addmm, ...) de los
+  forwards de cualquier hilo: planificador, Analyze, motor en dos etapas. El perfilador es global
+  al proceso y dos sesiones simultáneas chocan entre sí, así que nunca se abre una por forward.
+  Con un torch sin profile_all_threads (sólo observa el hilo que lo activa) capture() abre la
+  sesión en el hilo del forward, serializando los forwards durante la ventana.
+
+El coste está acotado: la ventana tiene duración máxima, sólo puede haber un perfil a la vez y,
+fuera de la ventana, capture() se reduce a comprobar un booleano.
+
+Uso (contra un servidor con ML_PROFILING=1):
+  python ML/profiler.py --addr localhost:50051 --seconds 10 --out perfil
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+_IDLE_NAMES = ("wait", "get", "select", "_wait_for_tstate_lock")
+
+
+class ProfileBusy(Exception):
+    """
+    Ya hay un perfil en curso en este proceso.
+    """
+
+
+def _process_session():
+    """
+    Sesión de torch.profiler que observa todos los hilos, o None si este torch no lo permite.
+    """
+    from torch.profiler import ProfilerActivity, profile
+
+    try:
+        from torch._C._profiler import _ExperimentalConfig
+
+        config = _ExperimentalConfig(profile_all_threads=True)
+    except (ImportError, TypeError):
+        return None
+    return profile(activities=[ProfilerActivity.CPU], experimental_config=config)
+
+
+def _self_times(events) -> tuple:
+    """
+    (tiempo propio en µs, llamadas) por operador a partir de los eventos crudos de la sesión.
+    Equivale a key_averages() pero sin construir el árbol de FunctionEvent en Python, que con la
+    sesión de proceso (decenas de miles de eventos) alargaba segundos la respuesta del RPC.
+    """
+    by_thread = defaultdict(list)
+    for e in events:
+        by_thread[e.start_thread_id()].append((e.start_ns(), -e.end_ns(), e.name()))
+    self_us, calls = Counter(), Counter()
+    for spans in by_thread.values():
+        spans.sort()
+        stack = []
+        for start, neg_end, name in spans:
+            end = -neg_end
+            while stack and stack[-1][0] <= start:
+                stack.pop()
+            if stack:
+                self_us[stack[-1][1]] -= (end - start) / 1000
+            self_us[name] += (end - start) / 1000
+            calls[name] += 1
+            stack.append((end, name))
+    return self_us, calls
+
+
+class OperatorCapture:
+    """
+    Acumula el tiempo propio de CPU por operador de torch mientras 'active' es True.
+    """
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._forward_lock = threading.Lock()
+        self._session = None
+        self.self_us = Counter()
+        self.calls = Counter()
+
+    def _accumulate(self, prof):
+        try:
+            self_us, calls = _self_times(prof.profiler.kineto_results.events())
+        except AttributeError:
+            self_us, calls = Counter(), Counter()
+            for e in prof.key_averages():
+                self_us[e.key] += e.self_cpu_time_total
+                calls[e.key] += e.count
+        with self._lock:
+            self.self_us.update(self_us)
+            self.calls.update(calls)
+
+    @contextmanager
+    def capture(self):
+        """
+        Envuelve un forward del modelo. Con la sesión de proceso abierta no hace nada; sin ella
+        (torch antiguo) perfila el forward en su hilo, de uno en uno.
+        """
+        if not self.active or self._session is not None:
+            yield
+            return
+        from torch.profiler import ProfilerActivity, profile
+
+        with self._forward_lock:
+            with profile(activities=[ProfilerActivity.CPU]) as prof:
+                yield
+            self._accumulate(prof)
+
+    def start(self):
+        with self._lock:
+            self.self_us.clear()
+            self.calls.clear()
+        session = _process_session()
+        if session is not None:
+            session.__enter__()
+        self._session = session
+        self.active = True
+
+    def stop(self):
+        self.active = False
+        session, self._session = self._session, None
+        if session is not None:
+            # Espera a que termine un forward por hilo con la sesión en uso antes de cerrarla
+            with self._forward_lock:
+                session.__exit__(None, None, None)
+            self._accumulate(session)
+        with self._lock:
+            return Counter(self.self_us), Counter(self.calls)
+
+
+operators = OperatorCapture()
+_busy = threading.Lock()
+
+
+# --------- Pilas de Python ----------
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return code.co_name in _IDLE_NAMES and os.path.basename(code.co_filename) in _IDLE_FILES
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def sample_stacks(seconds: float, interval: float = 0.01, include_idle: bool = False):
+    """
+    Muestrea las pilas de todos los hilos (salvo el propio) durante 'seconds'.
+    Devuelve (Counter de pilas folded -> muestras, número de muestras).
+    """
+    me = threading.get_ident()
+    folded = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me or (not include_idle and _is_idle(frame)):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"hilo-{ident}"))
+            folded[";".join(reversed(stack))] += 1
+        samples += 1
+        time.sleep(interval)
+    return folded, samples
+
+
+# --------- Ventana de perfilado ----------
+def to_folded(counter: Counter, prefix: str = "") -> str:
+    """
+    Texto folded (una pila por línea con su peso entero), ordenado por peso descendente.
+    """
+    lines = [f"{prefix}{stack} {int(round(weight))}" for stack, weight in counter.most_common() if weight >= 0.5]
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def operator_table(self_us: Counter, calls: Counter, limit: int = 25) -> str:
+    """
+    Resumen legible de los operadores con más tiempo propio de CPU.
+    """
+    total = sum(self_us.values()) or 1.0
+    rows = [f"{'operador':<40} {'llamadas':>9} {'ms propios':>11} {'%':>6}"]
+    for key, us in self_us.most_common(limit):
+        rows.append(f"{key[:40]:<40} {calls[key]:>9} {us / 1000:>11.2f} {100 * us / total:>6.1f}")
+    return "\n".join(rows)
+
+
+def profile_process(seconds: float, interval: float = 0.01, torch_ops: bool = True) -> dict:
+    """
+    Abre una ventana de perfilado de 'seconds' sobre el proceso actual. Lanza ProfileBusy si ya
+    hay otra en curso. El desglose de torch sólo se activa si torch está instalado.
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfileBusy("ya hay un perfil en curso")
+    try:
+        torch_ops = torch_ops and importlib.util.find_spec("torch") is not None
+        if torch_ops:
+            operators.start()
+        t0 = time.monotonic()
+        try:
+            folded, samples = sample_stacks(seconds, interval)
+        finally:
+            self_us, calls = operators.stop() if torch_ops else (Counter(), Counter())
+        return {
+            "python_folded": to_folded(folded),
+            "torch_folded": to_folded(self_us, prefix="torch;"),
+            "torch_table": operator_table(self_us, calls) if self_us else "",
+            "samples": samples,
+            "seconds": time.monotonic() - t0,
+        }
+    finally:
+        _busy.release()
+
+
+def main():
+    """
+    CLI: pide un perfil al servidor y guarda <out>.python.folded y <out>.torch.folded.
+    """
+    import grpc
+
+    import sentiment_pb2
+    import sentiment_pb2_grpc
+
+    parser = argparse.ArgumentParser(description="Perfil de CPU del servidor en vivo")
+    parser.add_argument("--addr", default="localhost:50051")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--interval-ms", type=int, default=10)
+    parser.add_argument("--no-torch", action="store_true", help="omite el desglose por operador de torch")
+    parser.add_argument("--out", default="perfil")
+    args = parser.parse_args()
+
+    stub = sentiment_pb2_grpc.SentimentServiceStub(grpc.insecure_channel(args.addr))
+    resp = stub.Profile(
+        sentiment_pb2.ProfileRequest(seconds=args.seconds, interval_ms=args.interval_ms, torch_ops=not args.no_torch),
+        timeout=args.seconds + 30,
+    )
+    for kind, text in (("python", resp.python_folded), ("torch", resp.torch_folded)):
+        if text:
+            path = f"{args.out}.{kind}.folded"
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            print(f"💾 {path} (flamegraph.pl {path} > {args.out}.{kind}.svg, o ábrelo en speedscope)")
+    print(f"{resp.samples} muestras en {resp.seconds:.1f} s")
+    if resp.torch_table:
+        print(resp.torch_table)
+
+
+if __name__ == "__main__":
+    main()
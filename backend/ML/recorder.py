@@ -0,0 +1,141 @@
+"""
+Grabación opcional del tráfico real del servidor para reproducirlo después (replay.py).
+
+Cada RPC unario se registra como una línea JSON compacta:
+  {"t": 12.345, "rpc": "PredictBatch", "ms": 81.2, "code": "OK", "len": [54, 120], "h": ["9f1c...", ...]}
+donde 't' es el instante de llegada (s desde el inicio de la grabación), 'len' las longitudes de
+los textos y 'h' un hash corto de cada texto (o 'texts' con los textos si ML_RECORD_TEXTS=1).
+El resto de campos de la petición (k, min_score, add_to_index, ...) va en 'req' para que el
+replay reconstruya la misma petición. Con longitudes y hashes se reproduce la mezcla de tamaños,
+lotes y duplicados sin guardar contenido de usuarios. Se graba también el tiempo en cola de
+admisión y los rechazos, de modo que la grabación refleja lo que vivió el cliente.
+
+Las peticiones que dependen de algo que no viaja en la grabación (ids de tokens, huecos de
+memoria compartida del cliente, trabajos del servidor) se graban con "replay": false: cuentan
+en la mezcla de tráfico pero replay.py no las envía. Los RPC de stream no se graban.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+
+import grpc
+from google.protobuf.json_format import MessageToDict
+
+
+TEXT_FIELDS = ("text", "texts", "token_ids")
+NOT_REPLAYABLE = frozenset({"PredictShm", "GetJobStatus"})
+
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def request_texts(request) -> list:
+    """
+    Textos de un mensaje de petición (campos 'text' o 'texts'), o lista vacía.
+    """
+    fields = {f.name for f in request.DESCRIPTOR.fields}
+    if "texts" in fields and request.texts:
+        return list(request.texts)
+    if "text" in fields:
+        return [request.text]
+    return []
+
+
+def request_fields(request) -> dict:
+    """
+    Campos de la petición distintos de los textos (sin los que tienen su valor por defecto).
+    """
+    fields = MessageToDict(request, preserving_proto_field_name=True)
+    for name in TEXT_FIELDS:
+        fields.pop(name, None)
+    return fields
+
+
+def replayable(rpc: str, request) -> bool:
+    """
+    Si la petición se puede reconstruir a partir de la grabación.
+    """
+    return rpc not in NOT_REPLAYABLE and not getattr(request, "token_ids", None)
+
+
+class TrafficRecorder:
+    """
+    Escribe una línea JSON por RPC en 'path'. 'sample' es la fracción de RPC grabadas. 't0'
+    (time.monotonic()) fija el origen de tiempos; con varios procesos se comparte para que sus
+    grabaciones se puedan mezclar.
+    """
+
+    def __init__(self, path: str, include_texts: bool = False, sample: float = 1.0, t0: float = None):
+        self.path = path
+        self.include_texts = include_texts
+        self.sample = sample
+        self.t0 = time.monotonic() if t0 is None else t0
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self.recorded = 0
+
+    def record(self, rpc: str, arrival: float, elapsed: float, code: str, texts, fields=None, replay=True):
+        entry = {"t": round(arrival - self.t0, 6), "rpc": rpc, "ms": round(elapsed * 1000, 3), "code": code}
+        entry["len"] = [len(t) for t in texts]
+        if self.include_texts:
+            entry["texts"] = list(texts)
+        else:
+            entry["h"] = [text_hash(t) for t in texts]
+        if fields:
+            entry["req"] = fields
+        if not replay:
+            entry["replay"] = False
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.recorded += 1
+
+    def snapshot(self) -> dict:
+        return {"recorder_rpcs": float(self.recorded)}
+
+
+class RecorderInterceptor(grpc.ServerInterceptor):
+    """
+    Graba los RPC unarios (salvo los de administración) con su tiempo total y código de estado.
+    Debe ir antes del control de admisión para incluir la espera en cola y los rechazos.
+    """
+
+    def __init__(self, recorder: TrafficRecorder, exempt=("Ping", "Stats", "Profile")):
+        self.recorder = recorder
+        self.exempt = set(exempt)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+        if handler is None or handler.unary_unary is None or method in self.exempt:
+            return handler
+        if self.recorder.sample < 1.0 and random.random() >= self.recorder.sample:
+            return handler
+
+        behavior = handler.unary_unary
+        recorder = self.recorder
+
+        def recorded(request, context):
+            arrival = time.monotonic()
+            code = "OK"
+            try:
+                return behavior(request, context)
+            except Exception:
+                status = context.code() if hasattr(context, "code") else None
+                code = status.name if status is not None else "UNKNOWN"
+                raise
+            finally:
+                recorder.record(
+                    method, arrival, time.monotonic() - arrival, code, request_texts(request),
+                    request_fields(request), replayable(method, request),
+                )
+
+        return grpc.unary_unary_rpc_method_handler(
+            recorded,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
@@ -0,0 +1,235 @@
+"""
+Reproduce una grabación de tráfico (recorder.py) contra un servidor y reporta latencia y throughput.
+
+- Velocidad: --speed 1 respeta los instantes de llegada originales, --speed N los comprime N
+  veces (bucle abierto: las peticiones salen a su hora aunque el servidor vaya atrasado) y
+  --speed 0 envía tan rápido como se pueda con la concurrencia máxima observada en la grabación.
+- Textos: si la grabación no guardó textos, cada hash se convierte en un texto sintético
+  determinista de la misma longitud, así que se conservan tamaños, lotes y duplicados. El resto
+  de campos grabados ('req': k, add_to_index, ...) se copia a la petición; las entradas marcadas
+  "replay": false (token_ids, PredictShm, trabajos) no se envían.
+- Reporte JSON por RPC (p50/p95/p99, media, errores por código, req/s y textos/s) etiquetado
+  con --label; --compare base.json nuevo.json muestra las diferencias entre dos builds.
+
+Uso:
+  python ML/replay.py trafico.jsonl --addr localhost:50051 --speed 2 --label v1 --out v1.json
+  python ML/replay.py trafico.jsonl.* --speed 2   # grabaciones por trabajador de supervisor.py
+  python ML/replay.py --compare v1.json v2.json
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent import futures
+
+
+_PALABRAS = (
+    "la comida estaba muy rica pero el servicio fue lento y la cuenta llegó con cargos "
+    "extra el lugar es bonito volvería con amigos los tacos la salsa el mesero nos atendió"
+).split()
+
+
+# --------- Grabación ----------
+def load_capture(paths) -> list:
+    """
+    Entradas de una grabación (o de varias con el mismo origen de tiempos, p.ej. una por
+    trabajador del supervisor) ordenadas por instante de llegada.
+    """
+    entries = []
+    for path in [paths] if isinstance(paths, str) else paths:
+        with open(path, encoding="utf-8") as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    return sorted(entries, key=lambda e: e["t"])
+
+
+def synthetic_text(digest: str, length: int) -> str:
+    """
+    Texto determinista de 'length' caracteres derivado del hash (mismo hash -> mismo texto).
+    """
+    rng = random.Random(digest)
+    words = []
+    size = 0
+    while size < length:
+        w = rng.choice(_PALABRAS)
+        words.append(w)
+        size += len(w) + 1
+    return " ".join(words)[:length]
+
+
+def entry_texts(entry: dict) -> list:
+    if "texts" in entry:
+        return entry["texts"]
+    return [synthetic_text(h, n) for h, n in zip(entry.get("h", []), entry.get("len", []))]
+
+
+def max_concurrency(entries) -> int:
+    """
+    Máximo de RPC en curso a la vez en la grabación (según llegada + duración).
+    """
+    events = []
+    for e in entries:
+        events.append((e["t"], 1))
+        events.append((e["t"] + e["ms"] / 1000, -1))
+    level = peak = 0
+    for _, delta in sorted(events, key=lambda x: (x[0], x[1])):
+        level += delta
+        peak = max(peak, level)
+    return max(peak, 1)
+
+
+# --------- Envío ----------
+def build_request(pb, rpc: str, texts: list, fields=None):
+    """
+    Petición de 'rpc' con los textos y los campos grabados, o None si el RPC no existe o no es unario.
+    """
+    from google.protobuf.json_format import ParseDict
+
+    method = pb.DESCRIPTOR.services_by_name["SentimentService"].methods_by_name.get(rpc)
+    if method is None or method.client_streaming or method.server_streaming:
+        return None
+    request = ParseDict(fields or {}, getattr(pb, method.input_type.name)())
+    names = {f.name for f in method.input_type.fields}
+    if "texts" in names:
+        request.texts.extend(texts)
+    elif "text" in names:
+        request.text = texts[0] if texts else ""
+    return request
+
+
+def replay(entries, stub, pb, speed: float = 1.0, workers: int = 0, timeout: float = 30.0, log=print) -> dict:
+    """
+    Reproduce 'entries' y devuelve las mediciones crudas por RPC.
+    """
+    import grpc
+
+    plan = []
+    for e in entries:
+        if e.get("replay") is False:
+            continue
+        request = build_request(pb, e["rpc"], entry_texts(e), e.get("req"))
+        if request is not None:
+            plan.append((e["t"], e["rpc"], request, len(e.get("len", []))))
+    if not plan:
+        return {"wall_s": 0.0, "rpcs": {}}
+
+    results = defaultdict(list)
+    lock = threading.Lock()
+
+    def send(rpc, request, n_texts, scheduled):
+        t0 = time.perf_counter()
+        code = "OK"
+        try:
+            getattr(stub, rpc)(request, timeout=timeout)
+        except grpc.RpcError as err:
+            code = err.code().name
+        with lock:
+            results[rpc].append((time.perf_counter() - t0, code, n_texts, t0 - scheduled))
+
+    open_loop = speed > 0
+    workers = workers or (min(256, len(plan)) if open_loop else max_concurrency(entries))
+    log(f"Reproduciendo {len(plan)} RPC a {'velocidad x%g' % speed if open_loop else 'máxima velocidad'} "
+        f"con {workers} hilos")
+    start = time.perf_counter()
+    base = plan[0][0]
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for t, rpc, request, n in plan:
+            scheduled = start + (t - base) / speed if open_loop else time.perf_counter()
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, rpc, request, n, scheduled)
+    return {"wall_s": time.perf_counter() - start, "rpcs": dict(results)}
+
+
+# --------- Reporte ----------
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def summarize(raw: dict, label: str = "", speed: float = 1.0) -> dict:
+    """
+    Reporte comparable entre builds: latencias en ms y throughput sobre el tiempo total.
+    """
+    wall = raw["wall_s"] or 1e-9
+    report = {"label": label, "speed": speed, "wall_s": round(raw["wall_s"], 3), "rpcs": {}}
+    total_ok = 0
+    for rpc, rows in sorted(raw["rpcs"].items()):
+        lat = sorted(r[0] * 1000 for r in rows if r[1] == "OK")
+        errors = defaultdict(int)
+        for r in rows:
+            if r[1] != "OK":
+                errors[r[1]] += 1
+        texts = sum(r[2] for r in rows if r[1] == "OK")
+        total_ok += len(lat)
+        report["rpcs"][rpc] = {
+            "count": len(rows),
+            "ok": len(lat),
+            "errors": dict(errors),
+            "p50_ms": round(_percentile(lat, 0.50), 2),
+            "p95_ms": round(_percentile(lat, 0.95), 2),
+            "p99_ms": round(_percentile(lat, 0.99), 2),
+            "mean_ms": round(sum(lat) / len(lat), 2) if lat else 0.0,
+            "max_lag_ms": round(max(r[3] for r in rows) * 1000, 2),
+            "rps": round(len(lat) / wall, 2),
+            "texts_per_s": round(texts / wall, 2),
+        }
+    report["rps"] = round(total_ok / wall, 2)
+    return report
+
+
+def compare(base: dict, new: dict) -> str:
+    """
+    Tabla de diferencias por RPC entre dos reportes (negativo = mejora en latencia).
+    """
+    rows = [f"{'rpc':<14} {'métrica':<12} {base.get('label') or 'base':>12} {new.get('label') or 'nuevo':>12} {'cambio':>9}"]
+    for rpc in sorted(set(base["rpcs"]) | set(new["rpcs"])):
+        a, b = base["rpcs"].get(rpc, {}), new["rpcs"].get(rpc, {})
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "rps", "texts_per_s"):
+            va, vb = a.get(metric, 0.0), b.get(metric, 0.0)
+            change = f"{(vb - va) / va * 100:+.1f}%" if va else "n/a"
+            rows.append(f"{rpc:<14} {metric:<12} {va:>12.2f} {vb:>12.2f} {change:>9}")
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce tráfico grabado contra el servidor")
+    parser.add_argument("capture", nargs="*", help="JSONL grabado(s) con ML_RECORD_PATH")
+    parser.add_argument("--addr", default="localhost:50051")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = tiempo real, N = N veces más rápido, 0 = máximo")
+    parser.add_argument("--workers", type=int, default=0, help="hilos de envío (0 = automático)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", default="", help="etiqueta del build en el reporte")
+    parser.add_argument("--out", default="", help="guarda el reporte JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"), help="compara dos reportes")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        print(compare(base, new))
+        return
+    if not args.capture:
+        parser.error("falta la grabación (o --compare)")
+
+    import client
+    import sentiment_pb2
+
+    stub = client.make_stub(args.addr)  # con x-client-id: por el socket Unix el servidor lo exige
+    raw = replay(load_capture(args.capture), stub, sentiment_pb2, args.speed, args.workers, args.timeout)
+    report = summarize(raw, args.label, args.speed)
+    json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
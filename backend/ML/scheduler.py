@@ -0,0 +1,106 @@
+"""
+Planificador del modelo con carriles de prioridad.
+
+Las reseñas individuales (Predict) van al carril 'interactive' y los lotes (PredictBatch) al
+carril 'bulk'. El orden de ejecución es de colas justas ponderadas (WFQ): cada trabajo recibe
+una etiqueta virtual inicio + coste/peso y se atiende siempre la menor. Con peso alto, un texto
+interactivo se adelanta a todos los sub-lotes bulk pendientes sin dejarlos en inanición.
+Los lotes se parten en sub-lotes, así que un lote grande es interrumpible entre sub-lotes.
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import tracing
+
+
+DEFAULT_WEIGHTS = {"interactive": 8.0, "bulk": 1.0}
+
+
+class LaneScheduler:
+    """
+    Ejecuta run_fn(textos) en 'workers' hilos, ordenando el trabajo por carril y peso.
+    """
+
+    def __init__(self, run_fn, weights=None, sub_batch: int = 16, workers: int = 2):
+        self.run_fn = run_fn
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.sub_batch = sub_batch
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._last_tag = {lane: 0.0 for lane in self.weights}
+        self.stats = Counter()
+
+        for i in range(workers):
+            threading.Thread(target=self._loop, name=f"planificador-{i}", daemon=True).start()
+
+    def run(self, texts, lane: str = "bulk") -> list:
+        """
+        Encola 'texts' en el carril indicado y bloquea hasta tener todos los resultados.
+        Fuera del carril interactivo, los textos se parten en sub-lotes de 'sub_batch'.
+        """
+        if not texts:
+            return []
+        if lane not in self.weights:
+            raise ValueError(f"Carril desconocido: {lane}")
+        size = len(texts) if lane == "interactive" else self.sub_batch
+        parts = [self._enqueue(lane, texts[i : i + size]) for i in range(0, len(texts), size)]
+        results = []
+        for fut in parts:
+            results.extend(fut.result())
+        return results
+
+    def _enqueue(self, lane: str, texts) -> Future:
+        fut = Future()
+        with self._cond:
+            start = max(self._vtime, self._last_tag[lane])
+            tag = start + len(texts) / self.weights[lane]
+            self._last_tag[lane] = tag
+            # El contexto (traza en curso) viaja con el trabajo hasta el hilo que lo ejecuta
+            item = (tag, next(self._seq), start, lane, texts, fut, time.perf_counter(), contextvars.copy_context())
+            heapq.heappush(self._heap, item)
+            self.stats[f"sched_{lane}_queued"] += 1
+            self._cond.notify()
+        return fut
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, start, lane, texts, fut, t_in, ctx = heapq.heappop(self._heap)
+                self._vtime = max(self._vtime, start)
+                wait_ms = (time.perf_counter() - t_in) * 1000
+                self.stats[f"sched_{lane}_queued"] -= 1
+                self.stats[f"sched_{lane}_items"] += 1
+                self.stats[f"sched_{lane}_wait_ms_total"] += wait_ms
+                self.stats[f"sched_{lane}_wait_ms_max"] = max(self.stats[f"sched_{lane}_wait_ms_max"], wait_ms)
+            if not fut.set_running_or_notify_cancel():
+                continue
+            ctx.run(self._execute, lane, texts, fut, wait_ms)
+
+    def _execute(self, lane: str, texts, fut: Future, wait_ms: float):
+        tracing.record("cola_planificador", time.time() - wait_ms / 1000, wait_ms / 1000, lane=lane, textos=len(texts))
+        try:
+            fut.set_result(self.run_fn(texts))
+        except Exception as e:
+            fut.set_exception(e)
+
+    def snapshot(self) -> dict:
+        """
+        Contadores por carril para el RPC Stats (incluye espera media en cola).
+        """
+        with self._cond:
+            out = {k: float(v) for k, v in self.stats.items()}
+        for lane in self.weights:
+            items = out.get(f"sched_{lane}_items")
+            if items:
+                out[f"sched_{lane}_wait_ms_avg"] = out[f"sched_{lane}_wait_ms_total"] / items
+        return out
@@ -50,6 +50,56 @@ class SentimentServiceStub(object):
                 request_serializer=sentiment__pb2.PingRequest.SerializeToString,
                 response_deserializer=sentiment__pb2.PingResponse.FromString,
                 _registered_method=True)
+        self.Stats = channel.unary_unary(
+                '/sentiment.v1.SentimentService/Stats',
+                request_serializer=sentiment__pb2.StatsRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.StatsResponse.FromString,
+                _registered_method=True)
+        self.PredictShm = channel.unary_unary(
+                '/sentiment.v1.SentimentService/PredictShm',
+                request_serializer=sentiment__pb2.ShmBatchRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.ShmBatchResponse.FromString,
+                _registered_method=True)
+        self.Analyze = channel.unary_unary(
+                '/sentiment.v1.SentimentService/Analyze',
+                request_serializer=sentiment__pb2.AnalyzeRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.AnalyzeResponse.FromString,
+                _registered_method=True)
+        self.FindSimilar = channel.unary_unary(
+                '/sentiment.v1.SentimentService/FindSimilar',
+                request_serializer=sentiment__pb2.FindSimilarRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.FindSimilarResponse.FromString,
+                _registered_method=True)
+        self.Summarize = channel.unary_unary(
+                '/sentiment.v1.SentimentService/Summarize',
+                request_serializer=sentiment__pb2.SummarizeRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.SummarizeResponse.FromString,
+                _registered_method=True)
+        self.SummarizeCorpus = channel.stream_unary(
+                '/sentiment.v1.SentimentService/SummarizeCorpus',
+                request_serializer=sentiment__pb2.SummarizeCorpusRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.SummarizeCorpusResponse.FromString,
+                _registered_method=True)
+        self.SubmitJob = channel.stream_unary(
+                '/sentiment.v1.SentimentService/SubmitJob',
+                request_serializer=sentiment__pb2.SubmitJobRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.SubmitJobResponse.FromString,
+                _registered_method=True)
+        self.GetJobStatus = channel.unary_unary(
+                '/sentiment.v1.SentimentService/GetJobStatus',
+                request_serializer=sentiment__pb2.JobStatusRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.JobStatus.FromString,
+                _registered_method=True)
+        self.FetchResults = channel.unary_stream(
+                '/sentiment.v1.SentimentService/FetchResults',
+                request_serializer=sentiment__pb2.FetchResultsRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.ResultChunk.FromString,
+                _registered_method=True)
+        self.Profile = channel.unary_unary(
+                '/sentiment.v1.SentimentService/Profile',
+                request_serializer=sentiment__pb2.ProfileRequest.SerializeToString,
+                response_deserializer=sentiment__pb2.ProfileResponse.FromString,
+                _registered_method=True)
 
 
 class SentimentServiceServicer(object):
@@ -74,6 +124,74 @@ class SentimentServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Stats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PredictShm(self, request, context):
+        """Lote local por memoria compartida: textos y resultados viajan por un anillo en /dev/shm y
+        por gRPC sólo el descriptor (requiere ML_SHM=1 y conexión por el socket Unix)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Analyze(self, request, context):
+        """Sentimiento global + por aspecto (comida, servicio, precio, ambiente): cada frase distinta se
+        clasifica una vez en un solo lote y global y aspectos combinan esos resultados
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FindSimilar(self, request, context):
+        """Reseñas similares (casi duplicados, "reseñas como esta") en el índice de embeddings
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Summarize(self, request, context):
+        """Resúmenes extractivos: de una reseña y de un conjunto grande enviado por stream
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SummarizeCorpus(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SubmitJob(self, request_iterator, context):
+        """Trabajos asíncronos: los resultados se persisten en disco y sobreviven a la desconexión
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetJobStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FetchResults(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Profile(self, request, context):
+        """Administración: perfil de CPU acotado en el tiempo del proceso en vivo (requiere ML_PROFILING=1)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_SentimentServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -92,6 +210,56 @@ def add_SentimentServiceServicer_to_server(servicer, server):
                     request_deserializer=sentiment__pb2.PingRequest.FromString,
                     response_serializer=sentiment__pb2.PingResponse.SerializeToString,
             ),
+            'Stats': grpc.unary_unary_rpc_method_handler(
+                    servicer.Stats,
+                    request_deserializer=sentiment__pb2.StatsRequest.FromString,
+                    response_serializer=sentiment__pb2.StatsResponse.SerializeToString,
+            ),
+            'PredictShm': grpc.unary_unary_rpc_method_handler(
+                    servicer.PredictShm,
+                    request_deserializer=sentiment__pb2.ShmBatchRequest.FromString,
+                    response_serializer=sentiment__pb2.ShmBatchResponse.SerializeToString,
+            ),
+            'Analyze': grpc.unary_unary_rpc_method_handler(
+                    servicer.Analyze,
+                    request_deserializer=sentiment__pb2.AnalyzeRequest.FromString,
+                    response_serializer=sentiment__pb2.AnalyzeResponse.SerializeToString,
+            ),
+            'FindSimilar': grpc.unary_unary_rpc_method_handler(
+                    servicer.FindSimilar,
+                    request_deserializer=sentiment__pb2.FindSimilarRequest.FromString,
+                    response_serializer=sentiment__pb2.FindSimilarResponse.SerializeToString,
+            ),
+            'Summarize': grpc.unary_unary_rpc_method_handler(
+                    servicer.Summarize,
+                    request_deserializer=sentiment__pb2.SummarizeRequest.FromString,
+                    response_serializer=sentiment__pb2.SummarizeResponse.SerializeToString,
+            ),
+            'SummarizeCorpus': grpc.stream_unary_rpc_method_handler(
+                    servicer.SummarizeCorpus,
+                    request_deserializer=sentiment__pb2.SummarizeCorpusRequest.FromString,
+                    response_serializer=sentiment__pb2.SummarizeCorpusResponse.SerializeToString,
+            ),
+            'SubmitJob': grpc.stream_unary_rpc_method_handler(
+                    servicer.SubmitJob,
+                    request_deserializer=sentiment__pb2.SubmitJobRequest.FromString,
+                    response_serializer=sentiment__pb2.SubmitJobResponse.SerializeToString,
+            ),
+            'GetJobStatus': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetJobStatus,
+                    request_deserializer=sentiment__pb2.JobStatusRequest.FromString,
+                    response_serializer=sentiment__pb2.JobStatus.SerializeToString,
+            ),
+            'FetchResults': grpc.unary_stream_rpc_method_handler(
+                    servicer.FetchResults,
+                    request_deserializer=sentiment__pb2.FetchResultsRequest.FromString,
+                    response_serializer=sentiment__pb2.ResultChunk.SerializeToString,
+            ),
+            'Profile': grpc.unary_unary_rpc_method_handler(
+                    servicer.Profile,
+                    request_deserializer=sentiment__pb2.ProfileRequest.FromString,
+                    response_serializer=sentiment__pb2.ProfileResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'sentiment.v1.SentimentService', rpc_method_handlers)
@@ -184,3 +352,273 @@ class SentimentService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def Stats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/Stats',
+            sentiment__pb2.StatsRequest.SerializeToString,
+            sentiment__pb2.StatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PredictShm(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/PredictShm',
+            sentiment__pb2.ShmBatchRequest.SerializeToString,
+            sentiment__pb2.ShmBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Analyze(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/Analyze',
+            sentiment__pb2.AnalyzeRequest.SerializeToString,
+            sentiment__pb2.AnalyzeResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def FindSimilar(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/FindSimilar',
+            sentiment__pb2.FindSimilarRequest.SerializeToString,
+            sentiment__pb2.FindSimilarResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Summarize(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/Summarize',
+            sentiment__pb2.SummarizeRequest.SerializeToString,
+            sentiment__pb2.SummarizeResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SummarizeCorpus(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/sentiment.v1.SentimentService/SummarizeCorpus',
+            sentiment__pb2.SummarizeCorpusRequest.SerializeToString,
+            sentiment__pb2.SummarizeCorpusResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SubmitJob(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/sentiment.v1.SentimentService/SubmitJob',
+            sentiment__pb2.SubmitJobRequest.SerializeToString,
+            sentiment__pb2.SubmitJobResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetJobStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/GetJobStatus',
+            sentiment__pb2.JobStatusRequest.SerializeToString,
+            sentiment__pb2.JobStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def FetchResults(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/FetchResults',
+            sentiment__pb2.FetchResultsRequest.SerializeToString,
+            sentiment__pb2.ResultChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Profile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/sentiment.v1.SentimentService/Profile',
+            sentiment__pb2.ProfileRequest.SerializeToString,
+            sentiment__pb2.ProfileResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
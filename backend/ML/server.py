@@ -1,10 +1,63 @@
+import itertools
 import os
+import re
+import threading
+from collections import Counter
 from concurrent import futures
+from contextlib import ExitStack
 import grpc
-from transformers import pipeline
 
 import sentiment_pb2
 import sentiment_pb2_grpc
+import profiler
+import tracing
+from admission import AdmissionController, AdmissionInterceptor
+from autotune import DEFAULT_PROFILE_PATH, apply_torch_threads, load_profile
+from inference import StagedInference
+from memory import MemoryWatchdog, WatchdogInterceptor, batch_slices
+from recorder import RecorderInterceptor, TrafficRecorder
+from scheduler import LaneScheduler
+
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def pipeline(*args, **kwargs):
+    """
+    Construye el pipeline de HF importando transformers (y torch) sólo en ese momento,
+    para que importar este módulo, Ping y los tests no paguen ese coste.
+    """
+    from transformers import pipeline as hf_pipeline
+
+    return hf_pipeline(*args, **kwargs)
+
+
+# --------- Helpers de deduplicación ----------
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un texto para comparar duplicados: colapsa espacios y pasa a minúsculas.
+    """
+    return _ESPACIOS.sub(" ", text).strip().casefold()
+
+
+def dedup_texts(texts, normalize: bool = False):
+    """
+    Colapsa textos duplicados conservando el orden de primera aparición.
+    Devuelve (unicos, indices) donde indices[i] es la posición en 'unicos' del texto i.
+    Con normalize=True también se colapsan textos que sólo difieren en espacios o mayúsculas;
+    al modelo se envía la primera variante original encontrada.
+    """
+    unicos = []
+    indices = []
+    vistos = {}
+    for text in texts:
+        key = normalize_text(text) if normalize else text
+        pos = vistos.get(key)
+        if pos is None:
+            pos = vistos[key] = len(unicos)
+            unicos.append(text)
+        indices.append(pos)
+    return unicos, indices
 
 
 class SentimentService(sentiment_pb2_grpc.SentimentServiceServicer):
@@ -12,47 +65,670 @@ class SentimentService(sentiment_pb2_grpc.SentimentServiceServicer):
         """
         Carga el pipeline de BETO (fine-tuned en análisis de sentimientos).
         """
+        # 0) Perfil de autoajuste del host (autotune.py); las variables de entorno tienen prioridad
+        self.profile = load_profile(os.getenv("ML_PROFILE_PATH", DEFAULT_PROFILE_PATH)) or {}
+        if self.profile:
+            apply_torch_threads(self.profile)
+
         # 1) Cargar modelo de HuggingFace
-        self.model_id = "finiteautomata/beto-sentiment-analysis"
+        #    ML_MODEL_ID permite servir otro modelo, p.ej. el estudiante destilado (distill.py)
+        self.model_id = os.getenv("ML_MODEL_ID", "finiteautomata/beto-sentiment-analysis")
         self.clf = pipeline("sentiment-analysis", model=self.model_id)
 
+        # 2) Deduplicación en PredictBatch (ML_DEDUP_NORMALIZE=1 ignora espacios/mayúsculas)
+        self.dedup_normalize = os.getenv("ML_DEDUP_NORMALIZE", "0") == "1"
+
+        # 3) Contadores acumulados expuestos por el RPC Stats
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        # Otras fuentes de métricas (p.ej. control de admisión): callables que devuelven dict
+        self.stats_sources = []
+
+        # 4) Inferencia en dos etapas (tokenizer || modelo) si ML_PIPELINED=1
+        self.engine = None
+        if os.getenv("ML_PIPELINED", "0") == "1":
+            self.engine = StagedInference.from_pipeline(
+                self.clf, micro_batch=self.setting("ML_MICRO_BATCH", "batch_size", 16)
+            )
+
+        # 5) Carriles de prioridad: Predict (interactive) se adelanta a sub-lotes de PredictBatch (bulk)
+        self.scheduler = None
+        if os.getenv("ML_SCHEDULER", "1") == "1":
+            self.scheduler = LaneScheduler(
+                self._run_model,
+                weights={
+                    "interactive": float(os.getenv("ML_INTERACTIVE_WEIGHT", "8")),
+                    "bulk": 1.0,
+                },
+                sub_batch=self.setting("ML_BULK_SUB_BATCH", "batch_size", 16),
+                workers=self.setting("ML_MODEL_THREADS", "workers", 2),
+            )
+            self.stats_sources.append(self.scheduler.snapshot)
+
+        # 6) Cascada: primera etapa lineal barata; sólo los textos dudosos escalan a BETO
+        self.cascade = None
+        if os.getenv("ML_CASCADE_PATH"):
+            from cascade import Cascade, HashedNgramClassifier
+
+            self.cascade = Cascade(
+                HashedNgramClassifier.load(os.environ["ML_CASCADE_PATH"]),
+                threshold=float(os.getenv("ML_CASCADE_THRESHOLD", "0.9")),
+                audit_rate=float(os.getenv("ML_CASCADE_AUDIT", "0.02")),
+            )
+
+        # 7) Trabajos asíncronos persistidos en ML_JOBS_DIR (se crea al primer uso)
+        self.jobs_dir = os.getenv("ML_JOBS_DIR", "jobs")
+        self._jobs = None
+        self._jobs_lock = threading.Lock()
+
+        # 8) Análisis por aspectos (RPC Analyze), construido al primer uso sobre la misma inferencia
+        self._aspects = None
+        self._aspects_lock = threading.Lock()
+
+        # 9) Resúmenes extractivos: muestra acotada por corpus y caché por hash del corpus
+        self.summary_sample = int(os.getenv("ML_SUMMARY_SAMPLE", "5000"))
+        self._summaries = None
+        self._summaries_lock = threading.Lock()
+
+        # 10) Embeddings e índice de similitud persistido en ML_INDEX_PATH (se abren al primer uso)
+        self.index_path = os.getenv("ML_INDEX_PATH", "indice/resenas")
+        self._embedder = None
+        self._index = None
+        self._index_lock = threading.Lock()
+
+        # 11) Perfilado bajo demanda (RPC Profile), desactivado salvo ML_PROFILING=1
+        self.profiling = os.getenv("ML_PROFILING", "0") == "1"
+        self.profiling_max_seconds = float(os.getenv("ML_PROFILING_MAX_SECONDS", "30"))
+
+        # 12) Memoria del proceso: techo de RSS y de RPC para reciclar (supervisor.py); los lotes
+        #     grandes se procesan por tramos de caracteres acotados por el margen de memoria
+        self.watchdog = MemoryWatchdog(
+            max_rss_mb=float(os.getenv("ML_MAX_RSS_MB", "0")),
+            max_requests=int(os.getenv("ML_MAX_REQUESTS", "0")),
+            interval=float(os.getenv("ML_WATCHDOG_S", "5")),
+            batch_max_chars=int(os.getenv("ML_BATCH_MAX_CHARS", "262144")),
+        )
+        self.stats_sources.append(self.watchdog.snapshot)
+
+        # 13) Lotes por memoria compartida (RPC PredictShm), sólo con ML_SHM=1 y por el socket Unix
+        self.shm_enabled = os.getenv("ML_SHM", "0") == "1"
+        self._segments = None
+        self._segments_lock = threading.Lock()
+
+    def setting(self, env: str, key: str, default: int) -> int:
+        """
+        Valor entero de configuración: variable de entorno, si no perfil del host, si no 'default'.
+        """
+        value = os.getenv(env)
+        if value is None:
+            value = self.profile.get(key, default)
+        return int(value)
+
+    def _run_model(self, texts):
+        """
+        Ejecuta el modelo sobre una lista de textos por el camino configurado.
+        """
+        if not texts:
+            return []
+        with tracing.span("modelo", textos=len(texts), etapas=self.engine is not None):
+            if self.engine is not None:
+                return self.engine.classify(texts)
+            with profiler.operators.capture():
+                return self.clf(texts)
+
+    def _infer(self, texts, lane: str = "bulk"):
+        """
+        Infiere con la cascada (si está activa) y el planificador de carriles.
+        """
+        if self.cascade is None:
+            return self._escalate(texts, lane)
+        with tracing.span("cascada", textos=len(texts)):
+            results, metrics = self.cascade.run(texts, lambda subset: self._escalate(subset, lane))
+        self._bump(**metrics)
+        return results
+
+    def _escalate(self, texts, lane: str):
+        """
+        Ejecuta el modelo grande pasando por el planificador de carriles si está activo.
+        """
+        if self.scheduler is not None:
+            return self.scheduler.run(texts, lane)
+        return self._run_model(texts)
+
+    def _bump(self, **deltas):
+        """
+        Incrementa contadores de forma segura entre hilos del servidor.
+        """
+        with self._stats_lock:
+            self._stats.update(deltas)
+
     def Predict(self, request, context):
         """
         Recibe un texto y devuelve etiqueta y score.
         """
-        result = self.clf(request.text)[0]
+        result = self._infer([request.text], lane="interactive")[0]
+        self._bump(predict_requests=1)
         return sentiment_pb2.PredictResponse(
             label=result["label"],
             score=result["score"]
         )
 
+    def classify_batch(self, texts):
+        """
+        Clasifica una lista de textos en el carril bulk. Los duplicados se infieren una sola vez
+        y el resultado se replica a cada posición. Devuelve (labels, scores, n_unicos).
+        """
+        unicos, indices = dedup_texts(texts, normalize=self.dedup_normalize)
+        results = []
+        for start, end in batch_slices(unicos, self.watchdog.batch_budget()):
+            results.extend(self._infer(unicos[start:end], lane="bulk"))
+            self._bump(batch_slices=1)
+        self._bump(
+            batch_texts=len(texts),
+            batch_unique_texts=len(unicos),
+            batch_duplicates_skipped=len(texts) - len(unicos),
+        )
+        labels = [results[i]["label"] for i in indices]
+        scores = [results[i]["score"] for i in indices]
+        return labels, scores, len(unicos)
+
     def PredictBatch(self, request, context):
         """
         Recibe lista de textos y devuelve listas paralelas de etiquetas y scores.
         """
-        results = self.clf(list(request.texts))
-        labels = [r["label"] for r in results]
-        scores = [r["score"] for r in results]
+        if request.token_ids and not request.texts:
+            return self._predict_tokens(request, context)
+        if request.return_embeddings or request.add_to_index:
+            return self._predict_embeddings(request, context)
+
+        labels, scores, unicos = self.classify_batch(list(request.texts))
+        self._bump(batch_requests=1)
         return sentiment_pb2.PredictBatchResponse(
             labels=labels,
-            scores=scores
+            scores=scores,
+            unique_texts=unicos
+        )
+
+    def PredictShm(self, request, context):
+        """
+        PredictBatch para clientes del mismo host: los textos se leen de un hueco del segmento de
+        memoria compartida del cliente y los resultados se escriben en ese mismo hueco.
+        """
+        if not self.shm_enabled:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "PredictShm requiere ML_SHM=1")
+        if not context.peer().startswith("unix:"):
+            context.abort(grpc.StatusCode.PERMISSION_DENIED, "PredictShm sólo se admite por el socket Unix (ML_UDS_PATH)")
+        import shm
+
+        with self._segments_lock:
+            if self._segments is None:
+                self._segments = shm.SegmentCache(int(os.getenv("ML_SHM_SEGMENTS", "16")))
+        with ExitStack() as stack:
+            try:
+                # El segmento sigue abierto hasta escribir los resultados aunque el LRU lo desaloje
+                buf = stack.enter_context(self._segments.use(request.segment))
+                texts = shm.read_texts(buf, request.offset, request.size)
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Hueco de memoria compartida inválido: {e}")
+            if len(texts) != request.count:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Se esperaban {request.count} textos y hay {len(texts)}")
+
+            labels, scores, unicos = self.classify_batch(texts)
+            vocab = sorted(set(labels))
+            position = {label: i for i, label in enumerate(vocab)}
+            shm.write_results(buf, request.offset, [position[label] for label in labels], scores)
+        self._bump(batch_requests=1, shm_requests=1, shm_texts=len(texts))
+        return sentiment_pb2.ShmBatchResponse(labels=vocab, unique_texts=unicos)
+
+    def _predict_tokens(self, request, context):
+        """
+        Camino pre-tokenizado de PredictBatch: los ids van directo a la etapa del modelo.
+        """
+        if self.engine is None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "token_ids requiere ML_PIPELINED=1")
+        results = self.engine.submit_encoded([list(t.ids) for t in request.token_ids]).result()
+        self._bump(batch_requests=1, batch_pretokenized_texts=len(results))
+        return sentiment_pb2.PredictBatchResponse(
+            labels=[r["label"] for r in results],
+            scores=[r["score"] for r in results],
+            unique_texts=len(results)
+        )
+
+    # --------- Embeddings y similitud ----------
+    @property
+    def embedder(self):
+        """
+        Motor que devuelve etiqueta y embedding del mismo forward: el de ML_PIPELINED si existe,
+        si no uno propio sobre el mismo modelo (sin copiar pesos).
+        """
+        with self._index_lock:
+            if self._embedder is None:
+                self._embedder = self.engine or StagedInference.from_pipeline(
+                    self.clf, micro_batch=self.setting("ML_MICRO_BATCH", "batch_size", 16)
+                )
+            return self._embedder
+
+    @property
+    def index(self):
+        """
+        Índice de similitud mapeado en memoria; al reiniciar se reabre sin recalcular embeddings.
+        """
+        embedder = self.embedder
+        with self._index_lock:
+            if self._index is None:
+                from similarity import SimilarityIndex
+
+                self._index = SimilarityIndex(self.index_path, embedder.embedding_dim)
+            return self._index
+
+    def _predict_embeddings(self, request, context):
+        """
+        PredictBatch con embeddings: un forward por texto único da etiqueta, score y embedding;
+        opcionalmente los textos se añaden al índice de similitud.
+        """
+        try:
+            embedder = self.embedder
+        except (AttributeError, ValueError) as e:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"Embeddings no disponibles con este modelo: {e}")
+        texts = list(request.texts)
+        unicos, indices = dedup_texts(texts, normalize=self.dedup_normalize)
+        results = []
+        with tracing.span("modelo_embeddings", textos=len(unicos)):
+            for start, end in batch_slices(unicos, self.watchdog.batch_budget()):
+                results.extend(embedder.classify(unicos[start:end], embed=True))
+        ids = []
+        if request.add_to_index and unicos:
+            ids = self.index.add([r["embedding"] for r in results], unicos)
+        self._bump(batch_requests=1, batch_texts=len(texts), batch_unique_texts=len(unicos),
+                   batch_duplicates_skipped=len(texts) - len(unicos), index_added=len(ids))
+        return sentiment_pb2.PredictBatchResponse(
+            labels=[results[i]["label"] for i in indices],
+            scores=[results[i]["score"] for i in indices],
+            unique_texts=len(unicos),
+            embeddings=[sentiment_pb2.Embedding(values=results[i]["embedding"]) for i in indices]
+            if request.return_embeddings else [],
+            index_ids=[ids[i] for i in indices] if ids else [],
         )
 
+    def FindSimilar(self, request, context):
+        """
+        Reseñas del índice más parecidas al texto dado (similitud coseno de embeddings).
+        """
+        try:
+            index = self.index
+        except (AttributeError, ValueError) as e:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"Índice de similitud no disponible: {e}")
+        with tracing.span("modelo_embeddings", textos=1):
+            query = self.embedder.classify([request.text], embed=True)[0]["embedding"]
+        with tracing.span("busqueda_similares", filas=len(index)):
+            matches = index.search(query, k=request.k or 5, min_score=request.min_score or -1.0)
+        self._bump(find_similar_requests=1)
+        return sentiment_pb2.FindSimilarResponse(
+            matches=[sentiment_pb2.SimilarReview(id=i, text=t, score=sc) for i, sc, t in matches],
+            index_size=len(index),
+        )
+
+    # --------- Análisis por aspectos ----------
+    @property
+    def aspects(self):
+        """
+        Analizador por aspectos que clasifica con la misma inferencia que Predict.
+        """
+        with self._aspects_lock:
+            if self._aspects is None:
+                from aspects import AspectAnalyzer
+
+                self._aspects = AspectAnalyzer(lambda texts: self._infer(texts, lane="interactive"))
+            return self._aspects
+
+    def Analyze(self, request, context):
+        """
+        Sentimiento global y por aspecto (comida, servicio, precio, ambiente) de una reseña:
+        cada frase distinta se clasifica una vez, en un lote del carril interactivo.
+        """
+        with tracing.span("aspectos"):
+            result = self.aspects.analyze([request.text])[0]
+        self._bump(analyze_requests=1, analyze_aspects=len(result["aspects"]))
+        return sentiment_pb2.AnalyzeResponse(
+            label=result["label"],
+            score=result["score"],
+            aspects=[sentiment_pb2.AspectSentiment(**a) for a in result["aspects"]],
+        )
+
+    # --------- Resúmenes ----------
+    @property
+    def summaries(self):
+        """
+        Caché de resúmenes de corpus, creada al primer uso.
+        """
+        with self._summaries_lock:
+            if self._summaries is None:
+                from summarize import SummaryCache
+
+                self._summaries = SummaryCache(int(os.getenv("ML_SUMMARY_CACHE", "128")))
+            return self._summaries
+
+    def Summarize(self, request, context):
+        """
+        Resumen extractivo de una reseña.
+        """
+        from summarize import summarize_text
+
+        self._bump(summarize_requests=1)
+        return sentiment_pb2.SummarizeResponse(sentences=summarize_text(request.text, request.sentences or 2))
+
+    def SummarizeCorpus(self, request_iterator, context):
+        """
+        Resumen extractivo de un conjunto de reseñas recibido por stream (o de un archivo local),
+        opcionalmente filtrado por sentimiento. Memoria acotada por ML_SUMMARY_SAMPLE y caché
+        por hash del corpus: si el primer mensaje trae un corpus_hash conocido se responde sin leer el resto.
+        """
+        from summarize import CorpusSummarizer, corpus_digest, label_key
+
+        first = next(request_iterator, None)
+        if first is None:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "SummarizeCorpus requiere textos, file_path o corpus_hash")
+        label = label_key(first.label)
+        params = (label, first.sentences or 5)
+
+        if first.file_path:
+            if not os.path.isfile(first.file_path):
+                context.abort(grpc.StatusCode.NOT_FOUND, f"No existe el archivo: {first.file_path}")
+            st = os.stat(first.file_path)
+            file_key = (os.path.realpath(first.file_path), st.st_size, st.st_mtime_ns, first.column)
+            key = corpus_digest([], file_key + params)
+        else:
+            key = first.corpus_hash
+        cached = self.summaries.get(key) if key else None
+        if cached is not None:
+            self._bump(summary_cache_hits=1)
+            return sentiment_pb2.SummarizeCorpusResponse(corpus_hash=key, cached=True, **cached)
+
+        summarizer = CorpusSummarizer(sample_size=self.summary_sample)
+        if first.file_path:
+            from jobs import iter_text_batches
+
+            chunks = ((texts, ()) for texts in iter_text_batches(first.file_path, first.column))
+        else:
+            summarizer.start(params)
+            messages = itertools.chain([first], request_iterator)
+            chunks = ((list(m.texts), list(m.labels)) for m in messages)
+
+        with tracing.span("resumen_corpus", etiqueta=label):
+            for texts, labels in chunks:
+                keep = None
+                sent = labels if len(labels) == len(texts) else None
+                if label and texts:
+                    keep = [label_key(l) == label for l in (sent or self.classify_batch(texts)[0])]
+                summarizer.add(texts, keep, sent)
+            if not summarizer.seen and first.corpus_hash:
+                context.abort(grpc.StatusCode.NOT_FOUND, f"corpus_hash desconocido: {first.corpus_hash}")
+            result = {
+                "sentences": summarizer.summary(params[1]),
+                "texts": summarizer.seen,
+                "matched": summarizer.matched,
+                "sampled": len(summarizer.sample),
+            }
+        key = key if first.file_path else summarizer.digest
+        self.summaries.put(key, result)
+        self._bump(summary_corpus_requests=1, summary_corpus_texts=summarizer.seen)
+        return sentiment_pb2.SummarizeCorpusResponse(corpus_hash=key, cached=False, **result)
+
+    # --------- Trabajos asíncronos ----------
+    @property
+    def jobs(self):
+        """
+        Worker de trabajos, creado al primer uso (retoma los trabajos pendientes en disco).
+        """
+        with self._jobs_lock:
+            if self._jobs is None:
+                from jobs import JobStore, JobWorker
+
+                store = JobStore(self.jobs_dir)
+                self._jobs = JobWorker(
+                    store,
+                    lambda texts: self.classify_batch(texts)[:2],
+                    batch_size=int(os.getenv("ML_JOB_BATCH", "512")),
+                    rescan_interval=float(os.getenv("ML_JOB_RESCAN_S", "30")),
+                )
+            return self._jobs
+
+    def SubmitJob(self, request_iterator, context):
+        """
+        Crea un trabajo a partir de textos en stream o de una ruta local y lo encola.
+        Responde con el job_id en cuanto termina la recepción, sin esperar a la inferencia.
+        """
+        store = self.jobs.store
+        first = next(request_iterator, None)
+        if first is None or (not first.texts and not first.file_path):
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "SubmitJob requiere textos o file_path")
+
+        if first.file_path:
+            if not os.path.isfile(first.file_path):
+                context.abort(grpc.StatusCode.NOT_FOUND, f"No existe el archivo: {first.file_path}")
+            job_id = store.create({"file_path": first.file_path, "column": first.column})
+            self.jobs.enqueue(job_id)
+            self._bump(jobs_submitted=1)
+            return sentiment_pb2.SubmitJobResponse(job_id=job_id, total=0)
+
+        job_id = store.create({})
+        try:
+            chunks = (list(msg.texts) for msg in itertools.chain([first], request_iterator))
+            total = store.write_input(job_id, chunks)
+        except Exception as e:
+            store.update(job_id, state="failed", error=f"recepción interrumpida: {e}")
+            store.release(job_id)
+            raise
+        store.update(job_id, total=total)
+        self.jobs.enqueue(job_id)
+        self._bump(jobs_submitted=1)
+        return sentiment_pb2.SubmitJobResponse(job_id=job_id, total=total)
+
+    def GetJobStatus(self, request, context):
+        """
+        Estado y progreso de un trabajo.
+        """
+        store = self.jobs.store
+        if not store.exists(request.job_id):
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Trabajo desconocido: {request.job_id}")
+        meta = store.load(request.job_id)
+        return sentiment_pb2.JobStatus(
+            job_id=meta["job_id"],
+            state=meta["state"],
+            total=meta["total"],
+            done=meta["done"],
+            error=meta["error"],
+        )
+
+    def FetchResults(self, request, context):
+        """
+        Devuelve por stream los resultados ya persistidos, desde 'offset'.
+        Puede llamarse con el trabajo aún en curso para leer los bloques terminados.
+        """
+        store = self.jobs.store
+        if not store.exists(request.job_id):
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Trabajo desconocido: {request.job_id}")
+        for offset, labels, scores in store.iter_results(
+            request.job_id, request.offset, request.chunk_size or 1000
+        ):
+            yield sentiment_pb2.ResultChunk(offset=offset, labels=labels, scores=scores)
+
+    # --------- Administración ----------
+    def Profile(self, request, context):
+        """
+        Perfil de CPU del proceso durante una ventana acotada: pilas de Python muestreadas y,
+        opcionalmente, tiempo por operador de torch. Un solo perfil a la vez.
+        """
+        if not self.profiling:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Profile requiere ML_PROFILING=1")
+        seconds = min(request.seconds or 5.0, self.profiling_max_seconds)
+        interval = max(request.interval_ms or 10, 1) / 1000
+        try:
+            result = profiler.profile_process(seconds, interval, torch_ops=request.torch_ops)
+        except profiler.ProfileBusy as e:
+            context.abort(grpc.StatusCode.ABORTED, str(e))
+        self._bump(profiles_taken=1)
+        return sentiment_pb2.ProfileResponse(**result)
+
     def Ping(self, request, context):
         """
         Verifica que el servicio esté vivo.
         """
         return sentiment_pb2.PingResponse(status="ok")
 
+    def Stats(self, request, context):
+        """
+        Devuelve los contadores acumulados del servicio (incluye estadísticas de deduplicación).
+        """
+        with self._stats_lock:
+            counters = {k: float(v) for k, v in self._stats.items()}
+        if counters.get("batch_texts"):
+            counters["batch_dedup_ratio"] = counters["batch_duplicates_skipped"] / counters["batch_texts"]
+        if counters.get("cascade_texts"):
+            counters["cascade_escalation_rate"] = counters["cascade_escalated"] / counters["cascade_texts"]
+        if counters.get("cascade_audited"):
+            counters["cascade_agreement"] = counters["cascade_audit_agree"] / counters["cascade_audited"]
+        if self.engine is not None:
+            counters["token_length_cache_size"] = float(len(self.engine.lengths))
+        if self._index is not None:
+            counters["index_size"] = float(len(self._index))
+        for source in self.stats_sources:
+            counters.update(source())
+        return sentiment_pb2.StatsResponse(counters=counters)
+
+
+# --------- Trazas ----------
+class TracingInterceptor(grpc.ServerInterceptor):
+    """
+    Abre un span por RPC unario como hijo del 'traceparent' recibido en la metadata.
+    Debe ser el primer interceptor para que la espera en admisión quede dentro del span.
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or handler.unary_unary is None:
+            return handler
+
+        behavior = handler.unary_unary
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+        parent = tracing.extract(handler_call_details.invocation_metadata)
+
+        def traced(request, context):
+            with tracing.span(f"rpc {method}", parent=parent, kind="SERVER"):
+                return behavior(request, context)
+
+        return grpc.unary_unary_rpc_method_handler(
+            traced,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
+
+
+def build_server(address: str = "[::]:50051", on_limit=None, resume_jobs: bool = True, worker_id=None):
+    """
+    Construye (sin arrancar) el servidor gRPC con control de admisión por carril.
+    Predict/Analyze/FindSimilar (interactivo) y el resto de RPC de inferencia (bulk) tienen colas de admisión
+    separadas, y SubmitJob/FetchResults (jobs) un tope sin cola; el pool de gRPC se dimensiona para
+    alojar los tres carriles más los RPC exentos, de modo que el rechazo ocurre antes de encolar sin límite. El puerto se abre con SO_REUSEPORT para que varios
+    procesos (supervisor.py) lo compartan. 'on_limit' recibe el aviso del watchdog de memoria;
+    'worker_id' (supervisor) separa por proceso lo que no se puede compartir, como la grabación.
+    Devuelve (server, service).
+    """
+    def admission(name):
+        return AdmissionController(
+            slots=int(os.getenv("ML_WORKERS", "4")),
+            max_queue=int(os.getenv("ML_MAX_QUEUE", "32")),
+            latency_budget=float(os.getenv("ML_LATENCY_BUDGET_MS", "2000")) / 1000,
+            per_client=int(os.getenv("ML_CLIENT_QUOTA", "8")),
+            name=name,
+        )
+
+    # Trazas: sólo con ML_TRACE_PATH; las trazas que llegan con traceparent respetan su muestreo
+    tracing.configure(
+        "sentiment-grpc",
+        path=os.getenv("ML_TRACE_PATH") or None,
+        sample_rate=float(os.getenv("ML_TRACE_SAMPLE", "0.01")),
+    )
+
+    # Grabación de tráfico para replay.py: sólo con ML_RECORD_PATH
+    recorder = None
+    if os.getenv("ML_RECORD_PATH"):
+        path = os.environ["ML_RECORD_PATH"]
+        recorder = TrafficRecorder(
+            path if worker_id is None else f"{path}.{worker_id}.{os.getpid()}",
+            include_texts=os.getenv("ML_RECORD_TEXTS", "0") == "1",
+            sample=float(os.getenv("ML_RECORD_SAMPLE", "1")),
+            t0=float(os.environ["ML_RECORD_T0"]) if os.getenv("ML_RECORD_T0") else None,
+        )
+
+    service = SentimentService()
+    service.watchdog.on_limit = on_limit
+    interactive, bulk = admission("interactive"), admission("bulk")
+    # SubmitJob/FetchResults: transferencias largas sin modelo; tope propio y sin cola (rechazo con retry-after)
+    jobs = AdmissionController(
+        slots=int(os.getenv("ML_MAX_JOB_STREAMS", "4")),
+        max_queue=0,
+        per_client=int(os.getenv("ML_CLIENT_QUOTA", "8")),
+        name="jobs",
+    )
+    # +4 hilos para Ping/Stats/GetJobStatus/Profile, que no pasan por la cola de admisión
+    threads = sum(c.slots + c.max_queue for c in (interactive, bulk, jobs)) + 4
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=threads),
+        interceptors=[TracingInterceptor(), WatchdogInterceptor(service.watchdog)]
+        + ([RecorderInterceptor(recorder)] if recorder else [])
+        + [
+            AdmissionInterceptor(
+                bulk,
+                exempt=("Ping", "Stats", "GetJobStatus", "Profile"),
+                lanes={
+                    "Predict": interactive, "Analyze": interactive, "FindSimilar": interactive,
+                    "SubmitJob": jobs, "FetchResults": jobs,
+                },
+            )
+        ],
+        options=[("grpc.so_reuseport", 1)],
+        maximum_concurrent_rpcs=threads,
+    )
+    service.stats_sources.extend([interactive.snapshot, bulk.snapshot, jobs.snapshot])
+    if recorder:
+        service.stats_sources.append(recorder.snapshot)
+    if resume_jobs:
+        service.jobs  # retoma trabajos pendientes de una ejecución anterior
+    sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(service, server)
+    server.add_insecure_port(address)
+    # Socket Unix para clientes del mismo host (sin TCP; necesario para PredictShm). Con el
+    # supervisor cada proceso tiene su socket y publica la ruta común al arrancar (publish_socket)
+    service.uds_path = None
+    if os.getenv("ML_UDS_PATH"):
+        path = os.environ["ML_UDS_PATH"]
+        service.uds_path = path if worker_id is None else f"{path}.{worker_id}.{os.getpid()}"
+        server.add_insecure_port(f"unix:{service.uds_path}")
+    return server, service
+
+
+def publish_socket(socket_path: str, links):
+    """
+    Apunta cada ruta de 'links' al socket Unix de este proceso reemplazando el enlace simbólico
+    de forma atómica: un cliente que conecta nunca encuentra la ruta vacía, y cuando el proceso
+    anterior drena y borra su socket la ruta ya apunta al reemplazo.
+    """
+    target = os.path.abspath(socket_path)
+    for link in links:
+        tmp = f"{link}.{os.getpid()}.tmp"
+        os.symlink(target, tmp)
+        os.replace(tmp, link)
+
 
 def serve():
     """
-    Arranca servidor gRPC en puerto 50051.
+    Arranca un único proceso servidor en el puerto 50051 (varios procesos con reciclado: supervisor.py).
     """
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
-    sentiment_pb2_grpc.add_SentimentServiceServicer_to_server(SentimentService(), server)
-    server.add_insecure_port("[::]:50051")
+    server, service = build_server(
+        on_limit=lambda reason: print(f"Límite del watchdog alcanzado ({reason}); para reciclar sin cortes usa ML/supervisor.py")
+    )
     server.start()
+    service.watchdog.start()
     print("SentimentService gRPC corriendo en puerto 50051")
     server.wait_for_termination()
 
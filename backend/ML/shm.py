@@ -0,0 +1,224 @@
+"""
+Camino de lotes por memoria compartida para clientes en el mismo host (RPC PredictShm).
+
+El cliente crea un segmento (multiprocessing.shared_memory, en /dev/shm) y lo usa como anillo:
+cada lote reserva un hueco contiguo, escribe ahí los textos y por gRPC (socket Unix) sólo envía
+el descriptor (segmento, offset, tamaño, nº de textos). El servidor lee los textos del hueco,
+clasifica y escribe los resultados en el mismo hueco; la respuesta gRPC sólo trae el vocabulario
+de etiquetas. Sin framing HTTP/2 ni copias de strings protobuf para los textos.
+
+Formato de un hueco (little-endian, alineado a 8 bytes):
+  [n: uint32][data_len: uint32][offsets: (n+1) x uint32][data: utf-8][pad]
+  [label_idx: n x uint16][pad][scores: n x float32]
+"""
+import threading
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+_ALIGN = 8
+
+
+def _align(n: int, to: int = _ALIGN) -> int:
+    return (n + to - 1) // to * to
+
+
+def _layout(count: int, data_len: int) -> tuple:
+    """
+    (inicio de data, inicio de label_idx, inicio de scores, tamaño total) del hueco.
+    """
+    data_start = 8 + 4 * (count + 1)
+    labels_start = _align(data_start + data_len)
+    scores_start = _align(labels_start + 2 * count)
+    return data_start, labels_start, scores_start, _align(scores_start + 4 * count)
+
+
+def encode_texts(texts) -> tuple:
+    """
+    (bytes del encabezado + datos, tamaño total del hueco con el espacio de resultados).
+    """
+    encoded = [t.encode("utf-8") for t in texts]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.uint32, count=len(encoded))
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum(lengths, out=offsets[1:])
+    data = b"".join(encoded)
+    header = np.array([len(encoded), len(data)], dtype="<u4").tobytes()
+    return header + offsets.tobytes() + data, _layout(len(encoded), len(data))[3]
+
+
+def read_texts(buf, offset: int, size: int) -> list:
+    """
+    Textos del hueco [offset, offset+size) validando que el formato cabe en él.
+    """
+    if offset + 8 > len(buf) or offset + size > len(buf):
+        raise ValueError("Hueco fuera del segmento")
+    count, data_len = (int(x) for x in np.frombuffer(buf, dtype="<u4", count=2, offset=offset))
+    data_start, _, _, total = _layout(count, data_len)
+    if total > size:
+        raise ValueError(f"Hueco de {size} bytes insuficiente para {count} textos ({total} bytes)")
+    offsets = np.frombuffer(buf, dtype="<u4", count=count + 1, offset=offset + 8).tolist()
+    if offsets[-1] != data_len or any(a > b for a, b in zip(offsets, offsets[1:])):
+        raise ValueError("Tabla de offsets inválida")
+    data = bytes(buf[offset + data_start : offset + data_start + data_len])
+    return [data[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+
+
+def write_results(buf, offset: int, label_idx, scores):
+    """
+    Escribe índices de etiqueta y scores en la zona de resultados del hueco.
+    """
+    count, data_len = (int(x) for x in np.frombuffer(buf, dtype="<u4", count=2, offset=offset))
+    _, labels_start, scores_start, _ = _layout(count, data_len)
+    np.frombuffer(buf, dtype="<u2", count=count, offset=offset + labels_start)[:] = label_idx
+    np.frombuffer(buf, dtype="<f4", count=count, offset=offset + scores_start)[:] = scores
+
+
+def read_results(buf, offset: int) -> tuple:
+    """
+    (índices de etiqueta, scores) del hueco como arrays de numpy (copias).
+    """
+    count, data_len = (int(x) for x in np.frombuffer(buf, dtype="<u4", count=2, offset=offset))
+    _, labels_start, scores_start, _ = _layout(count, data_len)
+    labels = np.frombuffer(buf, dtype="<u2", count=count, offset=offset + labels_start).copy()
+    scores = np.frombuffer(buf, dtype="<f4", count=count, offset=offset + scores_start).copy()
+    return labels, scores
+
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Abre un segmento creado por otro proceso sin que el resource_tracker de este lo borre al salir.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        pass
+    # Antes de 3.13 abrir un segmento lo registra en el tracker, que lo borraría al salir
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SegmentCache:
+    """
+    Segmentos abiertos en el servidor por nombre (LRU), para no reabrirlos en cada lote.
+    Cuenta las referencias en uso: un segmento desalojado mientras otro hilo lo lee o escribe se
+    cierra cuando ese hilo lo suelta, no antes (cerrarlo con la vista exportada falla).
+    """
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self._segments = {}  # nombre -> [SharedMemory, referencias en uso]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def use(self, name: str):
+        """
+        Buffer del segmento 'name', abierto al menos hasta salir del bloque.
+        """
+        with self._lock:
+            entry = self._segments.pop(name, None) or [attach(name), 0]
+            entry[1] += 1
+            self._segments[name] = entry
+            while len(self._segments) > self.maxsize:
+                old = self._segments.pop(next(iter(self._segments)))
+                if old[1] == 0:
+                    old[0].close()
+        try:
+            yield entry[0].buf
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0 and self._segments.get(name) is not entry:
+                    entry[0].close()
+
+
+class ShmRing:
+    """
+    Anillo de huecos en un segmento propio del cliente. reserve() bloquea hasta que hay sitio;
+    los huecos se liberan en cualquier orden y el espacio se recupera en orden FIFO.
+    """
+
+    def __init__(self, size: int = 64 * 1024 * 1024):
+        self.segment = shared_memory.SharedMemory(create=True, size=size)
+        self.name = self.segment.name
+        self.buf = self.segment.buf
+        self.capacity = size
+        self._head = 0
+        self._regions = deque()  # [inicio, fin, liberado]
+        self._cond = threading.Condition()
+
+    def _place(self, n: int):
+        if not self._regions:
+            return 0
+        tail = self._regions[0][0]
+        if self._head > tail:
+            if self._head + n <= self.capacity:
+                return self._head
+            return 0 if n <= tail else None
+        if self._head < tail and self._head + n <= tail:
+            return self._head
+        return None  # head == tail con huecos vivos: lleno
+
+    def reserve(self, n: int) -> int:
+        n = _align(n)
+        if n > self.capacity:
+            raise ValueError(f"El lote ({n} bytes) no cabe en el anillo ({self.capacity} bytes)")
+        with self._cond:
+            while (offset := self._place(n)) is None:
+                self._cond.wait()
+            self._regions.append([offset, offset + n, False])
+            self._head = offset + n
+            return offset
+
+    def release(self, offset: int):
+        with self._cond:
+            for region in self._regions:
+                if region[0] == offset and not region[2]:
+                    region[2] = True
+                    break
+            while self._regions and self._regions[0][2]:
+                self._regions.popleft()
+            self._cond.notify_all()
+
+    def close(self):
+        self.buf = None
+        self.segment.close()
+        self.segment.unlink()
+
+
+class ShmPredictor:
+    """
+    Cliente del camino PredictShm: predict_batch(texts) -> [(label, score)], seguro entre hilos.
+    'stub' debe ir por el socket Unix del servidor (unix:/ruta).
+    """
+
+    def __init__(self, stub, size: int = 64 * 1024 * 1024):
+        import sentiment_pb2
+
+        self._pb = sentiment_pb2
+        self.stub = stub
+        self.ring = ShmRing(size)
+
+    def predict_batch(self, texts, **kwargs) -> list:
+        payload, size = encode_texts(texts)
+        offset = self.ring.reserve(size)
+        try:
+            self.ring.buf[offset : offset + len(payload)] = payload
+            resp = self.stub.PredictShm(
+                self._pb.ShmBatchRequest(segment=self.ring.name, offset=offset, size=size, count=len(texts)),
+                **kwargs,
+            )
+            label_idx, scores = read_results(self.ring.buf, offset)
+        finally:
+            self.ring.release(offset)
+        vocab = list(resp.labels)
+        return [(vocab[i], float(s)) for i, s in zip(label_idx.tolist(), scores.tolist())]
+
+    def close(self):
+        self.ring.close()
@@ -0,0 +1,201 @@
+"""
+Índice de similitud de reseñas sobre embeddings (RPC FindSimilar).
+
+Los vectores (float32, normalizados) viven en un archivo mapeado en memoria (np.memmap) que
+crece por duplicación; los textos van en un JSONL paralelo y el número de filas confirmadas en
+un pequeño JSON que se reescribe de forma atómica tras cada alta. Al reiniciar, el índice se
+abre tal cual sin volver a calcular embeddings; lo escrito tras el último conteo confirmado
+(p.ej. un alta interrumpida) se descarta.
+
+Un texto ya indexado no se vuelve a añadir: add() devuelve el id de su fila existente.
+La búsqueda es exacta: producto escalar de la consulta contra todas las filas (similitud coseno).
+
+Varios procesos (supervisor.py) pueden compartir el índice: las altas se serializan con flock
+sobre '<path>.lock' y cada proceso incorpora las filas confirmadas por los demás en cuanto ve
+cambiar el JSON del conteo.
+"""
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class SimilarityIndex:
+    """
+    Índice incremental persistido en '<path>.f32' (vectores), '<path>.jsonl' (textos) y
+    '<path>.json' (dimensión y filas confirmadas).
+    """
+
+    def __init__(self, path: str, dim: int, initial_capacity: int = 1024):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        with self._file_lock():  # otro proceso podría estar a mitad de un alta
+            self._meta_stamp = self._stamp()
+            meta = self._read_meta()
+            if meta and meta["dim"] != dim:
+                raise ValueError(f"El índice {path} tiene dimensión {meta['dim']}, no {dim}")
+            self.count = meta["count"] if meta else 0
+            self.texts = self._read_texts(self.count)
+            self._ids = {text: i for i, text in reversed(list(enumerate(self.texts)))}
+
+            rows = os.path.getsize(self._vectors_path) // (4 * dim) if os.path.exists(self._vectors_path) else 0
+            self._open(max(rows, initial_capacity, self.count))
+
+    # --------- Archivos ----------
+    @property
+    def _vectors_path(self):
+        return self.path + ".f32"
+
+    @property
+    def _texts_path(self):
+        return self.path + ".jsonl"
+
+    @property
+    def _meta_path(self):
+        return self.path + ".json"
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _stamp(self):
+        """
+        Identidad del JSON del conteo: cada reescritura atómica crea un archivo (inodo) nuevo.
+        """
+        try:
+            st = os.stat(self._meta_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _read_meta(self):
+        if not os.path.isfile(self._meta_path):
+            return None
+        with open(self._meta_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _read_texts(self, count: int) -> list:
+        texts, offset = [], 0
+        if os.path.isfile(self._texts_path):
+            with open(self._texts_path, "rb") as f:
+                for line in f:
+                    if len(texts) >= count:
+                        break
+                    texts.append(json.loads(line))
+                    offset += len(line)
+            # Descarta textos de un alta no confirmada para que el JSONL siga alineado con los vectores
+            with open(self._texts_path, "r+b") as f:
+                f.truncate(offset)
+        self._texts_offset = offset
+        if len(texts) < count:
+            raise ValueError(f"Índice {self.path} inconsistente: {len(texts)} textos para {count} vectores")
+        return texts
+
+    def _open(self, capacity: int):
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.capacity = capacity
+        self.vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _write_meta(self):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.count}, f)
+        os.replace(tmp, self._meta_path)
+        self._meta_stamp = self._stamp()
+
+    def _sync(self):
+        """
+        Incorpora las filas confirmadas por otros procesos desde la última lectura (con _lock).
+        """
+        stamp = self._stamp()
+        if stamp == self._meta_stamp:
+            return
+        meta = self._read_meta()
+        self._meta_stamp = stamp
+        if not meta or meta["count"] <= self.count:
+            return
+        with open(self._texts_path, "rb") as f:
+            f.seek(self._texts_offset)
+            for row in range(self.count, meta["count"]):
+                line = f.readline()
+                text = json.loads(line)
+                self._texts_offset += len(line)
+                self._ids.setdefault(text, row)
+                self.texts.append(text)
+        rows = os.path.getsize(self._vectors_path) // (4 * self.dim)
+        if rows > self.capacity:
+            self._open(rows)
+        self.count = meta["count"]
+
+    # --------- API ----------
+    def __len__(self):
+        return self.count
+
+    def add(self, vectors, texts) -> list:
+        """
+        Añade filas (vectores normalizados + su texto) saltando los textos ya indexados.
+        Devuelve el id (nº de fila) de cada texto, nuevo o existente, en el orden recibido.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) != len(texts):
+            raise ValueError("vectors y texts deben tener la misma longitud")
+        with self._lock, self._file_lock():
+            self._sync()
+            ids, new, pending = [], [], {}
+            for i, text in enumerate(texts):
+                row = self._ids.get(text, pending.get(text))
+                if row is None:
+                    row = pending[text] = self.count + len(new)
+                    new.append(i)
+                ids.append(row)
+            if not new:
+                return ids
+            vectors, texts = vectors[new], [texts[i] for i in new]
+            start, end = self.count, self.count + len(vectors)
+            if end > self.capacity:
+                self.vectors.flush()
+                capacity = self.capacity
+                while capacity < end:
+                    capacity *= 2
+                self._open(capacity)
+            self.vectors[start:end] = vectors
+            self.vectors.flush()
+            lines = b"".join(json.dumps(text, ensure_ascii=False).encode("utf-8") + b"\n" for text in texts)
+            with open(self._texts_path, "ab") as f:
+                f.write(lines)
+            self._texts_offset += len(lines)
+            self.texts.extend(texts)
+            self.count = end
+            self._write_meta()
+            self._ids.update(pending)
+        return ids
+
+    def search(self, query, k: int = 5, min_score: float = -1.0, exclude=()) -> list:
+        """
+        Los 'k' vecinos más similares a 'query': lista de (id, score, texto) por score descendente.
+        'exclude' son ids a omitir (p.ej. la propia reseña consultada).
+        """
+        if self._stamp() != self._meta_stamp:
+            with self._lock:
+                self._sync()
+        n, vectors = self.count, self.vectors  # en este orden: una ampliación nunca deja menos de n filas
+        if n == 0 or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        scores = vectors[:n] @ query
+        skip = [i for i in exclude if 0 <= i < n]
+        if skip:
+            scores[skip] = -np.inf
+        top = min(k, n)
+        idx = np.argpartition(-scores, top - 1)[:top]
+        idx = idx[np.argsort(-scores[idx])]
+        return [(int(i), float(scores[i]), self.texts[i]) for i in idx if scores[i] >= min_score]
@@ -0,0 +1,103 @@
+"""
+Informe de tiempo de arranque por imports (python -X importtime).
+
+Importa cada punto de entrada en un proceso limpio, agrupa el tiempo acumulado por paquete
+de primer nivel y comprueba presupuestos: módulos pesados que no deben cargarse al importar
+(torch, transformers, ...) y un tope opcional de milisegundos por punto de entrada.
+
+Uso:
+  python ML/startup_profile.py                 # informe de server y client
+  python ML/startup_profile.py --max-ms 400    # falla (exit 1) si alguno supera 400 ms
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = ("server", "client")
+FORBIDDEN = ("torch", "transformers", "pyarrow", "numpy", "pandas")
+
+
+def import_times(module: str, cwd: str = HERE) -> dict:
+    """
+    Importa 'module' con -X importtime en un proceso nuevo.
+    Devuelve {paquete_de_primer_nivel: ms acumulados} más la clave '__total__'.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True, check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{proc.stderr[-2000:]}")
+
+    lines = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        lines.append((depth, int(cumulative) / 1000, name.strip().split(".")[0]))
+
+    # -X importtime lista hijos antes que padres: se recorre al revés con una pila para
+    # atribuir a cada paquete sólo su import más externo (sin contar dos veces anidados).
+    # Se ignoran los imports del arranque del intérprete (site, encodings, ...).
+    target = module.split(".")[0]
+    per_package = defaultdict(float)
+    stack = []
+    inside = False
+    for depth, ms, root in reversed(lines):
+        if depth == 0:
+            if inside:
+                break
+            inside = root == target
+        if not inside:
+            continue
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        parent = stack[-1][1] if stack else None
+        if root != parent:
+            per_package[root] += ms
+        stack.append((depth, root))
+    per_package["__total__"] = per_package.pop(target, 0.0)
+    return dict(per_package)
+
+
+def check(module: str, times: dict, max_ms: float = None) -> list:
+    """
+    Lista de violaciones de presupuesto para 'module'.
+    """
+    problems = [f"{module} importa {pkg} al cargar" for pkg in FORBIDDEN if pkg in times]
+    if max_ms is not None and times["__total__"] > max_ms:
+        problems.append(f"{module} tarda {times['__total__']:.0f} ms en importar (> {max_ms:.0f} ms)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Informe de tiempo de imports al arrancar")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS))
+    parser.add_argument("--top", type=int, default=10, help="paquetes a mostrar por módulo")
+    parser.add_argument("--max-ms", type=float, default=None, help="tope de ms por punto de entrada")
+    args = parser.parse_args()
+
+    problems = []
+    for module in args.modules:
+        times = import_times(module)
+        print(f"\n== import {module}: {times['__total__']:.1f} ms (ms acumulados por paquete)")
+        ranking = sorted(((ms, pkg) for pkg, ms in times.items() if pkg != "__total__"), reverse=True)
+        for ms, pkg in ranking[: args.top]:
+            print(f"  {ms:9.1f} ms  {pkg}")
+        problems += check(module, times, args.max_ms)
+
+    if problems:
+        print("\n❌ Regresiones de arranque:")
+        for p in problems:
+            print(f"  - {p}")
+        sys.exit(1)
+    print("\n✅ Arranque dentro de presupuesto")
+
+
+if __name__ == "__main__":
+    main()
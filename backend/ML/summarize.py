@@ -0,0 +1,212 @@
+"""
+Resúmenes extractivos de reseñas (RPC Summarize y SummarizeCorpus) con sumy.
+
+- Tokenización: un tokenizer por expresiones regulares compatible con la interfaz de sumy
+  (to_sentences / to_words), sin datos de NLTK que descargar. Las frases y las palabras de
+  contenido (sin stop words, con stem en español) se cachean por texto entre llamadas.
+- Una reseña: SumBasicSummarizer de sumy sobre sus frases.
+- Un corpus (p.ej. 100k reseñas negativas): los textos llegan por stream y se mantiene una
+  muestra uniforme acotada (reservoir sampling); sólo se tokeniza la muestra. Las
+  probabilidades de palabra se estiman sobre ella y las frases se eligen con la selección
+  voraz de SumBasic (tras elegir una frase, sus palabras pasan de p a p², lo que evita
+  repetir la misma queja). Memoria y tiempo quedan acotados por el tamaño de la muestra.
+- Caché de resúmenes por hash del corpus (blake2b de los textos) y parámetros.
+"""
+import hashlib
+import random
+import re
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+
+LANGUAGE = "spanish"
+_FRASES = re.compile(r"[^.!?¡¿;\n]+[.!?]*")
+_PALABRAS = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+class RegexTokenizer:
+    """
+    Tokenizer con la interfaz de sumy basado en expresiones regulares.
+    """
+
+    language = LANGUAGE
+
+    def to_sentences(self, paragraph: str):
+        return split_sentences(paragraph)
+
+    def to_words(self, sentence: str):
+        return tuple(_PALABRAS.findall(sentence))
+
+
+@lru_cache(maxsize=50_000)
+def split_sentences(text: str) -> tuple:
+    """
+    Frases no vacías del texto (cacheado entre llamadas).
+    """
+    return tuple(f.strip() for f in _FRASES.findall(text) if f.strip())
+
+
+@lru_cache(maxsize=1)
+def _stop_words_and_stemmer():
+    from sumy.nlp.stemmers import Stemmer
+    from sumy.utils import get_stop_words
+
+    return frozenset(get_stop_words(LANGUAGE)), Stemmer(LANGUAGE)
+
+
+@lru_cache(maxsize=100_000)
+def _stem(word: str) -> str:
+    return _stop_words_and_stemmer()[1](word)
+
+
+@lru_cache(maxsize=100_000)
+def content_words(sentence: str) -> tuple:
+    """
+    Stems de las palabras de contenido de una frase (cacheado entre llamadas).
+    """
+    stop_words = _stop_words_and_stemmer()[0]
+    words = (w.casefold() for w in _PALABRAS.findall(sentence))
+    return tuple(_stem(w) for w in words if w not in stop_words and len(w) > 1)
+
+
+def label_key(label: str) -> str:
+    """
+    Clave comparable de una etiqueta: 'NEG', 'negative', 'Negativa' -> 'NEG'.
+    """
+    return str(label or "").strip().upper()[:3]
+
+
+def _hash_texts(h, texts, labels=None):
+    """
+    Añade textos (y sus etiquetas, si vienen) al hash: las etiquetas del cliente deciden qué
+    reseñas pasan el filtro, así que dos corpus con las mismas reseñas y otras etiquetas difieren.
+    """
+    if labels:
+        for text, label in zip(texts, labels):
+            h.update(text.encode("utf-8") + b"\x1d" + str(label).encode("utf-8") + b"\x1f")
+    else:
+        for text in texts:
+            h.update(text.encode("utf-8") + b"\x1f")
+
+
+def corpus_digest(texts, params=(), labels=None) -> str:
+    """
+    Hash estable de un corpus (con sus etiquetas, si se envían, y los parámetros del resumen)
+    para la caché. Se puede calcular en el cliente con la misma función para consultar la caché
+    sin reenviar textos.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for p in params:
+        h.update(str(p).encode("utf-8") + b"\x1e")
+    _hash_texts(h, texts, labels)
+    return h.hexdigest()
+
+
+def summarize_text(text: str, sentences: int = 2) -> list:
+    """
+    Resumen extractivo de una reseña con SumBasic de sumy, en el orden original de las frases.
+    """
+    from sumy.parsers.plaintext import PlaintextParser
+    from sumy.summarizers.sum_basic import SumBasicSummarizer
+
+    stop_words, stemmer = _stop_words_and_stemmer()
+    summarizer = SumBasicSummarizer(stemmer)
+    summarizer.stop_words = stop_words
+    document = PlaintextParser.from_string(text, RegexTokenizer()).document
+    return [str(s) for s in summarizer(document, sentences)]
+
+
+class CorpusSummarizer:
+    """
+    Resumen de un corpus en stream con memoria acotada: add() por bloques y summary() al final.
+    """
+
+    def __init__(self, sample_size: int = 5000, min_words: int = 3, seed: int = 0):
+        self.sample_size = sample_size
+        self.min_words = min_words
+        self.seen = 0
+        self.matched = 0
+        self.sample = []
+        self._rng = random.Random(seed)
+        self._hash = hashlib.blake2b(digest_size=16)
+
+    def start(self, params=()):
+        """
+        Incluye los parámetros del resumen en el hash (debe llamarse antes de add()).
+        """
+        for p in params:
+            self._hash.update(str(p).encode("utf-8") + b"\x1e")
+
+    def add(self, texts, keep=None, labels=None):
+        """
+        Añade textos (y las etiquetas enviadas por el cliente) al hash del corpus y, los que pasan
+        el filtro 'keep' (lista de booleanos paralela a 'texts'), a la muestra uniforme (algoritmo R).
+        """
+        _hash_texts(self._hash, texts, labels)
+        for i, text in enumerate(texts):
+            self.seen += 1
+            if keep is not None and not keep[i]:
+                continue
+            self.matched += 1
+            if len(self.sample) < self.sample_size:
+                self.sample.append(text)
+            else:
+                j = self._rng.randrange(self.matched)
+                if j < self.sample_size:
+                    self.sample[j] = text
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    def summary(self, sentences: int = 5) -> list:
+        """
+        Frases más representativas de la muestra según SumBasic (selección voraz con p -> p²).
+        """
+        candidates = {}
+        freq = Counter()
+        for text in self.sample:
+            for sentence in split_sentences(text):
+                words = content_words(sentence)
+                freq.update(words)
+                if len(words) >= self.min_words and sentence not in candidates:
+                    candidates[sentence] = set(words)
+        total = sum(freq.values())
+        if not total:
+            return []
+        prob = {w: n / total for w, n in freq.items()}
+
+        chosen = []
+        pool = dict(candidates)
+        while pool and len(chosen) < sentences:
+            best = max(pool, key=lambda s: sum(prob[w] for w in pool[s]) / len(pool[s]))
+            for w in pool.pop(best):
+                prob[w] *= prob[w]
+            chosen.append(best)
+        return chosen
+
+
+class SummaryCache:
+    """
+    LRU de resúmenes por hash del corpus, compartida entre hilos del servidor.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
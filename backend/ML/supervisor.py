@@ -0,0 +1,184 @@
+"""
+Supervisor de procesos del servidor gRPC con reciclado sin cortes.
+
+- Lanza ML_PROCESSES procesos trabajadores (spawn: sin heredar hilos de grpc ni torch), todos
+  escuchando en el mismo puerto con SO_REUSEPORT; el kernel reparte las conexiones entre ellos.
+- Cada trabajador lleva un MemoryWatchdog (memory.py). Cuando supera ML_MAX_RSS_MB o
+  ML_MAX_REQUESTS avisa al supervisor, que arranca un reemplazo con el mismo id; sólo cuando el
+  reemplazo ya escucha se pide al viejo que drene: server.stop(ML_DRAIN_S) deja de aceptar RPC
+  (GOAWAY; los clientes gRPC reconectan con el resto) y termina los que tiene en curso.
+- Un trabajador que muere sin avisar (p.ej. OOM-kill) se relanza con una espera creciente.
+- Estado compartido en disco: cada trabajador arranca su JobWorker, que retoma los trabajos sin
+  dueño (lease por trabajo, jobs.py) al arrancar y cada ML_JOB_RESCAN_S; así los de un trabajador
+  caído o reciclado los termina otro y ninguno se procesa dos veces. El índice de similitud se
+  escribe con flock (similarity.py) y cada trabajador graba su tráfico en su propio archivo
+  (ML_RECORD_PATH.<id>.<pid>) con un origen de tiempos común (ML_RECORD_T0).
+- Socket Unix (ML_UDS_PATH): cada proceso escucha en ML_UDS_PATH.<id>.<pid> y, cuando ya sirve,
+  apunta a él los enlaces ML_UDS_PATH y ML_UDS_PATH.<id>. Al reciclar, el reemplazo toma los
+  enlaces antes de que el viejo drene y borre su propio socket.
+
+Uso:
+  ML_PROCESSES=2 ML_MAX_RSS_MB=3000 python ML/supervisor.py
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+
+def run_worker(worker_id: int, events, drain, address: str = "[::]:50051"):
+    """
+    Proceso trabajador: arranca el servidor, avisa 'ready', envía su memoria en cada latido y
+    drena cuando el supervisor activa 'drain'.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # el supervisor decide cuándo drenar
+    import server as server_module
+
+    pid = os.getpid()
+    srv, service = server_module.build_server(
+        address,
+        on_limit=lambda reason: events.put(("limit", worker_id, pid, reason)),
+        resume_jobs=True,
+        worker_id=worker_id,
+    )
+    srv.start()
+    if service.uds_path:
+        # ML_UDS_PATH (cualquier trabajador) y ML_UDS_PATH.<id> pasan a este proceso
+        uds = os.environ["ML_UDS_PATH"]
+        server_module.publish_socket(service.uds_path, [f"{uds}.{worker_id}", uds])
+    watchdog = service.watchdog.start()
+    events.put(("ready", worker_id, pid, ""))
+    while not drain.wait(watchdog.interval or 5.0):
+        events.put(("stats", worker_id, pid, watchdog.snapshot()))
+    srv.stop(float(os.getenv("ML_DRAIN_S", "30"))).wait()
+    watchdog.stop()
+
+
+class Supervisor:
+    """
+    Mantiene 'processes' trabajadores vivos y recicla los que alcanzan su límite.
+    'target(worker_id, events, drain)' es la función del proceso trabajador.
+    """
+
+    def __init__(self, processes: int = 1, target=run_worker, start_method: str = "spawn", log=print):
+        self.processes = processes
+        self.target = target
+        self.log = log
+        self._mp = multiprocessing.get_context(start_method)
+        self.events = self._mp.Queue()
+        self.workers = {}  # pid -> {"id", "process", "drain", "state", "stats"}
+        self.recycled = 0
+        self.restarts = 0
+        self._backoff = {}
+        self._stop = threading.Event()
+
+    # --------- Procesos ----------
+    def _spawn(self, worker_id: int):
+        drain = self._mp.Event()
+        process = self._mp.Process(
+            target=self.target, args=(worker_id, self.events, drain), name=f"sentiment-{worker_id}"
+        )
+        process.start()
+        self.workers[process.pid] = {"id": worker_id, "process": process, "drain": drain, "state": "starting", "stats": {}}
+        return process.pid
+
+    def _drain(self, pid: int):
+        worker = self.workers.get(pid)
+        if worker and worker["state"] != "draining":
+            worker["state"] = "draining"
+            worker["drain"].set()
+
+    def _handle(self, kind: str, worker_id: int, pid: int, payload):
+        worker = self.workers.get(pid)
+        if worker is None:
+            return
+        if kind == "ready":
+            worker["state"] = "serving"
+            self._backoff.pop(worker_id, None)
+            self.log(f"[supervisor] trabajador {worker_id} (pid {pid}) sirviendo")
+            # Reemplazo listo: el anterior con el mismo id puede drenar
+            for old_pid, old in list(self.workers.items()):
+                if old_pid != pid and old["id"] == worker_id and old["state"] == "recycling":
+                    self._drain(old_pid)
+        elif kind == "limit" and worker["state"] == "serving":
+            worker["state"] = "recycling"
+            self.recycled += 1
+            self.log(f"[supervisor] reciclando trabajador {worker_id} (pid {pid}): {payload}")
+            self._spawn(worker_id)
+        elif kind == "stats":
+            worker["stats"] = payload
+
+    def _reap(self):
+        for pid, worker in list(self.workers.items()):
+            process = worker["process"]
+            if process.is_alive():
+                continue
+            process.join()
+            del self.workers[pid]
+            self._remove_socket(worker["id"], pid)
+            if worker["state"] == "draining" or self._stop.is_set():
+                self.log(f"[supervisor] trabajador {worker['id']} (pid {pid}) drenado")
+                continue
+            # Muerte inesperada: relanza con espera creciente, salvo que otro proceso ya cubra ese id
+            if any(w["id"] == worker["id"] and w["state"] in ("starting", "serving") for w in self.workers.values()):
+                continue
+            delay = self._backoff.get(worker["id"], 0.5)
+            self._backoff[worker["id"]] = min(delay * 2, 30.0)
+            self.restarts += 1
+            self.log(f"[supervisor] trabajador {worker['id']} (pid {pid}) terminó con código {process.exitcode}; relanzando en {delay:.1f}s")
+            time.sleep(delay)
+            self._spawn(worker["id"])
+
+    def _remove_socket(self, worker_id: int, pid: int):
+        """
+        Borra el socket Unix de un trabajador que murió sin cerrarlo (los que drenan lo borran solos).
+        """
+        if os.getenv("ML_UDS_PATH"):
+            try:
+                os.unlink(f"{os.environ['ML_UDS_PATH']}.{worker_id}.{pid}")
+            except FileNotFoundError:
+                pass
+
+    # --------- Bucle ----------
+    def run(self):
+        """
+        Arranca los trabajadores y los supervisa hasta stop(); después drena todos.
+        """
+        # Origen de tiempos común de las grabaciones de todos los trabajadores (reloj monótono del sistema)
+        os.environ.setdefault("ML_RECORD_T0", repr(time.monotonic()))
+        for worker_id in range(self.processes):
+            self._spawn(worker_id)
+        while not self._stop.is_set():
+            try:
+                self._handle(*self.events.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            self._reap()
+        for pid in list(self.workers):
+            self._drain(pid)
+        for worker in list(self.workers.values()):
+            worker["process"].join()
+        self.workers.clear()
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def snapshot(self) -> dict:
+        """
+        Estado y memoria por trabajador: {pid: {'id', 'state', 'stats'}}.
+        """
+        return {pid: {"id": w["id"], "state": w["state"], "stats": dict(w["stats"])} for pid, w in list(self.workers.items())}
+
+
+def main():
+    supervisor = Supervisor(processes=int(os.getenv("ML_PROCESSES", "1")))
+    signal.signal(signal.SIGTERM, supervisor.stop)
+    signal.signal(signal.SIGINT, supervisor.stop)
+    print(f"Supervisor: {supervisor.processes} proceso(s) de SentimentService en el puerto 50051")
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# distill.py
+"""
+Destilación de BETO a un modelo estudiante más pequeño para servir en CPU.
+
+1. Etiqueta un corpus propio con el maestro (BETO) por lotes, guardando sus logits.
+2. Entrena en CPU un estudiante con menos capas (y opcionalmente menos ancho) mezclando
+   KL sobre los logits suavizados del maestro y entropía cruzada sobre su etiqueta.
+3. Guarda el estudiante (modelo + tokenizer) para que ML/server.py lo cargue con ML_MODEL_ID.
+4. Lo evalúa con el mismo camino de accuracy/F1 que MLFLOW.PY y lo registra en MLflow.
+
+Uso:
+  python distill.py --corpus reseñas.csv --layers 4 --out modelos/beto-student
+"""
+import argparse
+import importlib.machinery
+import importlib.util
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from transformers import AutoModelForSequenceClassification, AutoTokenizer, BertConfig, BertForSequenceClassification
+
+TEACHER_ID = "finiteautomata/beto-sentiment-analysis"
+
+
+def set_seed(seed: int):
+    """Fija todas las semillas para que la destilación sea reproducible."""
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def load_corpus(path: str, exclude=()) -> list:
+    """
+    Lee textos de un CSV con columna 'text' o 'texto', sin los de 'exclude' (el conjunto de
+    evaluación), para no medir al estudiante sobre textos con los que se destiló.
+    """
+    df = pd.read_csv(path)
+    col = "text" if "text" in df.columns else "texto"
+    excluded = set(exclude)
+    return [t for t in df[col].dropna().astype(str) if t not in excluded]
+
+
+@torch.inference_mode()
+def teacher_logits(tokenizer, teacher, texts, batch_size: int, max_length: int) -> torch.Tensor:
+    """Logits del maestro para todo el corpus, calculados por lotes."""
+    out = []
+    for i in range(0, len(texts), batch_size):
+        enc = tokenizer(texts[i : i + batch_size], truncation=True, max_length=max_length,
+                        padding=True, return_tensors="pt")
+        out.append(teacher(**enc).logits)
+        print(f"  maestro: {min(i + batch_size, len(texts))}/{len(texts)}", end="\r")
+    print()
+    return torch.cat(out)
+
+
+def build_student(teacher, layers: int, hidden: int) -> BertForSequenceClassification:
+    """
+    Estudiante BERT con 'layers' capas. Si conserva el ancho del maestro, se inicializa con sus
+    embeddings y capas equiespaciadas; con otro ancho parte de pesos aleatorios.
+    """
+    tcfg = teacher.config
+    hidden = hidden or tcfg.hidden_size
+    same_width = hidden == tcfg.hidden_size
+    cfg = BertConfig(
+        vocab_size=tcfg.vocab_size,
+        hidden_size=hidden,
+        num_hidden_layers=layers,
+        num_attention_heads=tcfg.num_attention_heads if same_width else max(1, hidden // 64),
+        intermediate_size=tcfg.intermediate_size if same_width else hidden * 4,
+        max_position_embeddings=tcfg.max_position_embeddings,
+        type_vocab_size=tcfg.type_vocab_size,
+        num_labels=tcfg.num_labels,
+        id2label=tcfg.id2label,
+        label2id=tcfg.label2id,
+    )
+    student = BertForSequenceClassification(cfg)
+    if same_width:
+        picks = np.linspace(0, tcfg.num_hidden_layers - 1, layers).round().astype(int)
+        student.bert.embeddings.load_state_dict(teacher.bert.embeddings.state_dict())
+        for dst, src in enumerate(picks):
+            student.bert.encoder.layer[dst].load_state_dict(teacher.bert.encoder.layer[src].state_dict())
+        student.bert.pooler.load_state_dict(teacher.bert.pooler.state_dict())
+        student.classifier.load_state_dict(teacher.classifier.state_dict())
+    return student
+
+
+def train_student(student, tokenizer, texts, logits, args):
+    """Entrena con KL(T) + CE sobre la etiqueta del maestro, en CPU."""
+    T, alpha = args.temperature, args.alpha
+    opt = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=0.01)
+    student.train()
+    gen = torch.Generator().manual_seed(args.seed)
+    for epoch in range(args.epochs):
+        order = torch.randperm(len(texts), generator=gen).tolist()
+        total = 0.0
+        for i in range(0, len(order), args.batch):
+            idx = order[i : i + args.batch]
+            enc = tokenizer([texts[j] for j in idx], truncation=True, max_length=args.max_length,
+                            padding=True, return_tensors="pt")
+            t = logits[idx]
+            s = student(**enc).logits
+            kd = F.kl_div(F.log_softmax(s / T, dim=-1), F.softmax(t / T, dim=-1), reduction="batchmean") * T * T
+            ce = F.cross_entropy(s, t.argmax(dim=-1))
+            loss = alpha * kd + (1 - alpha) * ce
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+            total += loss.item() * len(idx)
+        print(f"  época {epoch + 1}/{args.epochs}: pérdida {total / len(texts):.4f}")
+    return student.eval()
+
+
+@torch.inference_mode()
+def ms_per_text(model, tokenizer, texts, max_length: int) -> float:
+    """Latencia media (ms) por texto, de uno en uno como en Predict."""
+    t0 = time.perf_counter()
+    for text in texts:
+        model(**tokenizer(text, truncation=True, max_length=max_length, return_tensors="pt"))
+    return (time.perf_counter() - t0) * 1000 / max(len(texts), 1)
+
+
+def load_mlflow_eval():
+    """Carga MLFLOW.PY como módulo para reutilizar su evaluación accuracy/F1."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "MLFLOW.PY")
+    loader = importlib.machinery.SourceFileLoader("mlflow_eval", path)
+    spec = importlib.util.spec_from_loader("mlflow_eval", loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Destila BETO a un estudiante para CPU")
+    parser.add_argument("--corpus", default="reseñas.csv", help="CSV con columna 'text' o 'texto'")
+    parser.add_argument("--teacher", default=TEACHER_ID)
+    parser.add_argument("--out", default="modelos/beto-student")
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden", type=int, default=0, help="0 = mismo ancho que el maestro")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--lr", type=float, default=5e-5)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--alpha", type=float, default=0.7)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--register", default="beto-student", help="nombre en el Model Registry de MLflow")
+    args = parser.parse_args()
+
+    set_seed(args.seed)
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher)
+    teacher = AutoModelForSequenceClassification.from_pretrained(args.teacher).eval()
+    # Mismo split de evaluación que MLFLOW.PY (sample frac=0.2, random_state=42), fuera del corpus
+    os.environ.setdefault("MLFLOW_EXPERIMENT_NAME", "destilacion_beto")
+    mlflow_eval = load_mlflow_eval()
+    held_out = mlflow_eval.test_df["text"].dropna().astype(str).tolist()
+    texts = load_corpus(args.corpus, exclude=held_out)
+    print(f"🔹 Etiquetando {len(texts)} textos con {args.teacher} ({len(held_out)} reservados para evaluación)")
+    logits = teacher_logits(tokenizer, teacher, texts, args.batch * 2, args.max_length)
+
+    print(f"🔹 Entrenando estudiante: {args.layers} capas, ancho {args.hidden or teacher.config.hidden_size}")
+    student = build_student(teacher, args.layers, args.hidden)
+    student = train_student(student, tokenizer, texts, logits, args)
+
+    os.makedirs(args.out, exist_ok=True)
+    student.save_pretrained(args.out)
+    tokenizer.save_pretrained(args.out)
+    print(f"💾 Estudiante guardado en {args.out} (servir con ML_MODEL_ID={args.out})")
+
+    sample = texts[:64]
+    t_ms = ms_per_text(teacher, tokenizer, sample, args.max_length)
+    s_ms = ms_per_text(student, tokenizer, sample, args.max_length)
+    print(f"⏱ Latencia por texto: maestro {t_ms:.1f} ms, estudiante {s_ms:.1f} ms ({t_ms / s_ms:.1f}x)")
+
+    # Misma evaluación accuracy/F1 que los modelos del Hub, registrando el estudiante
+    mlflow_eval.evaluate_model(
+        args.out,
+        registered_name=args.register,
+        extra_params={"teacher": args.teacher, "layers": args.layers, "seed": args.seed, "train_texts": len(texts)},
+        extra_metrics={"ms_per_text": s_ms, "speedup_vs_teacher": t_ms / s_ms},
+    )
+
+
+if __name__ == "__main__":
+    main()
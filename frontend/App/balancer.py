@@ -0,0 +1,326 @@
+"""
+Balanceo de carga en el cliente entre réplicas del backend (APP_GRPC_ADDR="backend:50051,backend-2:50051").
+
+- Salud: cada réplica se comprueba con Ping en segundo plano cada 'check_interval' segundos y una
+  llamada que falla con UNAVAILABLE la marca caída al momento y se reintenta en la siguiente réplica.
+- Modos: "hash" (por defecto) usa un anillo de hash consistente con nodos virtuales, de modo que un
+  mismo texto va siempre a la misma réplica y aprovecha su caché (si una réplica cae o vuelve, sólo
+  se mueven sus claves); "round_robin" reparte por turnos.
+- Lotes: map_batch agrupa los textos por réplica, los parte en bloques y los envía en paralelo, así
+  que el throughput agregado escala con el número de réplicas.
+- Cola de latencia: con 'policy' (hedging.CallPolicy) cada llamada lleva plazo, reintentos con
+  retry-after y un duplicado a la siguiente réplica si la primera no responde en el p95 observado.
+- Estado en el servidor: GetJobStatus/FetchResults van a la réplica que aceptó el trabajo (el
+  balanceador recuerda job_id -> réplica al crearlo) y el índice de similitud vive en una sola
+  réplica, la dueña de INDEX_KEY en el anillo, que recibe las altas (add_to_index) y FindSimilar.
+  Estas llamadas no cambian de réplica ni se duplican: en otra el estado no existe.
+
+Sólo biblioteca estándar (grpc y los stubs se importan al crear los canales); copia idéntica en App/.
+"""
+import bisect
+import contextvars
+import hashlib
+import importlib
+import itertools
+import threading
+from concurrent import futures
+
+import hedging
+
+
+MODES = ("hash", "round_robin")
+INDEX_KEY = "indice-de-similitud"
+JOB_METHODS = frozenset({"GetJobStatus", "FetchResults"})
+
+
+def parse_addresses(value: str) -> list:
+    """
+    'a:50051, b:50051' -> ['a:50051', 'b:50051'] (sin vacíos ni duplicados, en orden).
+    """
+    return list(dict.fromkeys(a.strip() for a in value.split(",") if a.strip()))
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _unavailable(err) -> bool:
+    code = getattr(err, "code", None)
+    return callable(code) and getattr(code(), "name", "") == "UNAVAILABLE"
+
+
+def request_key(request):
+    """
+    Clave de afinidad de una petición: su campo 'text' si lo tiene (Predict, Analyze, ...).
+    """
+    return getattr(request, "text", None) or None
+
+
+def default_stub_factory(addr: str):
+    grpc = importlib.import_module("grpc")
+    pb_grpc = importlib.import_module("sentiment_pb2_grpc")
+    return pb_grpc.SentimentServiceStub(grpc.insecure_channel(addr))
+
+
+def default_health_check(stub, timeout: float = 1.0) -> bool:
+    pb = importlib.import_module("sentiment_pb2")
+    stub.Ping(pb.PingRequest(), timeout=timeout)
+    return True
+
+
+class HashRing:
+    """
+    Anillo de hash consistente con 'vnodes' puntos por nodo.
+    """
+
+    def __init__(self, nodes, vnodes: int = 100):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._points = [p[0] for p in points]
+        self._nodes = [p[1] for p in points]
+        self._distinct = len(set(nodes))
+
+    def owners(self, key: str) -> list:
+        """
+        Nodos en orden de preferencia para 'key': el dueño y después los siguientes del anillo.
+        """
+        start = bisect.bisect(self._points, _hash(key))
+        order = []
+        for i in range(len(self._nodes)):
+            node = self._nodes[(start + i) % len(self._nodes)]
+            if node not in order:
+                order.append(node)
+                if len(order) == self._distinct:
+                    break
+        return order
+
+
+class Replica:
+    def __init__(self, addr: str, stub):
+        self.addr = addr
+        self.stub = stub
+        self.healthy = True
+        self.calls = 0
+        self.failures = 0
+        self.inflight = 0
+
+
+class Balancer:
+    """
+    Reparte llamadas entre réplicas con comprobación de salud. 'stub' tiene la interfaz de
+    SentimentServiceStub y además map_batch() para repartir lotes en paralelo.
+    """
+
+    def __init__(
+        self,
+        addrs,
+        mode: str = "hash",
+        check_interval: float = 5.0,
+        stub_factory=default_stub_factory,
+        health_check=default_health_check,
+        vnodes: int = 100,
+        max_workers: int = 0,
+        policy: "hedging.CallPolicy" = None,
+        max_jobs: int = 10000,
+    ):
+        if isinstance(addrs, str):
+            addrs = parse_addresses(addrs)
+        if not addrs:
+            raise ValueError("Se necesita al menos una dirección de backend")
+        if mode not in MODES:
+            raise ValueError(f"Modo de balanceo desconocido: {mode} (usa {', '.join(MODES)})")
+        self.mode = mode
+        self.replicas = [Replica(addr, stub_factory(addr)) for addr in addrs]
+        self._by_addr = {r.addr: r for r in self.replicas}
+        self.ring = HashRing([r.addr for r in self.replicas], vnodes)
+        self.health_check = health_check
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._jobs = {}  # job_id -> réplica que lo aceptó (los más antiguos se olvidan primero)
+        self.max_jobs = max_jobs
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=max_workers or 4 * len(self.replicas), thread_name_prefix="balancer"
+        )
+        self.hedger = hedging.Hedger(policy) if policy is not None else None
+        self.stub = BalancedStub(self)
+
+        self._stop = threading.Event()
+        if check_interval > 0:
+            threading.Thread(target=self._health_loop, args=(check_interval,), daemon=True).start()
+
+    # --------- Salud ----------
+    def _health_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.check_health()
+
+    def check_health(self) -> dict:
+        """
+        Comprueba todas las réplicas en paralelo. Devuelve {addr: sana}.
+        """
+        def probe(replica):
+            try:
+                replica.healthy = bool(self.health_check(replica.stub))
+            except Exception:
+                replica.healthy = False
+
+        list(self._executor.map(probe, self.replicas))
+        return {r.addr: r.healthy for r in self.replicas}
+
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+        if self.hedger is not None:
+            self.hedger.close()
+
+    # --------- Enrutado ----------
+    def candidates(self, key=None) -> list:
+        """
+        Réplicas en orden de preferencia, las sanas primero. Con todas caídas se intentan igual.
+        """
+        if self.mode == "hash" and key is not None:
+            order = [self._by_addr[addr] for addr in self.ring.owners(key)]
+        else:
+            start = next(self._turn) % len(self.replicas)
+            order = self.replicas[start:] + self.replicas[:start]
+        healthy = [r for r in order if r.healthy]
+        return healthy + [r for r in order if not r.healthy]
+
+    def pinned(self, method: str, request):
+        """
+        Réplica única para RPC con estado en el servidor (índice de similitud, trabajos ya
+        creados desde este balanceador), o None si la llamada se puede enrutar libremente.
+        """
+        if method == "FindSimilar" or getattr(request, "add_to_index", False):
+            return self._by_addr[self.ring.owners(INDEX_KEY)[0]]
+        if method in JOB_METHODS:
+            with self._lock:
+                return self._jobs.get(request.job_id)
+        return None
+
+    def _remember_job(self, job_id: str, replica):
+        with self._lock:
+            self._jobs[job_id] = replica
+            while len(self._jobs) > self.max_jobs:
+                del self._jobs[next(iter(self._jobs))]
+
+    def _tracked(self, replica, fn, stub):
+        with self._lock:
+            replica.calls += 1
+            replica.inflight += 1
+        try:
+            result = fn(stub)
+            replica.healthy = True
+            return result
+        finally:
+            with self._lock:
+                replica.inflight -= 1
+
+    def _mark_down(self, replica, err):
+        if _unavailable(err):
+            with self._lock:
+                replica.failures += 1
+            replica.healthy = False
+
+    def _attempt(self, order, fn, retry: bool = True, key: str = "", idempotent: bool = False):
+        """
+        Ejecuta fn(stub) en la primera réplica de 'order'; si responde UNAVAILABLE la marca caída
+        y pasa a la siguiente. Con política, el hedger añade plazo, reintentos y hedging ('key'
+        agrupa las latencias para el p95). Las peticiones en stream no pasan por la política.
+        """
+        if self.hedger is not None and retry:
+            by_stub = {id(r.stub): r for r in order}
+            return self.hedger.run(
+                [r.stub for r in order],
+                lambda attempt: self._tracked(by_stub[id(attempt.target)], fn, attempt),
+                key,
+                idempotent=idempotent,
+                failover=retry,
+                on_error=lambda stub, err: self._mark_down(by_stub[id(stub)], err),
+            )
+        last = None
+        for replica in order if retry else order[:1]:
+            try:
+                return self._tracked(replica, fn, replica.stub)
+            except Exception as err:
+                if not _unavailable(err):
+                    raise
+                self._mark_down(replica, err)
+                last = err
+        raise last
+
+    def call(self, method: str, request, **kwargs):
+        """
+        RPC unario o de streaming de salida con failover. Las peticiones en stream (iteradores)
+        no se reintentan porque el iterador ya pudo consumirse.
+        """
+        retry = hasattr(request, "DESCRIPTOR")
+        owner = self.pinned(method, request) if retry else None
+        order = [owner] if owner is not None else self.candidates(request_key(request) if retry else None)
+        result = self._attempt(
+            order,
+            lambda stub: getattr(stub, method)(request, **kwargs),
+            retry,
+            key=method,
+            idempotent=retry and hedging.is_idempotent(method, request),
+        )
+        if method == "SubmitJob":
+            # Los streams no se reintentan: el trabajo quedó en la primera réplica
+            self._remember_job(result.job_id, order[0])
+        return result
+
+    def map_batch(self, texts, fn, chunk: int = 128) -> list:
+        """
+        Aplica fn(stub, textos) -> lista alineada a bloques de 'texts' repartidos entre réplicas
+        y en paralelo. En modo hash cada texto va a su réplica dueña. Devuelve los resultados en
+        el orden de 'texts'. Con política, fn debe ser idempotente: puede reintentarse o duplicarse.
+        """
+        texts = list(texts)
+        groups = {}
+        if self.mode == "hash":
+            for i, text in enumerate(texts):
+                groups.setdefault(self.candidates(text)[0].addr, []).append(i)
+            jobs = [(addr, idx[j : j + chunk]) for addr, idx in groups.items() for j in range(0, len(idx), chunk)]
+        else:
+            jobs = [(None, list(range(j, min(j + chunk, len(texts))))) for j in range(0, len(texts), chunk)]
+
+        def run(addr, idx):
+            part = [texts[i] for i in idx]
+            if addr is None:
+                order = self.candidates()
+            else:
+                owner = self._by_addr[addr]
+                order = [owner] + [r for r in self.candidates(part[0]) if r is not owner]
+            # Latencias agrupadas por tamaño de bloque (potencias de 2) para el p95 del hedging
+            key = f"map_batch/{len(part).bit_length()}"
+            return self._attempt(order, lambda stub: fn(stub, part), key=key, idempotent=True)
+
+        # copy_context: la traza activa del llamador sigue en los hilos del balanceador
+        pending = [(idx, self._executor.submit(contextvars.copy_context().run, run, addr, idx)) for addr, idx in jobs]
+        results = [None] * len(texts)
+        for idx, fut in pending:
+            for i, value in zip(idx, fut.result()):
+                results[i] = value
+        return results
+
+    def snapshot(self) -> dict:
+        return {
+            r.addr: {"healthy": r.healthy, "calls": r.calls, "failures": r.failures, "inflight": r.inflight}
+            for r in self.replicas
+        }
+
+
+class BalancedStub:
+    """
+    Sustituto de SentimentServiceStub: cada RPC pasa por el balanceador.
+    """
+
+    def __init__(self, balancer: Balancer):
+        self._balancer = balancer
+
+    def __getattr__(self, method):
+        def rpc(request, **kwargs):
+            return self._balancer.call(method, request, **kwargs)
+
+        return rpc
+
+    def map_batch(self, texts, fn, chunk: int = 128) -> list:
+        return self._balancer.map_batch(texts, fn, chunk)
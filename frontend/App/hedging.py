@@ -0,0 +1,325 @@
+"""
+Plazos, reintentos y peticiones cubiertas (hedging) en el cliente para recortar la cola de latencia.
+
+- Plazo: CallPolicy.deadline fija el tiempo total de la llamada, reintentos incluidos; cada intento
+  recibe como timeout lo que queda.
+- Reintentos: sólo RPC idempotentes (Predict, PredictBatch sin add_to_index, Analyze, ...) ante
+  RESOURCE_EXHAUSTED o UNAVAILABLE, con espera exponencial con jitter y respetando el
+  'retry-after-ms' que devuelve el control de admisión del servidor. Si la espera no cabe en el
+  plazo se devuelve el error sin esperar.
+- Hedging: si el primer intento no responde en el p95 observado para ese RPC, se lanza un duplicado
+  a la siguiente réplica; gana el primero que responde y el otro se cancela. Un presupuesto de
+  tokens limita los duplicados a 'hedge_ratio' de las llamadas (p.ej. 10% de carga extra).
+
+Los intentos van por stub.Metodo.future(), así que el perdedor se cancela de verdad (RST_STREAM) y
+el servidor deja de procesarlo. Sólo biblioteca estándar; copia idéntica en App/.
+"""
+import contextvars
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent import futures
+
+
+IDEMPOTENT = frozenset(
+    {"Predict", "PredictBatch", "Analyze", "FindSimilar", "Summarize", "Ping", "Stats", "GetJobStatus"}
+)
+RETRYABLE = frozenset({"RESOURCE_EXHAUSTED", "UNAVAILABLE"})
+
+
+def code_name(err) -> str:
+    code = getattr(err, "code", None)
+    return getattr(code(), "name", "") if callable(code) else ""
+
+
+def retry_after(err) -> float:
+    """
+    Segundos sugeridos por el servidor en el trailer 'retry-after-ms' (0 si no hay).
+    """
+    trailing = getattr(err, "trailing_metadata", None)
+    try:
+        value = dict(trailing() or ()).get("retry-after-ms") if callable(trailing) else None
+        return float(value) / 1000 if value else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def is_idempotent(method: str, request) -> bool:
+    """
+    Si repetir la petición no tiene efectos: PredictBatch con add_to_index escribe en el índice.
+    """
+    return method in IDEMPOTENT and not getattr(request, "add_to_index", False)
+
+
+class DeadlineExceeded(Exception):
+    """
+    El plazo de la llamada venció antes de lanzar un intento.
+    """
+
+    def code(self):
+        return _Code("DEADLINE_EXCEEDED")
+
+
+class _Code:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class CallPolicy:
+    """
+    Configuración de plazos, reintentos y hedging de un cliente.
+    """
+
+    def __init__(
+        self,
+        deadline: float = 0.0,
+        retries: int = 2,
+        backoff: float = 0.05,
+        max_backoff: float = 2.0,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_ratio: float = 0.1,
+        min_samples: int = 20,
+    ):
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_ratio = hedge_ratio
+        self.min_samples = min_samples
+
+    def delay(self, attempt: int) -> float:
+        """
+        Espera antes del reintento 'attempt' (0, 1, ...): exponencial con jitter completo.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+class LatencyTracker:
+    """
+    Latencias recientes por clave (ventana deslizante) con el cuantil recalculado cada 'every'
+    observaciones, para no ordenar la ventana en cada llamada.
+    """
+
+    def __init__(self, window: int = 1000, every: int = 16):
+        self.window = window
+        self.every = every
+        self._samples = {}
+        self._counts = Counter()
+        self._cached = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.window))
+            samples.append(seconds)
+            self._counts[key] += 1
+            if self._counts[key] % self.every == 0:
+                self._cached.pop(key, None)
+
+    def quantile(self, key: str, q: float, min_samples: int = 1):
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples or len(samples) < min_samples:
+                return None
+            cached = self._cached.get(key)
+            if cached is None or cached[0] != q:
+                ordered = sorted(samples)
+                cached = self._cached[key] = (q, ordered[min(len(ordered) - 1, int(q * len(ordered)))])
+            return cached[1]
+
+
+class HedgeBudget:
+    """
+    Cubo de tokens: cada llamada suma 'ratio' tokens (hasta 'burst') y cada duplicado gasta uno.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Attempt:
+    """
+    Proxy de un stub para un intento: aplica el tiempo restante del plazo como timeout y lanza los
+    RPC unarios con .future() para poder cancelarlos si otro intento gana.
+    """
+
+    def __init__(self, stub, deadline_at=None):
+        self.target = stub
+        self._deadline_at = deadline_at
+        self._calls = []
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def __getattr__(self, method):
+        multicallable = getattr(self.target, method)
+
+        def rpc(request, timeout=None, **kwargs):
+            if self._deadline_at is not None:
+                remaining = self._deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"plazo vencido antes de llamar a {method}")
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            if not hasattr(multicallable, "future"):
+                return multicallable(request, **kwargs)
+            call = multicallable.future(request, **kwargs)
+            with self._lock:
+                self._calls.append(call)
+                if self._cancelled:
+                    call.cancel()
+            return call.result()
+
+        return rpc
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            calls = list(self._calls)
+        for call in calls:
+            call.cancel()
+
+
+class Hedger:
+    """
+    Ejecuta fn(stub) sobre una lista de réplicas (en orden de preferencia) aplicando la política.
+    'on_error(stub, err)' recibe cada intento fallido (el balanceador marca así réplicas caídas).
+    """
+
+    def __init__(self, policy: CallPolicy = None, tracker: LatencyTracker = None, max_workers: int = 32):
+        self.policy = policy or CallPolicy()
+        self.tracker = tracker or LatencyTracker()
+        self.budget = HedgeBudget(self.policy.hedge_ratio)
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedging")
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def _bump(self, **deltas):
+        with self._lock:
+            self._stats.update(deltas)
+
+    def hedge_delay(self, key: str):
+        """
+        Espera antes de lanzar el duplicado: el cuantil observado de 'key', o None si aún no hay
+        muestras suficientes.
+        """
+        if not self.policy.hedge:
+            return None
+        return self.tracker.quantile(key, self.policy.hedge_quantile, self.policy.min_samples)
+
+    def run(self, stubs, fn, key: str, idempotent: bool = True, failover: bool = True, on_error=None):
+        """
+        Llama fn(Attempt(stub)) con plazo, reintentos y hedging. 'failover' permite pasar a la
+        siguiente réplica ante UNAVAILABLE aunque la llamada no sea idempotente (no llegó a procesarse).
+        """
+        stubs = list(stubs)
+        policy = self.policy
+        deadline_at = time.monotonic() + policy.deadline if policy.deadline > 0 else None
+        self.budget.earn()
+        self._bump(calls=1)
+        attempt = 0
+        while True:
+            offset = attempt % len(stubs)
+            order = stubs[offset:] + stubs[:offset]
+            try:
+                return self._hedged(order, fn, key, deadline_at, idempotent and len(order) > 1, on_error)
+            except Exception as err:
+                code = code_name(err)
+                if code == "UNAVAILABLE" and failover:
+                    limit = max(policy.retries, len(stubs) - 1)
+                elif code in RETRYABLE and idempotent:
+                    limit = policy.retries
+                else:
+                    raise
+                if attempt >= limit:
+                    raise
+                wait = max(policy.delay(attempt), retry_after(err))
+                if deadline_at is not None and time.monotonic() + wait >= deadline_at:
+                    raise
+                self._bump(retries=1)
+                time.sleep(wait)
+                attempt += 1
+
+    def _hedged(self, order, fn, key: str, deadline_at, can_hedge: bool, on_error=None):
+        delay = self.hedge_delay(key) if can_hedge else None
+        if delay is None:
+            start = time.monotonic()
+            try:
+                result = fn(Attempt(order[0], deadline_at))
+            except Exception as err:
+                if on_error is not None:
+                    on_error(order[0], err)
+                raise
+            self.tracker.observe(key, time.monotonic() - start)
+            return result
+
+        done = queue.Queue()
+        launched = []
+
+        def launch(stub):
+            attempt = Attempt(stub, deadline_at)
+            start = time.monotonic()
+            # copy_context: la traza activa del llamador sigue en el hilo del intento
+            future = self._executor.submit(contextvars.copy_context().run, fn, attempt)
+            launched.append((attempt, start, stub))
+            future.add_done_callback(lambda f, i=len(launched) - 1: done.put((i, f)))
+
+        launch(order[0])
+        try:
+            first = done.get(timeout=delay)
+        except queue.Empty:
+            if self.budget.spend():
+                self._bump(hedges=1)
+                launch(order[1])
+            else:
+                self._bump(hedges_denied=1)
+            first = done.get()
+
+        error = None
+        for received in range(len(launched)):
+            index, future = first if received == 0 else done.get()
+            if future.exception() is None:
+                now = time.monotonic()
+                self.tracker.observe(key, now - launched[index][1])
+                for other, (attempt, start, _) in enumerate(launched):
+                    if other != index:
+                        # El perdedor tardó al menos esto: se registra para no sesgar el p95 a la baja
+                        self.tracker.observe(key, now - start)
+                        attempt.cancel()
+                        self._bump(cancelled=1)
+                if index > 0:
+                    self._bump(hedge_wins=1)
+                return future.result()
+            if on_error is not None:
+                on_error(launched[index][2], future.exception())
+            error = error or future.exception()
+        raise error
+
+    def snapshot(self) -> dict:
+        """
+        Contadores: calls, retries, hedges, hedge_wins, hedges_denied, cancelled.
+        """
+        with self._lock:
+            return {k: float(v) for k, v in self._stats.items()}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -2,26 +2,68 @@ import os
 import sys
 import pathlib
 import io
+import importlib
+import importlib.util
+import uuid
+from datetime import datetime, timedelta
 
 # --- Streamlit/UI ---
 import streamlit as st
-import pandas as pd
 
-# --- gRPC ---
-import grpc
+# --- Trazas, balanceo y hedging entre réplicas (copias de ML/tracing.py, ML/balancer.py y ML/hedging.py, sólo biblioteca estándar) ---
+import balancer
+import hedging
+import tracing
+
+# --- Agregados por hora/día de la base de reseñas (sólo biblioteca estándar) ---
+import rollups
+
+
+class _LazyModule:
+    """
+    Importa el módulo al primer acceso a un atributo. pandas, grpc y los stubs sólo se cargan
+    cuando una pestaña los usa, no en cada ejecución del script de Streamlit.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+pd = _LazyModule("pandas")
+grpc = _LazyModule("grpc")
 
 # Asegura que Python encuentre los stubs generados en ML/ml
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 # Preferir ML (mayúsculas), pero incluir ambos para entornos case-sensitive
 sys.path.extend([str(ROOT / "ML"), str(ROOT / "ml")])
 
-# Intento de import de stubs gRPC; si falla, la UI sigue pero desactiva funciones que dependen de gRPC
-try:
-    import sentiment_pb2 as pb
-    import sentiment_pb2_grpc as pb_grpc
-    GRPC_AVAILABLE = True
-except ImportError:
-    GRPC_AVAILABLE = False
+# Comprobación de stubs gRPC sin importarlos; si faltan, la UI sigue pero desactiva funciones que dependen de gRPC
+GRPC_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("grpc", "sentiment_pb2", "sentiment_pb2_grpc")
+)
+pb = _LazyModule("sentiment_pb2")
+pb_grpc = _LazyModule("sentiment_pb2_grpc")
+
+
+@st.cache_resource
+def setup_tracing():
+    """
+    Configura una sola vez por proceso (no en cada rerun) las trazas hacia APP_TRACE_PATH.
+    """
+    return tracing.configure(
+        "streamlit-app",
+        path=os.getenv("APP_TRACE_PATH") or None,
+        sample_rate=float(os.getenv("APP_TRACE_SAMPLE", "1.0")),
+    )
+
+
+setup_tracing()
 
 
 # --------- Helpers de normalización ----------
@@ -39,7 +81,7 @@ def to_std(label: str) -> str:
         return "negative"
     return "neutral"
 
-def read_table(file) -> pd.DataFrame:
+def read_table(file) -> "pd.DataFrame":
     """
     Lee CSV/XLSX con columna 'texto'. Soporta UTF-8, UTF-8-BOM, Latin-1, CP1252.
     """
@@ -69,47 +111,121 @@ def read_table(file) -> pd.DataFrame:
 
 
 # --------- Cliente gRPC ----------
-def make_stub(addr: str) -> "pb_grpc.SentimentServiceStub":
+@st.cache_resource
+def get_balancer(addr: str) -> "balancer.Balancer":
+    """
+    Balanceador (canales y comprobación de salud) compartido entre reruns para 'addr',
+    que puede ser una lista de réplicas separadas por comas. Cada llamada lleva plazo,
+    reintentos con retry-after y hedging al p95 observado (APP_DEADLINE_S, APP_RETRIES, APP_HEDGE...).
+    """
+    return balancer.Balancer(
+        addr,
+        mode=os.getenv("APP_LB_MODE", "hash"),
+        check_interval=float(os.getenv("APP_LB_CHECK_S", "5")),
+        policy=hedging.CallPolicy(
+            deadline=float(os.getenv("APP_DEADLINE_S", "30")),
+            retries=int(os.getenv("APP_RETRIES", "2")),
+            hedge=os.getenv("APP_HEDGE", "1") == "1",
+            hedge_quantile=float(os.getenv("APP_HEDGE_QUANTILE", "0.95")),
+            hedge_ratio=float(os.getenv("APP_HEDGE_RATIO", "0.1")),
+        ),
+    )
+
+
+def make_stub(addr: str) -> "balancer.BalancedStub":
     """
-    Crea y devuelve el stub del servicio gRPC.
+    Devuelve el stub del servicio gRPC, balanceado entre las réplicas de 'addr'.
     """
-    channel = grpc.insecure_channel(addr)
-    return pb_grpc.SentimentServiceStub(channel)
+    with tracing.span("make_stub", addr=addr):
+        return get_balancer(addr).stub
 
 
 def ping(stub: "pb_grpc.SentimentServiceStub") -> str:
     """
     Verifica salud del servicio. Devuelve el status.
     """
-    return stub.Ping(pb.PingRequest()).status
+    with tracing.span("rpc Ping", kind="CLIENT"):
+        return stub.Ping(pb.PingRequest(), metadata=tracing.inject()).status
 
 
 def predict_text(stub: "pb_grpc.SentimentServiceStub", text: str) -> tuple[str, float]:
     """
     Envía un texto y obtiene (label, score).
     """
-    resp = stub.Predict(pb.PredictRequest(text=text))
+    with tracing.span("rpc Predict", kind="CLIENT", caracteres=len(text)):
+        resp = stub.Predict(pb.PredictRequest(text=text), metadata=tracing.inject())
     return resp.label, resp.score
 
 
+def analyze_text(stub: "pb_grpc.SentimentServiceStub", text: str) -> tuple[str, float, list[tuple[str, str, float]]]:
+    """
+    Sentimiento global y por aspecto. Devuelve (label, score, [(aspecto, label, score), ...]).
+    Si el servidor no ofrece Analyze, cae a Predict sin aspectos.
+    """
+    try:
+        with tracing.span("rpc Analyze", kind="CLIENT", caracteres=len(text)):
+            resp = stub.Analyze(pb.AnalyzeRequest(text=text), metadata=tracing.inject())
+    except grpc.RpcError as e:
+        if e.code() not in (grpc.StatusCode.UNIMPLEMENTED, grpc.StatusCode.FAILED_PRECONDITION):
+            raise
+        label, score = predict_text(stub, text)
+        return label, score, []
+    return resp.label, resp.score, [(a.aspect, a.label, a.score) for a in resp.aspects]
+
+
 def predict_batch(
     stub: "pb_grpc.SentimentServiceStub", texts: list[str], chunk: int = 128
 ) -> list[tuple[str, float]]:
     """
-    Predicción en lote con particionado para no exceder tamaño de mensaje.
-    Devuelve lista de pares (label, score) alineada a 'texts'.
+    Predicción en lote con particionado para no exceder tamaño de mensaje; con varias
+    réplicas los bloques se envían en paralelo. Devuelve lista de pares (label, score) alineada a 'texts'.
     """
+    def send(s, part: list[str]) -> list[tuple[str, float]]:
+        with tracing.span("rpc PredictBatch", kind="CLIENT", textos=len(part)):
+            resp = s.PredictBatch(pb.PredictBatchRequest(texts=part), metadata=tracing.inject())
+        return list(zip(resp.labels, resp.scores))
+
+    if hasattr(stub, "map_batch"):
+        return stub.map_batch(texts, send, chunk=chunk)
     out: list[tuple[str, float]] = []
     for i in range(0, len(texts), chunk):
-        part = texts[i : i + chunk]
-        resp = stub.PredictBatch(pb.PredictBatchRequest(texts=part))
-        out.extend(list(zip(resp.labels, resp.scores)))
+        out.extend(send(stub, texts[i : i + chunk]))
     return out
 
 
+def summarize_corpus(
+    stub: "pb_grpc.SentimentServiceStub",
+    texts: list[str],
+    labels: list[str],
+    label: str = "NEG",
+    sentences: int = 5,
+    chunk: int = 1000,
+) -> list[str]:
+    """
+    Resumen extractivo de las reseñas con etiqueta 'label', enviadas por stream en bloques.
+    Se envían las etiquetas ya calculadas para que el servidor no vuelva a inferir.
+    """
+    def reqs():
+        yield pb.SummarizeCorpusRequest(label=label, sentences=sentences)
+        for i in range(0, len(texts), chunk):
+            yield pb.SummarizeCorpusRequest(texts=texts[i : i + chunk], labels=labels[i : i + chunk])
+
+    with tracing.span("rpc SummarizeCorpus", kind="CLIENT", textos=len(texts)):
+        resp = stub.SummarizeCorpus(reqs(), metadata=tracing.inject())
+    return list(resp.sentences)
+
+
 # --------- Base de datos simulada de reseñas ----------
 if "reviews_db" not in st.session_state:
     st.session_state.reviews_db = []
+if "rollups" not in st.session_state:
+    st.session_state.rollups = rollups.SentimentRollups()
+
+# Cada sesión de navegador es un cliente distinto para la cuota por cliente del servidor:
+# tracing.inject() añade este 'x-client-id' en las llamadas de este rerun (y sus hilos)
+if "client_id" not in st.session_state:
+    st.session_state.client_id = f"app/{uuid.uuid4().hex}"
+tracing.set_client_id(st.session_state.client_id)
 
 
 def save_review(
@@ -130,6 +246,9 @@ def save_review(
         "timestamp": pd.Timestamp.now(),
     }
     st.session_state.reviews_db.append(review)
+    st.session_state.rollups.add(
+        review["timestamp"].to_pydatetime(), to_std(sentiment_label), sentiment_score, recommend, len(text)
+    )
 
 
 # --------- CSS Personalizado ----------
@@ -204,9 +323,10 @@ def ui_write_review():
 
             if GRPC_AVAILABLE:
                 try:
-                    addr = os.getenv("APP_GRPC_ADDR", "localhost:50051")
-                    stub = make_stub(addr)
-                    raw_label, sentiment_score = predict_text(stub, review_text.strip())
+                    with tracing.span("ui_enviar_resena"):
+                        addr = os.getenv("APP_GRPC_ADDR", "localhost:50051")
+                        stub = make_stub(addr)
+                        raw_label, sentiment_score = predict_text(stub, review_text.strip())
                     sentiment_label = to_std(raw_label)
                 except Exception as e:
                     st.warning(f"⚠ Análisis de sentimientos no disponible: {e}")
@@ -257,9 +377,10 @@ def ui_sentiment_analysis():
 
     if st.button("🔍 Analizar Sentimiento", type="primary", use_container_width=True, disabled=not txt.strip()):
         try:
-            addr = os.getenv("APP_GRPC_ADDR", "localhost:50051")
-            stub = make_stub(addr)
-            raw_label, score = predict_text(stub, txt.strip())
+            with tracing.span("ui_analisis_texto"):
+                addr = os.getenv("APP_GRPC_ADDR", "localhost:50051")
+                stub = make_stub(addr)
+                raw_label, score, aspects = analyze_text(stub, txt.strip())
             label = to_std(raw_label)
 
             # Mostrar resultado con colores
@@ -273,14 +394,41 @@ def ui_sentiment_analysis():
             else:
                 st.info(f"{sentiment_emoji} *Sentimiento:* {label.upper()} | *Confianza:* {score:.3f}")
 
+            # Sentimiento por aspecto (sólo los mencionados en el texto)
+            if aspects:
+                st.markdown("*Por aspecto:*")
+                cols = st.columns(len(aspects))
+                for col, (aspect, raw, conf) in zip(cols, aspects):
+                    std = to_std(raw)
+                    emoji = "😊" if std == "positive" else "😔" if std == "negative" else "😐"
+                    col.metric(aspect.capitalize(), f"{emoji} {std.upper()}", f"{conf:.2f}", delta_color="off")
+
         except Exception as e:
             st.error(f"❌ Error conectando con el servicio: {e}")
 
 
 # --------- UI: Base de datos local ----------
+RANGES = {
+    "Últimas 24 horas": timedelta(hours=24),
+    "Últimos 7 días": timedelta(days=7),
+    "Últimos 30 días": timedelta(days=30),
+    "Todo": None,
+}
+GRANULARITIES = {"Hora": "hour", "Día": "day"}
+
+
+def reviews_in_range(start: datetime, end: datetime) -> list:
+    """
+    Reseñas con timestamp en [start, end]. reviews_db se guarda en orden de llegada (timestamps
+    crecientes), así que basta una búsqueda binaria: O(log n + reseñas del rango).
+    """
+    return rollups.in_range(st.session_state.reviews_db, start, end)
+
+
 def ui_reviews_database():
     """
-    Interfaz para ver todas las reseñas guardadas en session_state, con métricas simples.
+    Interfaz de la base de reseñas: métricas y tendencias leídas de los agregados por hora/día
+    (coste proporcional al rango mostrado, no al número de reseñas) y tabla del rango filtrado.
     """
     st.markdown('<h2 class="tab-subheader">📊 Base de Datos de Reseñas</h2>', unsafe_allow_html=True)
 
@@ -288,57 +436,101 @@ def ui_reviews_database():
         st.info("📝 No hay reseñas guardadas aún.")
         return
 
-    # Convertir a DataFrame
-    df = pd.DataFrame(st.session_state.reviews_db)
-
-    # Normaliza etiquetas si existen
-    if "sentiment_label" in df.columns:
-        df["label_std"] = df["sentiment_label"].apply(to_std)
-    else:
-        df["label_std"] = "neutral"
+    agg = st.session_state.rollups
 
-    # Métricas generales
+    # Métricas generales (totales acumulados)
+    total = agg.total()
     st.markdown("📈 Estadísticas Generales:")
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
         st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-        st.metric("Total Reseñas", len(df))
+        st.metric("Total Reseñas", total.count)
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col2:
-        recommend_count = int(df["recomienda"].sum())
         st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-        st.metric("Recomiendan", recommend_count)
+        st.metric("Recomiendan", total.recommend)
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col3:
-        positive_count = int((df["label_std"] == "positive").sum())
         st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-        st.metric("Positivas", positive_count)
+        st.metric("Positivas", total.by_label["positive"])
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col4:
-        avg_length = df["texto"].str.len().mean()
         st.markdown('<div class="metric-container">', unsafe_allow_html=True)
-        st.metric("Longitud Prom.", f"{avg_length:.0f} chars")
+        st.metric("Longitud Prom.", f"{total.mean_length:.0f} chars")
         st.markdown("</div>", unsafe_allow_html=True)
 
-    # Mostrar tabla de reseñas
+    # Filtros de tendencia
     st.markdown("---")
-    st.markdown("📋 Todas las Reseñas:")
+    st.markdown("📉 Tendencias:")
+    fcol1, fcol2, fcol3, fcol4 = st.columns(4)
+    with fcol1:
+        range_name = st.selectbox("Rango", list(RANGES), index=1)
+    with fcol2:
+        granularity = GRANULARITIES[st.selectbox("Granularidad", list(GRANULARITIES))]
+    with fcol3:
+        labels = st.multiselect("Sentimiento", list(rollups.LABELS), default=list(rollups.LABELS))
+    with fcol4:
+        recommend = {"Todas": None, "✅ Sí": True, "❌ No": False}[
+            st.selectbox("Recomienda", ["Todas", "✅ Sí", "❌ No"])
+        ]
+
+    end = datetime.now()
+    span = RANGES[range_name]
+    start = agg.first if span is None else max(end - span, agg.first)
+    series = agg.series(granularity, start, end, labels=set(labels), recommend=recommend)
+
+    # Resumen del rango: suma de las cubetas mostradas
+    in_range = sum(s.count for _, s in series)
+    recommended = sum(s.recommend for _, s in series)
+    scored = sum(s.scored for _, s in series)
+    mcol1, mcol2, mcol3 = st.columns(3)
+    mcol1.metric("Reseñas en el rango", in_range)
+    mcol2.metric("Tasa de recomendación", f"{recommended / in_range:.0%}" if in_range else "—")
+    mcol3.metric(
+        "Score medio", f"{sum(s.score_sum for _, s in series) / scored:.3f}" if scored else "—"
+    )
 
-    display_df = df.copy()
-    display_df["recomienda"] = display_df["recomienda"].map({True: "✅ Sí", False: "❌ No"})
-    display_df["sentiment_label"] = display_df["label_std"].str.upper()
-    if "sentiment_score" in display_df.columns:
-        display_df["sentiment_score"] = display_df["sentiment_score"].fillna(0).round(3)
+    index = pd.Index([ts for ts, _ in series], name="periodo")
+    st.markdown("Reseñas por sentimiento:")
+    st.line_chart(pd.DataFrame({lab: [s.by_label[lab] for _, s in series] for lab in labels}, index=index))
+    st.markdown("Score medio y tasa de recomendación:")
+    st.line_chart(
+        pd.DataFrame(
+            {
+                "score_medio": [s.mean_score for _, s in series],
+                "tasa_recomendacion": [s.recommend_rate for _, s in series],
+            },
+            index=index,
+        )
+    )
 
-    st.dataframe(display_df.drop(columns=["label_std"]), use_container_width=True)
+    # Tabla de reseñas del rango
+    st.markdown("---")
+    st.markdown("📋 Reseñas del rango:")
+
+    rows = reviews_in_range(rollups.bucket_start(start, granularity), end)
+    if not rows:
+        st.info("Sin reseñas en el rango seleccionado.")
+    else:
+        display_df = pd.DataFrame(rows)
+        display_df["label_std"] = display_df["sentiment_label"].apply(to_std)
+        mask = display_df["label_std"].isin(labels)
+        if recommend is not None:
+            mask &= display_df["recomienda"] == recommend
+        display_df = display_df[mask]
+        display_df["recomienda"] = display_df["recomienda"].map({True: "✅ Sí", False: "❌ No"})
+        display_df["sentiment_label"] = display_df["label_std"].str.upper()
+        display_df["sentiment_score"] = display_df["sentiment_score"].fillna(0).round(3)
+        st.dataframe(display_df.drop(columns=["label_std"]), use_container_width=True)
 
     # Botón para limpiar base de datos
     if st.button("🗑 Limpiar Base de Datos", type="secondary"):
         st.session_state.reviews_db = []
+        st.session_state.rollups = rollups.SentimentRollups()
         st.success("✅ Base de datos limpiada.")
         st.experimental_rerun()
 
@@ -359,8 +551,18 @@ def ui_sentiment_file():
     if not up:
         return
 
+    # Una traza por ejecución: lectura del archivo, canal, RPC y servidor quedan en el mismo árbol
+    with tracing.span("ui_analisis_archivo", archivo=up.name):
+        process_file(up)
+
+
+def process_file(up):
+    """
+    Lee el archivo subido, muestra una vista previa y, al pulsar el botón, lo clasifica por lotes.
+    """
     try:
-        df = read_table(up)
+        with tracing.span("read_table"):
+            df = read_table(up)
         st.dataframe(df.head(10), use_container_width=True)
     except Exception as e:
         st.error(f"Error leyendo archivo: {e}")
@@ -407,6 +609,16 @@ def ui_sentiment_file():
                 counts.rename({"positive": "Positivas", "negative": "Negativas", "neutral": "Neutras"})
             )
 
+            # Resumen extractivo de las reseñas negativas (reutiliza las etiquetas ya calculadas)
+            if counts["negative"] > 0:
+                try:
+                    complaints = summarize_corpus(stub, df["texto"].tolist(), raw_labels, label="NEG")
+                    if complaints:
+                        st.markdown("*🗣 ¿De qué se quejan?*")
+                        st.markdown("\n".join(f"- {c}" for c in complaints))
+                except Exception as e:
+                    st.warning(f"⚠ Resumen no disponible: {e}")
+
             # Descarga CSV
             buf = io.StringIO()
             out.to_csv(buf, index=False)
@@ -0,0 +1,142 @@
+"""
+Agregados incrementales de reseñas por hora y por día para el panel de la base de datos.
+
+Cada reseña guardada actualiza, en O(1), la celda (etiqueta, recomienda) de su cubeta horaria y
+de su cubeta diaria, además de los totales. El panel lee sólo las cubetas del rango que muestra,
+así que su coste es proporcional al rango de tiempo y no al número de reseñas guardadas.
+Sólo biblioteca estándar.
+"""
+import bisect
+from datetime import datetime, timedelta
+
+
+LABELS = ("positive", "negative", "neutral")
+STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """
+    Inicio de la cubeta horaria o diaria que contiene 'ts'.
+    """
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Granularidad desconocida: {granularity}")
+
+
+def in_range(reviews: list, start: datetime, end: datetime, key=lambda r: r["timestamp"]) -> list:
+    """
+    Reseñas con key(r) en [start, end] de una lista ordenada por key: O(log n + reseñas del rango).
+    """
+    lo = bisect.bisect_left(reviews, start, key=key)
+    hi = bisect.bisect_right(reviews, end, key=key)
+    return reviews[lo:hi]
+
+
+class Cell:
+    """
+    Acumulados de las reseñas con una misma (etiqueta, recomienda) dentro de una cubeta.
+    """
+
+    __slots__ = ("count", "score_sum", "scored", "length_sum")
+
+    def __init__(self):
+        self.count = 0
+        self.score_sum = 0.0
+        self.scored = 0
+        self.length_sum = 0
+
+    def add(self, score, length: int):
+        self.count += 1
+        self.length_sum += length
+        if score is not None:
+            self.score_sum += score
+            self.scored += 1
+
+
+class Summary:
+    """
+    Resumen de un conjunto de celdas: conteos por etiqueta, score medio, tasa de recomendación
+    y longitud media.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.by_label = dict.fromkeys(LABELS, 0)
+        self.recommend = 0
+        self.score_sum = 0.0
+        self.scored = 0
+        self.length_sum = 0
+
+    def merge(self, label: str, recommend: bool, cell: Cell):
+        self.count += cell.count
+        self.by_label[label] += cell.count
+        self.recommend += cell.count if recommend else 0
+        self.score_sum += cell.score_sum
+        self.scored += cell.scored
+        self.length_sum += cell.length_sum
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.scored if self.scored else None
+
+    @property
+    def recommend_rate(self):
+        return self.recommend / self.count if self.count else None
+
+    @property
+    def mean_length(self):
+        return self.length_sum / self.count if self.count else None
+
+
+class SentimentRollups:
+    """
+    Cubetas {granularidad: {inicio: {(etiqueta, recomienda): Cell}}} más los totales.
+    """
+
+    def __init__(self):
+        self.buckets = {g: {} for g in STEPS}
+        self.totals = {}
+        self.first = None
+        self.last = None
+
+    def add(self, ts: datetime, label: str, score, recommend: bool, length: int):
+        """
+        Registra una reseña ('label' ya normalizada: positive/negative/neutral).
+        """
+        key = (label if label in LABELS else "neutral", bool(recommend))
+        self.totals.setdefault(key, Cell()).add(score, length)
+        for granularity, buckets in self.buckets.items():
+            cells = buckets.setdefault(bucket_start(ts, granularity), {})
+            cells.setdefault(key, Cell()).add(score, length)
+        self.first = ts if self.first is None or ts < self.first else self.first
+        self.last = ts if self.last is None or ts > self.last else self.last
+
+    @staticmethod
+    def _summarize(cells: dict, labels=None, recommend=None) -> Summary:
+        summary = Summary()
+        for (label, rec), cell in cells.items():
+            if (labels is None or label in labels) and (recommend is None or rec == recommend):
+                summary.merge(label, rec, cell)
+        return summary
+
+    def total(self, labels=None, recommend=None) -> Summary:
+        """
+        Resumen de todas las reseñas (O(celdas), independiente del número de reseñas).
+        """
+        return self._summarize(self.totals, labels, recommend)
+
+    def series(self, granularity: str, start: datetime, end: datetime, labels=None, recommend=None) -> list:
+        """
+        [(inicio de cubeta, Summary)] de 'start' a 'end' inclusive, con cubetas vacías incluidas
+        para que las tendencias no salten huecos. Recorre sólo las cubetas del rango.
+        """
+        step = STEPS[granularity]
+        buckets = self.buckets[granularity]
+        out = []
+        current, end = bucket_start(start, granularity), bucket_start(end, granularity)
+        while current <= end:
+            out.append((current, self._summarize(buckets.get(current, {}), labels, recommend)))
+            current += step
+        return out
@@ -24,25 +24,77 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fsentiment.proto\x12\x0csentiment.v1\"\x1e\n\x0ePredictRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\"/\n\x0fPredictResponse\x12\r\n\x05label\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x01\"$\n\x13PredictBatchRequest\x12\r\n\x05texts\x18\x01 \x03(\t\"6\n\x14PredictBatchResponse\x12\x0e\n\x06labels\x18\x01 \x03(\t\x12\x0e\n\x06scores\x18\x02 \x03(\x01\"\r\n\x0bPingRequest\"\x1e\n\x0cPingResponse\x12\x0e\n\x06status\x18\x01 \x01(\t2\xf0\x01\n\x10SentimentService\x12\x46\n\x07Predict\x12\x1c.sentiment.v1.PredictRequest\x1a\x1d.sentiment.v1.PredictResponse\x12U\n\x0cPredictBatch\x12!.sentiment.v1.PredictBatchRequest\x1a\".sentiment.v1.PredictBatchResponse\x12=\n\x04Ping\x12\x19.sentiment.v1.PingRequest\x1a\x1a.sentiment.v1.PingResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fsentiment.proto\x12\x0csentiment.v1\"\x1e\n\x0ePredictRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\"/\n\x0fPredictResponse\x12\r\n\x05label\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x01\"\x80\x01\n\x13PredictBatchRequest\x12\r\n\x05texts\x18\x01 \x03(\t\x12)\n\ttoken_ids\x18\x02 \x03(\x0b\x32\x16.sentiment.v1.TokenIds\x12\x19\n\x11return_embeddings\x18\x03 \x01(\x08\x12\x14\n\x0c\x61\x64\x64_to_index\x18\x04 \x01(\x08\"\x17\n\x08TokenIds\x12\x0b\n\x03ids\x18\x01 \x03(\x05\"\x8c\x01\n\x14PredictBatchResponse\x12\x0e\n\x06labels\x18\x01 \x03(\t\x12\x0e\n\x06scores\x18\x02 \x03(\x01\x12\x14\n\x0cunique_texts\x18\x03 \x01(\x05\x12+\n\nembeddings\x18\x04 \x03(\x0b\x32\x17.sentiment.v1.Embedding\x12\x11\n\tindex_ids\x18\x05 \x03(\x03\"O\n\x0fShmBatchRequest\x12\x0f\n\x07segment\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x04\x12\x0c\n\x04size\x18\x03 \x01(\x04\x12\r\n\x05\x63ount\x18\x04 \x01(\r\"8\n\x10ShmBatchResponse\x12\x0e\n\x06labels\x18\x01 \x03(\t\x12\x14\n\x0cunique_texts\x18\x02 \x01(\x05\"\x1b\n\tEmbedding\x12\x0e\n\x06values\x18\x01 \x03(\x02\"\x1e\n\x0e\x41nalyzeRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\"c\n\x0f\x41spectSentiment\x12\x0e\n\x06\x61spect\x18\x01 \x01(\t\x12\r\n\x05label\x18\x02 \x01(\t\x12\r\n\x05score\x18\x03 \x01(\x01\x12\x10\n\x08mentions\x18\x04 \x01(\x05\x12\x10\n\x08\x65vidence\x18\x05 \x01(\t\"_\n\x0f\x41nalyzeResponse\x12\r\n\x05label\x18\x01 \x01(\t\x12\r\n\x05score\x18\x02 \x01(\x01\x12.\n\x07\x61spects\x18\x03 \x03(\x0b\x32\x1d.sentiment.v1.AspectSentiment\"@\n\x12\x46indSimilarRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\t\n\x01k\x18\x02 \x01(\x05\x12\x11\n\tmin_score\x18\x03 \x01(\x01\"8\n\rSimilarReview\x12\n\n\x02id\x18\x01 \x01(\x03\x12\x0c\n\x04text\x18\x02 \x01(\t\x12\r\n\x05score\x18\x03 \x01(\x01\"W\n\x13\x46indSimilarResponse\x12,\n\x07matches\x18\x01 \x03(\x0b\x32\x1b.sentiment.v1.SimilarReview\x12\x12\n\nindex_size\x18\x02 \x01(\x03\"3\n\x10SummarizeRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\x11\n\tsentences\x18\x02 \x01(\x05\"&\n\x11SummarizeResponse\x12\x11\n\tsentences\x18\x01 \x03(\t\"\x91\x01\n\x16SummarizeCorpusRequest\x12\r\n\x05texts\x18\x01 \x03(\t\x12\x0e\n\x06labels\x18\x02 \x03(\t\x12\x11\n\tfile_path\x18\x03 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x04 \x01(\t\x12\r\n\x05label\x18\x05 \x01(\t\x12\x11\n\tsentences\x18\x06 \x01(\x05\x12\x13\n\x0b\x63orpus_hash\x18\x07 \x01(\t\"\x82\x01\n\x17SummarizeCorpusResponse\x12\x11\n\tsentences\x18\x01 \x03(\t\x12\r\n\x05texts\x18\x02 \x01(\x03\x12\x0f\n\x07matched\x18\x03 \x01(\x03\x12\x0f\n\x07sampled\x18\x04 \x01(\x05\x12\x13\n\x0b\x63orpus_hash\x18\x05 \x01(\t\x12\x0e\n\x06\x63\x61\x63hed\x18\x06 \x01(\x08\"\r\n\x0bPingRequest\"\x1e\n\x0cPingResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\"\x0e\n\x0cStatsRequest\"}\n\rStatsResponse\x12;\n\x08\x63ounters\x18\x01 \x03(\x0b\x32).sentiment.v1.StatsResponse.CountersEntry\x1a/\n\rCountersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01\"D\n\x10SubmitJobRequest\x12\r\n\x05texts\x18\x01 \x03(\t\x12\x11\n\tfile_path\x18\x02 \x01(\t\x12\x0e\n\x06\x63olumn\x18\x03 \x01(\t\"2\n\x11SubmitJobResponse\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\r\n\x05total\x18\x02 \x01(\x03\"\"\n\x10JobStatusRequest\x12\x0e\n\x06job_id\x18\x01 \x01(\t\"V\n\tJobStatus\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\r\n\x05state\x18\x02 \x01(\t\x12\r\n\x05total\x18\x03 \x01(\x03\x12\x0c\n\x04\x64one\x18\x04 \x01(\x03\x12\r\n\x05\x65rror\x18\x05 \x01(\t\"I\n\x13\x46\x65tchResultsRequest\x12\x0e\n\x06job_id\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x03\x12\x12\n\nchunk_size\x18\x03 \x01(\x05\"=\n\x0bResultChunk\x12\x0e\n\x06offset\x18\x01 \x01(\x03\x12\x0e\n\x06labels\x18\x02 \x03(\t\x12\x0e\n\x06scores\x18\x03 \x03(\x01\"I\n\x0eProfileRequest\x12\x0f\n\x07seconds\x18\x01 \x01(\x01\x12\x13\n\x0binterval_ms\x18\x02 \x01(\x05\x12\x11\n\ttorch_ops\x18\x03 \x01(\x08\"u\n\x0fProfileResponse\x12\x15\n\rpython_folded\x18\x01 \x01(\t\x12\x14\n\x0ctorch_folded\x18\x02 \x01(\t\x12\x13\n\x0btorch_table\x18\x03 \x01(\t\x12\x0f\n\x07samples\x18\x04 \x01(\x05\x12\x0f\n\x07seconds\x18\x05 \x01(\x01\x32\xfc\x07\n\x10SentimentService\x12\x46\n\x07Predict\x12\x1c.sentiment.v1.PredictRequest\x1a\x1d.sentiment.v1.PredictResponse\x12U\n\x0cPredictBatch\x12!.sentiment.v1.PredictBatchRequest\x1a\".sentiment.v1.PredictBatchResponse\x12=\n\x04Ping\x12\x19.sentiment.v1.PingRequest\x1a\x1a.sentiment.v1.PingResponse\x12@\n\x05Stats\x12\x1a.sentiment.v1.StatsRequest\x1a\x1b.sentiment.v1.StatsResponse\x12K\n\nPredictShm\x12\x1d.sentiment.v1.ShmBatchRequest\x1a\x1e.sentiment.v1.ShmBatchResponse\x12\x46\n\x07\x41nalyze\x12\x1c.sentiment.v1.AnalyzeRequest\x1a\x1d.sentiment.v1.AnalyzeResponse\x12R\n\x0b\x46indSimilar\x12 .sentiment.v1.FindSimilarRequest\x1a!.sentiment.v1.FindSimilarResponse\x12L\n\tSummarize\x12\x1e.sentiment.v1.SummarizeRequest\x1a\x1f.sentiment.v1.SummarizeResponse\x12`\n\x0fSummarizeCorpus\x12$.sentiment.v1.SummarizeCorpusRequest\x1a%.sentiment.v1.SummarizeCorpusResponse(\x01\x12N\n\tSubmitJob\x12\x1e.sentiment.v1.SubmitJobRequest\x1a\x1f.sentiment.v1.SubmitJobResponse(\x01\x12G\n\x0cGetJobStatus\x12\x1e.sentiment.v1.JobStatusRequest\x1a\x17.sentiment.v1.JobStatus\x12N\n\x0c\x46\x65tchResults\x12!.sentiment.v1.FetchResultsRequest\x1a\x19.sentiment.v1.ResultChunk0\x01\x12\x46\n\x07Profile\x12\x1c.sentiment.v1.ProfileRequest\x1a\x1d.sentiment.v1.ProfileResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'sentiment_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_STATSRESPONSE_COUNTERSENTRY']._loaded_options = None
+  _globals['_STATSRESPONSE_COUNTERSENTRY']._serialized_options = b'8\001'
   _globals['_PREDICTREQUEST']._serialized_start=33
   _globals['_PREDICTREQUEST']._serialized_end=63
   _globals['_PREDICTRESPONSE']._serialized_start=65
   _globals['_PREDICTRESPONSE']._serialized_end=112
-  _globals['_PREDICTBATCHREQUEST']._serialized_start=114
-  _globals['_PREDICTBATCHREQUEST']._serialized_end=150
-  _globals['_PREDICTBATCHRESPONSE']._serialized_start=152
-  _globals['_PREDICTBATCHRESPONSE']._serialized_end=206
-  _globals['_PINGREQUEST']._serialized_start=208
-  _globals['_PINGREQUEST']._serialized_end=221
-  _globals['_PINGRESPONSE']._serialized_start=223
-  _globals['_PINGRESPONSE']._serialized_end=253
-  _globals['_SENTIMENTSERVICE']._serialized_start=256
-  _globals['_SENTIMENTSERVICE']._serialized_end=496
+  _globals['_PREDICTBATCHREQUEST']._serialized_start=115
+  _globals['_PREDICTBATCHREQUEST']._serialized_end=243
+  _globals['_TOKENIDS']._serialized_start=245
+  _globals['_TOKENIDS']._serialized_end=268
+  _globals['_PREDICTBATCHRESPONSE']._serialized_start=271
+  _globals['_PREDICTBATCHRESPONSE']._serialized_end=411
+  _globals['_SHMBATCHREQUEST']._serialized_start=413
+  _globals['_SHMBATCHREQUEST']._serialized_end=492
+  _globals['_SHMBATCHRESPONSE']._serialized_start=494
+  _globals['_SHMBATCHRESPONSE']._serialized_end=550
+  _globals['_EMBEDDING']._serialized_start=552
+  _globals['_EMBEDDING']._serialized_end=579
+  _globals['_ANALYZEREQUEST']._serialized_start=581
+  _globals['_ANALYZEREQUEST']._serialized_end=611
+  _globals['_ASPECTSENTIMENT']._serialized_start=613
+  _globals['_ASPECTSENTIMENT']._serialized_end=712
+  _globals['_ANALYZERESPONSE']._serialized_start=714
+  _globals['_ANALYZERESPONSE']._serialized_end=809
+  _globals['_FINDSIMILARREQUEST']._serialized_start=811
+  _globals['_FINDSIMILARREQUEST']._serialized_end=875
+  _globals['_SIMILARREVIEW']._serialized_start=877
+  _globals['_SIMILARREVIEW']._serialized_end=933
+  _globals['_FINDSIMILARRESPONSE']._serialized_start=935
+  _globals['_FINDSIMILARRESPONSE']._serialized_end=1022
+  _globals['_SUMMARIZEREQUEST']._serialized_start=1024
+  _globals['_SUMMARIZEREQUEST']._serialized_end=1075
+  _globals['_SUMMARIZERESPONSE']._serialized_start=1077
+  _globals['_SUMMARIZERESPONSE']._serialized_end=1115
+  _globals['_SUMMARIZECORPUSREQUEST']._serialized_start=1118
+  _globals['_SUMMARIZECORPUSREQUEST']._serialized_end=1263
+  _globals['_SUMMARIZECORPUSRESPONSE']._serialized_start=1266
+  _globals['_SUMMARIZECORPUSRESPONSE']._serialized_end=1396
+  _globals['_PINGREQUEST']._serialized_start=1398
+  _globals['_PINGREQUEST']._serialized_end=1411
+  _globals['_PINGRESPONSE']._serialized_start=1413
+  _globals['_PINGRESPONSE']._serialized_end=1443
+  _globals['_STATSREQUEST']._serialized_start=1445
+  _globals['_STATSREQUEST']._serialized_end=1459
+  _globals['_STATSRESPONSE']._serialized_start=1461
+  _globals['_STATSRESPONSE']._serialized_end=1586
+  _globals['_STATSRESPONSE_COUNTERSENTRY']._serialized_start=1539
+  _globals['_STATSRESPONSE_COUNTERSENTRY']._serialized_end=1586
+  _globals['_SUBMITJOBREQUEST']._serialized_start=1588
+  _globals['_SUBMITJOBREQUEST']._serialized_end=1656
+  _globals['_SUBMITJOBRESPONSE']._serialized_start=1658
+  _globals['_SUBMITJOBRESPONSE']._serialized_end=1708
+  _globals['_JOBSTATUSREQUEST']._serialized_start=1710
+  _globals['_JOBSTATUSREQUEST']._serialized_end=1744
+  _globals['_JOBSTATUS']._serialized_start=1746
+  _globals['_JOBSTATUS']._serialized_end=1832
+  _globals['_FETCHRESULTSREQUEST']._serialized_start=1834
+  _globals['_FETCHRESULTSREQUEST']._serialized_end=1907
+  _globals['_RESULTCHUNK']._serialized_start=1909
+  _globals['_RESULTCHUNK']._serialized_end=1970
+  _globals['_PROFILEREQUEST']._serialized_start=1972
+  _globals['_PROFILEREQUEST']._serialized_end=2045
+  _globals['_PROFILERESPONSE']._serialized_start=2047
+  _globals['_PROFILERESPONSE']._serialized_end=2164
+  _globals['_SENTIMENTSERVICE']._serialized_start=2167
+  _globals['_SENTIMENTSERVICE']._serialized_end=3187
 # @@protoc_insertion_point(module_scope)
@@ -0,0 +1,217 @@
+"""
+Trazas distribuidas mínimas con contexto W3C (traceparent), sin dependencias externas.
+
+Cada proceso configura su Tracer con configure(). Los spans se anidan con contextvars y viajan
+entre procesos en la metadata gRPC 'traceparent' (00-<trace_id>-<span_id>-<flags>).
+Los spans terminados se escriben como líneas JSON en formato Zipkin v2: el archivo se puede
+leer a mano o enviar a un colector (POST del arreglo de spans a /api/v2/spans).
+
+El muestreo se decide una sola vez, en la raíz de la traza; los procesos siguientes respetan el
+flag del padre, así que una traza se registra completa o no se registra. Una traza no muestreada
+sólo cuesta un número aleatorio y una variable de contexto por span.
+
+inject() añade además 'x-client-id' si el contexto tiene uno (set_client_id): es la clave de la
+cuota por cliente del control de admisión del servidor.
+
+Este archivo se copia tal cual en frontend/App, igual que los stubs.
+"""
+import contextvars
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+TRACEPARENT = "traceparent"
+CLIENT_ID = "x-client-id"
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current = contextvars.ContextVar("span_actual", default=None)
+_client_id = contextvars.ContextVar("id_cliente", default=None)
+
+
+class SpanContext:
+    """
+    Identidad de un span propagable entre hilos y procesos.
+    """
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: str):
+    """
+    SpanContext a partir de una cabecera traceparent, o None si no es válida.
+    """
+    match = _TRACEPARENT_RE.match((value or "").strip())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+class Span:
+    """
+    Span en curso. 'tag' añade atributos que se exportan al cerrarlo (sólo si está muestreado).
+    """
+
+    __slots__ = ("context", "parent_id", "name", "kind", "tags", "start")
+
+    def __init__(self, context: SpanContext, parent_id, name: str, kind, tags: dict):
+        self.context = context
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.tags = tags
+        self.start = time.time()
+
+    def tag(self, key: str, value):
+        if self.context.sampled:
+            self.tags[key] = value
+
+
+class Tracer:
+    """
+    Crea spans y los exporta como JSONL (Zipkin v2) en 'path'. Sin 'path' no registra nada.
+    'sample_rate' es la fracción de trazas nuevas que se registran (las que llegan con un
+    traceparent conservan la decisión del padre).
+    """
+
+    def __init__(self, service: str, path: str = None, sample_rate: float = 0.0):
+        self.service = service
+        self.path = path
+        self.sample_rate = sample_rate
+        self.enabled = bool(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    @contextmanager
+    def span(self, name: str, parent: SpanContext = None, kind: str = None, **tags):
+        """
+        Abre un span hijo de 'parent' (o del span actual) y lo hace actual dentro del bloque.
+        """
+        if not self.enabled:
+            yield None
+            return
+        parent = parent or _current.get()
+        if parent is None:
+            context = SpanContext(_new_id(128), _new_id(64), random.random() < self.sample_rate)
+        elif parent.sampled:
+            context = SpanContext(parent.trace_id, _new_id(64), True)
+        else:
+            context = parent  # no muestreado: sólo se propaga la decisión
+        span = Span(context, parent.span_id if parent else None, name, kind, tags)
+        token = _current.set(context)
+        try:
+            yield span
+        except BaseException as e:
+            span.tag("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current.reset(token)
+            if context.sampled:
+                self._export(span, time.time() - span.start)
+
+    def record(self, name: str, start: float, duration: float, parent: SpanContext = None, **tags):
+        """
+        Registra un span ya medido (p.ej. la espera en una cola, medida en otro hilo).
+        'start' es una marca de time.time() y 'duration' se expresa en segundos.
+        """
+        parent = parent or _current.get()
+        if not self.enabled or parent is None or not parent.sampled:
+            return
+        span = Span(SpanContext(parent.trace_id, _new_id(64), True), parent.span_id, name, None, tags)
+        span.start = start
+        self._export(span, duration)
+
+    def _export(self, span: Span, duration: float):
+        record = {
+            "traceId": span.context.trace_id,
+            "id": span.context.span_id,
+            "name": span.name,
+            "timestamp": int(span.start * 1e6),
+            "duration": max(int(duration * 1e6), 1),
+            "localEndpoint": {"serviceName": self.service},
+            "tags": {k: str(v) for k, v in span.tags.items()},
+        }
+        if span.parent_id:
+            record["parentId"] = span.parent_id
+        if span.kind:
+            record["kind"] = span.kind
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+
+# --------- Tracer del proceso ----------
+_tracer = Tracer("sin_configurar")
+
+
+def configure(service: str, path: str = None, sample_rate: float = 0.0) -> Tracer:
+    """
+    Configura el tracer global del proceso y lo devuelve.
+    """
+    global _tracer
+    _tracer = Tracer(service, path, sample_rate)
+    return _tracer
+
+
+def span(name: str, parent: SpanContext = None, kind: str = None, **tags):
+    return _tracer.span(name, parent=parent, kind=kind, **tags)
+
+
+def record(name: str, start: float, duration: float, parent: SpanContext = None, **tags):
+    _tracer.record(name, start, duration, parent=parent, **tags)
+
+
+def current():
+    """
+    SpanContext actual de este hilo/contexto, o None.
+    """
+    return _current.get()
+
+
+def set_client_id(client_id: str):
+    """
+    Identidad del cliente que inject() envía en este contexto (p.ej. una por sesión del frontend).
+    """
+    _client_id.set(client_id or None)
+
+
+def inject(metadata=()) -> list:
+    """
+    Metadata gRPC con el traceparent del span actual y el 'x-client-id' del contexto añadidos (si los hay).
+    """
+    out = list(metadata)
+    context = _current.get()
+    if context is not None:
+        out.append((TRACEPARENT, context.traceparent()))
+    client_id = _client_id.get()
+    if client_id is not None and all(key != CLIENT_ID for key, _ in out):
+        out.append((CLIENT_ID, client_id))
+    return out
+
+
+def extract(metadata):
+    """
+    SpanContext remoto a partir de la metadata gRPC recibida, o None.
+    """
+    for key, value in metadata or ():
+        if key == TRACEPARENT:
+            return parse_traceparent(value)
+    return None